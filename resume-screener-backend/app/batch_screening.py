@@ -0,0 +1,222 @@
+"""
+Batch screening: N resumes against one job description without pasting every
+resume into one giant prompt. query_chat joins the full text of every resume
+under "Screen the following resumes:", which overflows the context window
+somewhere around a dozen resumes and makes latency grow with one long
+generation.
+
+Here each resume is screened by its own LLM call (same prompt as chat), up
+to SCREENING_CONCURRENCY at a time and queued behind interactive chat in
+llm_scheduler. The JD is the same for every resume, so it's embedded and
+retrieved once per screening; each call only fits those chunks to its own
+budget. Results are persisted as they finish (screening_store), then one
+final ranking call compares compact per-resume summaries instead of full
+resumes. A resume whose call fails gets a "result" event with "error" set
+(and no screening) and is left out of the ranking.
+The run is an asyncio task independent of the HTTP request that started it,
+so a dropped connection just reconnects and replays. If the process running
+it exits, screening_store.fail_interrupted() fails it and the stream ends.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from contextlib import aclosing
+
+from . import context_budget, llm_scheduler, metrics, screening_store
+from .rag_chatbot import RANK_MARKER, SCREEN_MARKER, get_context_with_metadata, retrieve_for_job_query, stream_llm
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SCREENING_CONCURRENCY = int(os.getenv("SCREENING_CONCURRENCY", "4"))
+# Characters of each screening kept for the final ranking pass.
+SCREENING_SUMMARY_CHARS = int(os.getenv("SCREENING_SUMMARY_CHARS", "600"))
+
+_SCORE_RE = re.compile(r"match score[^0-9]{0,20}(\d{1,3})\s*%", re.IGNORECASE)
+_ANY_PERCENT_RE = re.compile(r"(\d{1,3})\s*%")
+
+_tasks = set()  # strong refs so running screenings aren't garbage-collected
+_conditions = {}  # screening_id -> asyncio.Condition, for live streaming
+
+
+def extract_match_score(text: str):
+    match = _SCORE_RE.search(text) or _ANY_PERCENT_RE.search(text)
+    if match and 0 <= int(match.group(1)) <= 100:
+        return int(match.group(1))
+    return None
+
+
+def compact_summary(text: str) -> str:
+    flat = " ".join(text.split())
+    if len(flat) <= SCREENING_SUMMARY_CHARS:
+        return flat
+    return flat[:SCREENING_SUMMARY_CHARS].rsplit(" ", 1)[0] + " …"
+
+
+def _jd_context(docs, query_tokens: int):
+    docs, report = context_budget.select_chunks(docs, context_budget.jd_budget(query_tokens, 0))
+    return get_context_with_metadata(docs), report
+
+
+async def _collect(query: str, docs, kind: str, screening_id: str, resumes=None) -> str:
+    """The full answer to `query` against the screening's retrieved JD
+    chunks. Raises if the LLM call fails."""
+    trace = metrics.RequestTrace(kind, screening_id=screening_id)
+    if resumes is not None:
+        trace.record_trim("resumes", resumes)
+    try:
+        query_tokens = count_tokens(query)
+        with trace.stage("prompt_assembly"):
+            context, jd_report = await asyncio.to_thread(_jd_context, docs, query_tokens)
+        trace.record_trim("jd_context", jd_report)
+        trace.add_tokens("prompt", count_tokens(context) + query_tokens)
+        started = time.perf_counter()
+        text = ""
+        chain_input = {"input": query, "context": context, "history": []}
+        async with aclosing(stream_llm(chain_input, llm_scheduler.BATCH, trace)) as chunks:
+            async for chunk in chunks:
+                if not text:
+                    trace.mark_first_token()
+                text += chunk
+        trace.add_stage("generation", time.perf_counter() - started)
+        trace.add_tokens("completion", count_tokens(text))
+    except Exception as e:
+        trace.finish("error", error=str(e))
+        raise
+    except BaseException:
+        trace.finish("error")
+        raise
+    trace.finish("ok")
+    return text
+
+
+async def _record(screening_id: str, event: dict) -> None:
+    await asyncio.to_thread(screening_store.append_event, screening_id, event)
+    condition = _conditions.get(screening_id)
+    if condition is not None:
+        async with condition:
+            condition.notify_all()
+
+
+async def _screen_one(screening_id, job_query, docs, index, resume, semaphore) -> dict:
+    async with semaphore:
+        (text,), report = context_budget.fit_resumes([resume.text])
+        query = f"{job_query}{SCREEN_MARKER}\nResume 1: {resume.filename}\n{text}"
+        try:
+            screening = await _collect(query, docs, "screening", screening_id, resumes=report)
+        except Exception as e:
+            logger.error(f"Screening {resume.filename} in batch {screening_id} failed: {e}")
+            result = {"type": "result", "index": index, "filename": resume.filename, "score": None, "error": str(e)}
+            await _record(screening_id, result)
+            return result
+    result = {
+        "type": "result",
+        "index": index,
+        "filename": resume.filename,
+        "score": extract_match_score(screening),
+        "summary": compact_summary(screening),
+        "screening": screening,
+    }
+    await _record(screening_id, result)
+    return result
+
+
+def _ranking_query(job_query: str, results: list) -> str:
+    lines = []
+    for i, result in enumerate(results, 1):
+        score = f"{result['score']}%" if result["score"] is not None else "no score"
+        lines.append(f"Candidate {i}: {result['filename']} (match score {score})\n{result['summary']}")
+    return (
+        f"{job_query}{RANK_MARKER}\n"
+        "Rank these candidates from best to worst fit using their screening summaries, "
+        "with one line of reasoning each.\n\n" + "\n\n".join(lines)
+    )
+
+
+async def _run(screening_id: str, job_query: str, resumes: list) -> None:
+    semaphore = asyncio.Semaphore(SCREENING_CONCURRENCY)
+    try:
+        docs = await asyncio.to_thread(retrieve_for_job_query, job_query)
+        results = await asyncio.gather(
+            *(_screen_one(screening_id, job_query, docs, i, r, semaphore) for i, r in enumerate(resumes))
+        )
+        results = [r for r in results if "error" not in r]
+        if not results:
+            raise RuntimeError("no resume could be screened")
+        results.sort(key=lambda r: -1 if r["score"] is None else r["score"], reverse=True)
+        ranking = await _collect(_ranking_query(job_query, results), docs, "ranking", screening_id)
+        await _record(screening_id, {
+            "type": "ranking",
+            "order": [r["filename"] for r in results],
+            "ranking": ranking,
+        })
+        status = "done"
+    except Exception as e:
+        logger.error(f"Batch screening {screening_id} failed: {e}")
+        await _record(screening_id, {"type": "error", "detail": str(e)})
+        status = "failed"
+    await _record(screening_id, {"type": "done", "status": status})
+    await asyncio.to_thread(screening_store.finish_screening, screening_id, status)
+
+
+async def start_screening(job_query: str, resumes: list, prescores=None) -> str:
+    """Creates the screening record and starts it in the background. Resumes
+    pre-ranking left out (not selected in `prescores`) are listed in a
+    "skipped" event right after "started"."""
+    screening_id = await asyncio.to_thread(screening_store.create_screening, job_query, len(resumes))
+    await asyncio.to_thread(screening_store.append_event, screening_id, {
+        "type": "started",
+        "screening_id": screening_id,
+        "total": len(resumes),
+        "files": [r.filename for r in resumes],
+        "prescores": prescores or [],
+    })
+    skipped = [p for p in prescores or [] if not p["selected"]]
+    if skipped:
+        await asyncio.to_thread(screening_store.append_event, screening_id, {
+            "type": "skipped",
+            "reason": "scored below PRERANK_MIN_SCORE",
+            "resumes": skipped,
+        })
+    _conditions[screening_id] = asyncio.Condition()
+    task = asyncio.create_task(_run(screening_id, job_query, resumes))
+    _tasks.add(task)
+
+    def _cleanup(t):
+        _tasks.discard(t)
+        _conditions.pop(screening_id, None)
+
+    task.add_done_callback(_cleanup)
+    return screening_id
+
+
+async def stream_events(screening_id: str, after: int = 0):
+    """Yields stored events after `after`, then live ones until the screening
+    finishes. Works for screenings started by another worker too, by
+    falling back to polling the store."""
+    while True:
+        # Status first: if it already says finished, the events read right
+        # after it are guaranteed to include the final "done".
+        screening = await asyncio.to_thread(screening_store.get_screening, screening_id)
+        events = await asyncio.to_thread(screening_store.events_after, screening_id, after)
+        for event in events:
+            after = event["seq"]
+            yield event
+            if event["type"] == "done":
+                return
+        if screening is None or screening["status"] != "running":
+            return
+        condition = _conditions.get(screening_id)
+        if condition is None:
+            # Not running here: poll, and fail it if its process is gone
+            # (the next pass then reads the final "done").
+            if not await asyncio.to_thread(screening_store.fail_interrupted, screening_id):
+                await asyncio.sleep(1.0)
+            continue
+        async with condition:
+            try:
+                await asyncio.wait_for(condition.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,265 @@
+"""
+Every resume screened through /api/chats/{id}/query or /api/screenings used
+to be parsed, pasted into one prompt and forgotten. When a new JD came in,
+the same people had to be uploaded and screened again from scratch.
+
+Screened resumes are now kept as a candidate pool, stored as:
+  * chunks in a second Chroma collection ("candidates", next to the JD one
+    in chroma_db/), one chunk per resume section (split further if long),
+    embedded with the shared model;
+  * one row per candidate in the shared SQLite database: name, email and
+    filename as first seen, when they were first and last screened and how
+    many times.
+
+A candidate's id is a hash of their resume's normalized text, so the same
+resume uploaded again, even re-exported as a new PDF, is recognised and not
+embedded a second time. remember() is called with every resume a screening
+extracts: known candidates only get last_seen/times_screened bumped, new
+ones are embedded by an ingest_jobs job in the index writer (see
+deployment.py), so screening never waits for it.
+
+search() runs a JD, either an indexed one (its stored chunk vectors are
+reused, nothing is re-embedded) or free text, against the whole pool in
+one batched Chroma query. A candidate's score is the mean, over the JD's
+chunks, of the best similarity any of their chunks reaches.
+
+  CANDIDATE_INDEX      0 turns remembering off (default 1)
+  CANDIDATE_FETCH_K    nearest candidate chunks fetched per JD chunk (default 200)
+"""
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from . import context_budget, db, ingest_jobs, vector_store
+from .embeddings import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_INDEX_ENABLED = os.getenv("CANDIDATE_INDEX", "1") != "0"
+CANDIDATE_FETCH_K = int(os.getenv("CANDIDATE_FETCH_K", "200"))
+MAX_SEARCH_RESULTS = 100
+MAX_PAGE_SIZE = 500
+# JD chunks used as queries when searching by jd_id.
+_MAX_JD_VECTORS = 16
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id             TEXT PRIMARY KEY,
+    name           TEXT,
+    email          TEXT,
+    filename       TEXT NOT NULL,
+    chunks         INTEGER NOT NULL,
+    first_seen     TEXT NOT NULL,
+    last_seen      TEXT NOT NULL,
+    times_screened INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS candidates_last_seen ON candidates(last_seen);
+"""
+
+
+def _conn():
+    db.ensure_schema("candidate_index", _SCHEMA)
+    return db.get_connection()
+
+
+def candidate_id(text: str) -> str:
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def _profile(text: str, filename: str) -> dict:
+    """Best-effort name (first short line without digits or @) and email."""
+    name = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            if len(line) <= 60 and not re.search(r"[\d@]", line):
+                name = line
+            break
+    email = _EMAIL_RE.search(text)
+    return {"name": name, "email": email.group(0) if email else None, "filename": filename}
+
+
+def chunk_resume(text: str, cid: str, filename: str) -> list:
+    """Resume sections (context_budget.resume_sections) as chunks, split
+    further when longer than CHUNK_SIZE; the whole text when no section
+    headings are recognised."""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=vector_store.CHUNK_SIZE, chunk_overlap=vector_store.CHUNK_OVERLAP
+    )
+    sections = context_budget.resume_sections(text) or {"resume": text}
+    chunks = []
+    for section, body in sections.items():
+        for piece in splitter.split_text(body):
+            chunks.append(Document(
+                page_content=piece,
+                metadata={"candidate_id": cid, "filename": filename, "section": section,
+                          "chunk_index": len(chunks)},
+            ))
+    return chunks
+
+
+def remember(resumes) -> int:
+    """Adds extracted resumes (ExtractedResume) to the pool as a side effect
+    of screening. Known candidates are marked as seen again; new ones are
+    queued for embedding. Returns how many were queued. Never raises."""
+    if not CANDIDATE_INDEX_ENABLED or not resumes:
+        return 0
+    try:
+        by_id = {}
+        for resume in resumes:
+            if resume.text and resume.text.strip():
+                by_id.setdefault(candidate_id(resume.text), resume)
+        if not by_id:
+            return 0
+        ids = list(by_id)
+        placeholders = ",".join("?" * len(ids))
+        known = {row["id"] for row in _conn().execute(
+            f"SELECT id FROM candidates WHERE id IN ({placeholders})", ids
+        )}
+        if known:
+            with db.transaction() as conn:
+                conn.executemany(
+                    "UPDATE candidates SET last_seen = ?, times_screened = times_screened + 1 WHERE id = ?",
+                    [(datetime.now().isoformat(), cid) for cid in known],
+                )
+        new = [{"id": cid, "filename": r.filename, "text": r.text} for cid, r in by_id.items() if cid not in known]
+        if new:
+            ingest_jobs.submit("candidates", index_candidates, new)
+        return len(new)
+    except Exception as e:
+        logger.error(f"Couldn't add resumes to the candidate index: {e}")
+        return 0
+
+
+def index_candidates(records, progress=None) -> dict:
+    """ingest_jobs job: embeds and stores {"id", "filename", "text"} records
+    and registers them. Chunk ids are deterministic, so a candidate queued
+    twice (screened again before the first job ran) has its chunks
+    overwritten, and the second screening still counts in times_screened."""
+    store = vector_store.get_candidate_store()
+    now = datetime.now().isoformat()
+    chunks, rows = [], []
+    for record in records:
+        record_chunks = chunk_resume(record["text"], record["id"], record["filename"])
+        chunks.extend(record_chunks)
+        profile = _profile(record["text"], record["filename"])
+        rows.append((record["id"], profile["name"], profile["email"], record["filename"], len(record_chunks), now, now))
+    for start in range(0, len(chunks), vector_store.INGEST_BATCH_SIZE):
+        batch = chunks[start:start + vector_store.INGEST_BATCH_SIZE]
+        store.add_documents(batch, ids=[f"{c.metadata['candidate_id']}::chunk-{c.metadata['chunk_index']}" for c in batch])
+        if progress:
+            progress(min(start + len(batch), len(chunks)), len(chunks))
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO candidates (id, name, email, filename, chunks, first_seen, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET chunks = excluded.chunks, "
+            "last_seen = excluded.last_seen, times_screened = times_screened + 1",
+            rows,
+        )
+    vector_store.mark_candidates_changed()
+    return {"indexed": [record["id"] for record in records]}
+
+
+def delete_candidates(candidate_ids, progress=None) -> dict:
+    """Removes candidates' chunks and rows. The index writer runs this inline;
+    any other worker queues it as an ingest job and waits for it."""
+    candidate_ids = list(candidate_ids)
+    collection = vector_store.get_candidate_store()._collection
+    for i, cid in enumerate(candidate_ids, 1):
+        collection.delete(where={"candidate_id": cid})
+        if progress:
+            progress(i, len(candidate_ids))
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany("DELETE FROM candidates WHERE id = ?", [(cid,) for cid in candidate_ids])
+    vector_store.mark_candidates_changed()
+    return {"deleted": candidate_ids}
+
+
+def get(cid: str):
+    row = _conn().execute("SELECT * FROM candidates WHERE id = ?", (cid,)).fetchone()
+    return dict(row) if row else None
+
+
+def page(cursor=None, limit: int = 50):
+    """Candidates ordered by id, after `cursor`. Returns (rows, next_cursor)."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    where, params = ("WHERE id > ?", [cursor]) if cursor else ("", [])
+    rows = _conn().execute(f"SELECT * FROM candidates {where} ORDER BY id LIMIT ?", (*params, limit + 1)).fetchall()
+    items = [dict(row) for row in rows[:limit]]
+    return items, items[-1]["id"] if len(rows) > limit else None
+
+
+def _jd_vectors(jd_id: str):
+    results = vector_store.get_vectorstore()._collection.get(
+        where={"parent_id": jd_id}, include=["embeddings", "metadatas"]
+    )
+    if not results["ids"]:
+        results = vector_store.get_vectorstore()._collection.get(ids=[jd_id], include=["embeddings", "metadatas"])
+    if not results["ids"]:
+        return None
+    order = sorted(range(len(results["ids"])), key=lambda i: (results["metadatas"][i] or {}).get("chunk_index", 0))
+    return [list(results["embeddings"][i]) for i in order[:_MAX_JD_VECTORS]]
+
+
+def search(query: str = None, jd_id: str = None, top_n: int = 10) -> list:
+    """The top_n candidates for an indexed JD (jd_id) or free-text query,
+    best first. Raises LookupError for an unknown jd_id."""
+    if jd_id:
+        vectors = _jd_vectors(jd_id)
+        if vectors is None:
+            raise LookupError(jd_id)
+    else:
+        vectors = [get_embeddings().embed_query(query)]
+    collection = vector_store.get_candidate_store()._collection
+    count = collection.count()
+    if count == 0:
+        return []
+    results = collection.query(
+        query_embeddings=vectors, n_results=min(CANDIDATE_FETCH_K, count),
+        include=["metadatas", "documents", "distances"],
+    )
+
+    # best[cid][q] = best similarity of cid's chunks to JD chunk q. A
+    # candidate outside a JD chunk's fetched neighbours scores 0 for it.
+    best, best_chunk = {}, {}
+    for q, (metadatas, documents, distances) in enumerate(
+        zip(results["metadatas"], results["documents"], results["distances"])
+    ):
+        for metadata, text, distance in zip(metadatas, documents, distances):
+            cid = (metadata or {}).get("candidate_id")
+            if cid is None:
+                continue
+            similarity = 1.0 - distance
+            scores = best.setdefault(cid, np.zeros(len(vectors), dtype=np.float32))
+            if similarity > scores[q]:
+                scores[q] = similarity
+            if cid not in best_chunk or similarity > best_chunk[cid][0]:
+                best_chunk[cid] = (similarity, metadata.get("section"), text)
+
+    ranked = sorted(best, key=lambda cid: float(best[cid].mean()), reverse=True)[:top_n]
+    if not ranked:
+        return []
+    placeholders = ",".join("?" * len(ranked))
+    profiles = {row["id"]: dict(row) for row in _conn().execute(
+        f"SELECT * FROM candidates WHERE id IN ({placeholders})", ranked
+    )}
+    matches = []
+    for cid in ranked:
+        _, section, text = best_chunk[cid]
+        matches.append({
+            **profiles.get(cid, {"id": cid}),
+            "score": round(float(best[cid].mean()), 4),
+            "best_match": {"section": section, "text": text[:300]},
+        })
+    return matches
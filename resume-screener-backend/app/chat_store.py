@@ -1,82 +1,192 @@
 """
-Same chat_history.json approach your Streamlit app used — a plain JSON file
-keyed by chat id. Kept as JSON (rather than a real database) on purpose, so
-your existing chat_history.json file just drops in and works.
+Chat storage. This used to be the same chat_history.json approach your
+Streamlit app used — one JSON file keyed by chat id, parsed and rewritten in
+full on every single message. It now lives in the shared SQLite database
+(see db.py): a `chats` table holding just the metadata the sidebar needs and
+an append-only `messages` table, so saving a message is one INSERT and
+listing chats never touches message bodies.
+
+Your existing chat_history.json still just drops in: the first time the
+store is opened it's imported once (chat ids, titles and timestamps kept
+as-is) and then left alone on disk.
 """
 import json
 import os
 from datetime import datetime
 
+from . import db
+
 CHAT_HISTORY_FILE = "chat_history.json"
 
 # Kept as "Virtual Assistant" internally to match your existing
-# chat_history.json and RAG_chatbot.load_chat_to_memory(), which checks for
+# chat_history.json and session_memory.pair_turns(), which checks for
 # this exact string. The API layer translates it to "assistant" for the frontend.
 ASSISTANT_ROLE = "Virtual Assistant"
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id            INTEGER PRIMARY KEY,
+    title         TEXT NOT NULL,
+    created_at    TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id   INTEGER NOT NULL REFERENCES chats(id) ON DELETE CASCADE,
+    seq       INTEGER NOT NULL,
+    role      TEXT NOT NULL,
+    content   TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (chat_id, seq)
+);
+"""
+
+
+def _conn():
+    if db.ensure_schema("chats", _SCHEMA):
+        _import_legacy_json()
+    return db.get_connection()
+
+
+def _import_legacy_json() -> None:
+    """One-time import of an existing chat_history.json."""
+    if db.get_meta("chat_history_imported") or not os.path.exists(CHAT_HISTORY_FILE):
+        return
+    try:
+        with open(CHAT_HISTORY_FILE, "r", encoding="utf-8") as f:
+            chat_data = json.load(f)
+    except Exception:
+        chat_data = {}
+    with db.transaction() as conn:
+        _insert_chats(conn, chat_data)
+    db.set_meta("chat_history_imported", datetime.now().isoformat())
+
+
+def _insert_chats(conn, chat_data: dict) -> None:
+    for cid, info in chat_data.items():
+        messages = info.get("messages", [])
+        conn.execute(
+            "INSERT OR IGNORE INTO chats (id, title, created_at, message_count) VALUES (?, ?, ?, ?)",
+            (int(cid), info.get("title", f"Chat {cid}"), info.get("created_at", ""), len(messages)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO messages (chat_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [
+                (int(cid), seq, m["role"], m["content"], m.get("timestamp", ""))
+                for seq, m in enumerate(messages)
+            ],
+        )
+
+
+def _message_dict(row) -> dict:
+    return {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+
 
 def load_chat_history() -> dict:
-    if os.path.exists(CHAT_HISTORY_FILE):
-        try:
-            with open(CHAT_HISTORY_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    """Full export in the old chat_history.json shape. Reads every message,
+    so only use it for backups/migrations — never on a request path."""
+    conn = _conn()
+    chat_data = {
+        str(row["id"]): {"created_at": row["created_at"], "title": row["title"], "messages": []}
+        for row in conn.execute("SELECT id, title, created_at FROM chats ORDER BY id")
+    }
+    for row in conn.execute("SELECT chat_id, role, content, timestamp FROM messages ORDER BY chat_id, seq"):
+        chat_data[str(row["chat_id"])]["messages"].append(_message_dict(row))
+    return chat_data
 
 
 def save_chat_history(chat_data: dict) -> None:
-    with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(chat_data, f, ensure_ascii=False, indent=2)
+    """Replaces the whole store with `chat_data` (old chat_history.json shape)."""
+    _conn()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM messages")
+        conn.execute("DELETE FROM chats")
+        _insert_chats(conn, chat_data)
 
 
-def get_next_chat_id(chat_data: dict) -> int:
-    if not chat_data:
-        return 1
-    return max(int(k) for k in chat_data.keys()) + 1
+def list_chats() -> list:
+    """Sidebar listing, newest first — metadata only, no message bodies."""
+    rows = _conn().execute("SELECT id, title, created_at FROM chats ORDER BY id DESC")
+    return [{"id": row["id"], "title": row["title"], "created_at": row["created_at"]} for row in rows]
 
 
 def create_chat() -> dict:
-    chat_data = load_chat_history()
-    new_id = get_next_chat_id(chat_data)
-    entry = {
-        "created_at": datetime.now().isoformat(),
-        "title": f"Chat {new_id}",
-        "messages": [],
-    }
-    chat_data[str(new_id)] = entry
-    save_chat_history(chat_data)
+    _conn()
+    with db.transaction() as conn:
+        new_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chats").fetchone()[0]
+        entry = {
+            "created_at": datetime.now().isoformat(),
+            "title": f"Chat {new_id}",
+            "messages": [],
+        }
+        conn.execute(
+            "INSERT INTO chats (id, title, created_at) VALUES (?, ?, ?)",
+            (new_id, entry["title"], entry["created_at"]),
+        )
     return {"id": new_id, **entry}
 
 
 def delete_chat(chat_id: int) -> bool:
-    chat_data = load_chat_history()
-    key = str(chat_id)
-    if key in chat_data:
-        del chat_data[key]
-        save_chat_history(chat_data)
-        return True
-    return False
+    _conn()
+    with db.transaction() as conn:
+        return conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,)).rowcount > 0
 
 
 def get_chat(chat_id: int):
-    chat_data = load_chat_history()
-    return chat_data.get(str(chat_id))
+    conn = _conn()
+    row = conn.execute(
+        "SELECT title, created_at FROM chats WHERE id = ?", (chat_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    messages = conn.execute(
+        "SELECT role, content, timestamp FROM messages WHERE chat_id = ? ORDER BY seq", (chat_id,)
+    )
+    return {
+        "created_at": row["created_at"],
+        "title": row["title"],
+        "messages": [_message_dict(m) for m in messages],
+    }
 
 
 def update_chat_title(chat_id: int, first_message: str) -> None:
-    chat_data = load_chat_history()
-    key = str(chat_id)
-    if key in chat_data:
-        chat_data[key]["title"] = first_message[:10] + "..."
-        save_chat_history(chat_data)
-
-
-def save_message(chat_id: int, role: str, content: str) -> None:
-    chat_data = load_chat_history()
-    key = str(chat_id)
-    if key in chat_data:
-        chat_data[key]["messages"].append(
-            {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+    _conn()
+    with db.transaction() as conn:
+        conn.execute("UPDATE chats SET title = ? WHERE id = ?", (first_message[:10] + "...", chat_id))
+
+
+def save_message(chat_id: int, role: str, content: str):
+    """Appends a message; returns its index in the chat (None if the chat
+    doesn't exist)."""
+    _conn()
+    with db.transaction() as conn:
+        row = conn.execute("SELECT message_count FROM chats WHERE id = ?", (chat_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "INSERT INTO messages (chat_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, row["message_count"], role, content, datetime.now().isoformat()),
         )
-        save_chat_history(chat_data)
+        conn.execute("UPDATE chats SET message_count = message_count + 1 WHERE id = ?", (chat_id,))
+    return row["message_count"]
+
+
+def message_count(chat_id: int) -> int:
+    row = _conn().execute("SELECT message_count FROM chats WHERE id = ?", (chat_id,)).fetchone()
+    return row["message_count"] if row else 0
+
+
+def answer_count(chat_id: int) -> int:
+    """Assistant messages in a chat, i.e. completed turns."""
+    row = _conn().execute(
+        "SELECT COUNT(*) AS n FROM messages WHERE chat_id = ? AND role = ?", (chat_id, ASSISTANT_ROLE)
+    ).fetchone()
+    return row["n"]
+
+
+def get_recent_messages(chat_id: int, limit: int) -> list:
+    """Last `limit` messages of a chat, oldest first."""
+    rows = _conn().execute(
+        "SELECT role, content, timestamp FROM messages WHERE chat_id = ? ORDER BY seq DESC LIMIT ?",
+        (chat_id, limit),
+    ).fetchall()
+    return [_message_dict(row) for row in reversed(rows)]
@@ -0,0 +1,187 @@
+"""
+Token-budgeted prompt assembly. Retrieved JD chunks went into the system
+prompt in full and query_chat appended every resume's complete text, so
+prompt size had no upper bound — and with it Groq latency, cost, and the
+occasional context-overflow error.
+
+Everything that goes into a prompt now passes through one budget:
+  CONTEXT_TOKEN_BUDGET    whole prompt: JD context + history + query/resumes
+                          (default 8000, 0 = no limit)
+  CONTEXT_RESUME_TOKENS   all resumes of one query together (default 4000)
+  CONTEXT_HISTORY_TOKENS  conversation history (default 1500)
+  CONTEXT_MIN_JD_TOKENS   JD context never gets squeezed below this (default 1000)
+
+Resumes are capped first (split by pre-rank score), then history (oldest
+turns dropped first), and the JD context gets what's left: chunks in
+retrieval order, boilerplate paragraphs already seen dropped, until the
+budget runs out. Resumes over their share are cut down to their skills,
+experience and education sections rather than just truncated.
+
+Every step returns a small report ({"tokens_in", "tokens_out"}) that
+rag_chatbot puts on the request trace, so trimming shows up in the
+structured log and the rag_context_trimmed_tokens_total metric.
+"""
+import os
+import re
+
+from .tokens import count_tokens, truncate_to_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_RESUME_TOKENS = int(os.getenv("CONTEXT_RESUME_TOKENS", "4000"))
+CONTEXT_HISTORY_TOKENS = int(os.getenv("CONTEXT_HISTORY_TOKENS", "1500"))
+CONTEXT_MIN_JD_TOKENS = int(os.getenv("CONTEXT_MIN_JD_TOKENS", "1000"))
+
+# Paragraphs shorter than this are never treated as boilerplate.
+_MIN_BOILERPLATE_CHARS = 40
+
+# Resume sections kept when a resume has to shrink, most important first;
+# _SECTION_WEIGHTS sets each one's share of that resume's budget.
+_RESUME_SECTIONS = [
+    ("skills", ("skills", "technical skills", "core competencies", "technologies", "tools")),
+    ("experience", ("experience", "work experience", "professional experience", "employment",
+                    "work history", "employment history")),
+    ("education", ("education", "academic background", "qualifications")),
+    ("projects", ("projects", "key projects")),
+    ("certifications", ("certifications", "certificates", "licenses")),
+    ("summary", ("summary", "profile", "professional summary", "objective", "about me")),
+]
+_SECTION_WEIGHTS = {"skills": 3, "experience": 5, "education": 2, "projects": 2, "certifications": 1, "summary": 1}
+_HEADING_TO_SECTION = {alias: name for name, aliases in _RESUME_SECTIONS for alias in aliases}
+_HEADING_RE = re.compile(r"^\s*([A-Za-z][A-Za-z &/]{2,40}?)\s*:?\s*$")
+
+
+def _report(tokens_in: int, tokens_out: int) -> dict:
+    return {"tokens_in": tokens_in, "tokens_out": tokens_out}
+
+
+def _normalize(paragraph: str) -> str:
+    return " ".join(paragraph.lower().split())
+
+
+# -------------------- JD context --------------------
+def jd_budget(query_tokens: int, history_tokens: int) -> int:
+    """Tokens left for JD context once the query and history are in, or None
+    when CONTEXT_TOKEN_BUDGET is off."""
+    if CONTEXT_TOKEN_BUDGET <= 0:
+        return None
+    return max(CONTEXT_MIN_JD_TOKENS, CONTEXT_TOKEN_BUDGET - query_tokens - history_tokens)
+
+
+def select_chunks(documents, budget):
+    """The retrieved chunks that fit in `budget` tokens, most relevant
+    (earliest) first, with paragraphs already included from an earlier chunk
+    removed — repeated EEO statements, company blurbs and chunk overlap.
+    The last chunk that doesn't fit whole is cut to the remaining budget.
+    Returns (documents, report); documents are copies when changed."""
+    seen = set()
+    kept, tokens_in, used = [], 0, 0
+    for doc in documents:
+        tokens_in += count_tokens(doc.page_content)
+        if budget is not None and used >= budget:
+            continue
+        paragraphs = []
+        for paragraph in re.split(r"\n\s*\n|\n(?=\S)", doc.page_content):
+            key = _normalize(paragraph)
+            if not key:
+                continue
+            if len(key) >= _MIN_BOILERPLATE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            paragraphs.append(paragraph.strip())
+        text = "\n".join(paragraphs)
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if budget is not None and used + tokens > budget:
+            text = truncate_to_tokens(text, budget - used)
+            tokens = count_tokens(text)
+            if not text:
+                continue
+        used += tokens
+        kept.append(doc if text == doc.page_content else type(doc)(page_content=text, metadata=doc.metadata))
+    return kept, _report(tokens_in, used)
+
+
+# -------------------- History --------------------
+def fit_history(messages, budget: int = CONTEXT_HISTORY_TOKENS):
+    """The most recent history messages that fit in `budget`, dropping whole
+    (user, assistant) pairs from the oldest end. A leading system message
+    (the conversation summary) is always kept. Returns (messages, report)."""
+    sizes = [count_tokens(str(getattr(m, "content", m))) for m in messages]
+    total = sum(sizes)
+    if CONTEXT_TOKEN_BUDGET <= 0 or total <= budget:
+        return messages, _report(total, total)
+    head = 1 if messages and getattr(messages[0], "type", None) == "system" else 0
+    start, used = len(messages), sum(sizes[:head])
+    while start >= head + 2 and used + sizes[start - 1] + sizes[start - 2] <= budget:
+        used += sizes[start - 1] + sizes[start - 2]
+        start -= 2
+    return list(messages[:head]) + list(messages[start:]), _report(total, used)
+
+
+# -------------------- Resumes --------------------
+def resume_sections(text: str) -> dict:
+    """Section name -> text for the recognisable sections of a resume."""
+    sections, current, lines = {}, None, []
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line)
+        heading = _HEADING_TO_SECTION.get(match.group(1).strip().lower()) if match else None
+        if heading:
+            if current and lines:
+                sections[current] = (sections.get(current, "") + "\n" + "\n".join(lines)).strip()
+            current, lines = heading, []
+        elif current:
+            lines.append(line)
+    if current and lines:
+        sections[current] = (sections.get(current, "") + "\n" + "\n".join(lines)).strip()
+    return sections
+
+
+def _allocate(sizes, weights, budget):
+    """Per-item token budgets splitting `budget` in proportion to weights.
+    Items smaller than their share stay whole (None) and hand what they
+    don't use to the rest, until every remaining item is over its share."""
+    whole, left = set(), budget
+    while True:
+        rest = [i for i in range(len(sizes)) if i not in whole]
+        total_weight = sum(weights[i] for i in rest)
+        fits = [i for i in rest if sizes[i] <= left * weights[i] / total_weight] if rest else []
+        if not fits:
+            break
+        whole.update(fits)
+        left -= sum(sizes[i] for i in fits)
+    return [None if i in whole else int(left * weights[i] / total_weight) for i in range(len(sizes))]
+
+
+def compress_resume(text: str, budget: int) -> str:
+    """`text` as is if it fits in `budget` tokens, else its skills,
+    experience, education (and other recognised) sections, each cut to its
+    share of the budget. A resume with no recognisable sections is just
+    truncated."""
+    if count_tokens(text) <= budget:
+        return text
+    sections = resume_sections(text)
+    if not sections:
+        return truncate_to_tokens(text, budget)
+    names = [name for name, _ in _RESUME_SECTIONS if name in sections]
+    parts = [f"{name.title()}:\n{sections[name]}" for name in names]
+    shares = _allocate([count_tokens(p) for p in parts], [_SECTION_WEIGHTS[n] for n in names], budget)
+    fitted = [part if share is None else truncate_to_tokens(part, share) for part, share in zip(parts, shares)]
+    return "\n\n".join(part for part in fitted if part)
+
+
+def fit_resumes(texts, weights=None, budget: int = CONTEXT_RESUME_TOKENS):
+    """Compresses resume texts to share `budget` tokens, in proportion to
+    `weights` (e.g. pre-rank scores; missing or non-positive weights count
+    as the average). Returns (texts, report)."""
+    tokens_in = sum(count_tokens(t) for t in texts)
+    if CONTEXT_TOKEN_BUDGET <= 0 or tokens_in <= budget or not texts:
+        return list(texts), _report(tokens_in, tokens_in)
+    weights = [w if w is not None and w > 0 else None for w in (weights or [None] * len(texts))]
+    known = [w for w in weights if w is not None]
+    default = sum(known) / len(known) if known else 1.0
+    weights = [default if w is None else w for w in weights]
+    shares = _allocate([count_tokens(t) for t in texts], weights, budget)
+    fitted = [text if share is None else compress_resume(text, share) for text, share in zip(texts, shares)]
+    return fitted, _report(tokens_in, sum(count_tokens(t) for t in fitted))
@@ -0,0 +1,191 @@
+"""
+Rolling conversation summaries. A chat's history used to be its last
+SESSION_WINDOW_K (user, assistant) turns verbatim, so every new prompt
+carried whole earlier answers — multi-resume screenings included — and
+prompt size grew with the chat until the window (or the history budget)
+cut turns off and everything in them was forgotten.
+
+Now, after an answer is saved, schedule() folds older turns into one
+compact running summary per chat, written by rag_chatbot's summaryllm
+(llama-3.1-8b-instant) in the background, at batch priority through
+llm_scheduler, so the request path never waits on it. Two kinds of turn
+get folded:
+  * turns older than the last SUMMARY_RECENT_TURNS;
+  * any earlier turn over SUMMARY_TURN_TOKENS, such as a long screening.
+    The latest turn is always kept verbatim for follow-ups.
+
+compose() then gives the main model the summary, as a system message,
+followed by the turns of the session_memory window it doesn't cover yet. A turn only
+disappears from the raw history once the summary includes it, so a
+summary that is running late costs tokens, never context.
+
+Summaries live in the shared SQLite database next to the chat (deleted
+with it), keyed by how many leading turns (answers) they cover. Turns that
+had already slid out of the window before a chat was first summarized are
+not back-filled.
+
+  CONVERSATION_SUMMARY   0 turns summaries off (default 1)
+  SUMMARY_RECENT_TURNS   turns always kept verbatim (default 2)
+  SUMMARY_TURN_TOKENS    a turn larger than this is folded early (default 800)
+  SUMMARY_MAX_TOKENS     cap on the summary itself (default 300)
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from . import chat_store, db, llm_scheduler
+from .session_memory import pair_turns, sessions
+from .tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_SUMMARY = os.getenv("CONVERSATION_SUMMARY", "1") != "0"
+SUMMARY_RECENT_TURNS = int(os.getenv("SUMMARY_RECENT_TURNS", "2"))
+SUMMARY_TURN_TOKENS = int(os.getenv("SUMMARY_TURN_TOKENS", "800"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+# Turns folded per summaryllm call, and how much of each one it's shown.
+_TURNS_PER_CALL = 4
+_TURN_INPUT_TOKENS = 1200
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_SUMMARIZE_PROMPT = (
+    "You keep a running summary of a recruiter's conversation with a resume screening assistant. "
+    "Update the summary with the new turns. Keep the job descriptions discussed, every candidate "
+    "screened with their match score and verdict, the recruiter's decisions, preferences and open "
+    "questions. Drop greetings, repetition and anything the recruiter can reread in the job "
+    "descriptions. Use at most {words} words. Reply with the updated summary only."
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    chat_id    INTEGER PRIMARY KEY REFERENCES chats(id) ON DELETE CASCADE,
+    summary    TEXT NOT NULL,
+    turns      INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+_running = {}  # chat_id -> task, at most one summarization per chat at a time
+_again = set()  # chats that got a new answer while being summarized
+
+
+def _conn():
+    chat_store._conn()  # chats must exist for the foreign key
+    db.ensure_schema("conversation_summary", _SCHEMA)
+    return db.get_connection()
+
+
+def get(chat_id):
+    """(summary, turns covered) for a chat, or None."""
+    row = _conn().execute("SELECT summary, turns FROM chat_summaries WHERE chat_id = ?", (chat_id,)).fetchone()
+    return (row["summary"], row["turns"]) if row else None
+
+
+def _save(chat_id, summary: str, turns: int, previous_turns: int) -> bool:
+    """Stores the summary unless another worker moved it on meanwhile."""
+    _conn()
+    with db.transaction() as conn:
+        return conn.execute(
+            "INSERT INTO chat_summaries (chat_id, summary, turns, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET summary = excluded.summary, turns = excluded.turns, "
+            "updated_at = excluded.updated_at WHERE chat_summaries.turns = ?",
+            (chat_id, summary, turns, datetime.now().isoformat(), previous_turns),
+        ).rowcount > 0
+
+
+def compose(chat_id, messages) -> list:
+    """A chat's history for the prompt: its summary, if any, then the
+    messages of `messages` (the recent-turn window, (user, assistant)
+    pairs, oldest first) that the summary doesn't cover."""
+    if not CONVERSATION_SUMMARY or chat_id is None:
+        return messages
+    try:
+        stored = get(chat_id)
+        if stored is None:
+            return messages
+        summary, covered = stored
+        first_turn = chat_store.answer_count(chat_id) - len(messages) // 2
+        skip = min(len(messages) // 2, max(0, covered - first_turn))
+        return [SystemMessage(content=SUMMARY_PREFIX + summary)] + list(messages[skip * 2:])
+    except Exception as e:
+        logger.error(f"Couldn't load the summary of chat {chat_id}: {e}")
+        return messages
+
+
+def _fold_plan(chat_id):
+    """(summary so far, turns it covers as stored, first turn to fold,
+    turns to fold next as (user, assistant) pairs) from the chat's stored
+    messages. The first turn to fold is past the stored count when turns in
+    between have already left the window (not back-filled)."""
+    stored = get(chat_id) or ("", 0)
+    total = chat_store.answer_count(chat_id)
+    recent = pair_turns(chat_store.get_recent_messages(chat_id, sessions.window_k * 2 + 2))
+    first = total - len(recent)
+    boundary = total - SUMMARY_RECENT_TURNS
+    for turn, (user, assistant) in enumerate(recent[:-1], first):
+        if count_tokens(user) + count_tokens(assistant) > SUMMARY_TURN_TOKENS:
+            boundary = max(boundary, turn + 1)
+    start = max(stored[1], first)
+    return stored[0], stored[1], start, recent[start - first:boundary - first] if boundary > start else []
+
+
+def _summary_messages(summary: str, turns) -> list:
+    lines = []
+    for user, assistant in turns:
+        lines.append(f"Recruiter: {truncate_to_tokens(user, _TURN_INPUT_TOKENS // 4)}")
+        lines.append(f"Assistant: {truncate_to_tokens(assistant, _TURN_INPUT_TOKENS)}")
+    return [
+        SystemMessage(content=_SUMMARIZE_PROMPT.format(words=int(SUMMARY_MAX_TOKENS * 0.7))),
+        HumanMessage(content=f"Current summary:\n{summary or '(none yet)'}\n\nNew turns:\n" + "\n".join(lines)),
+    ]
+
+
+async def _summarize(chat_id) -> None:
+    from .rag_chatbot import summaryllm
+
+    summary, stored, covered, turns = await asyncio.to_thread(_fold_plan, chat_id)
+    for start in range(0, len(turns), _TURNS_PER_CALL):
+        batch = turns[start:start + _TURNS_PER_CALL]
+        chunks = [chunk async for chunk in llm_scheduler.astream(
+            summaryllm, _summary_messages(summary, batch), llm_scheduler.BATCH
+        )]
+        updated = truncate_to_tokens("".join(chunks).strip(), SUMMARY_MAX_TOKENS)
+        if not updated:
+            return
+        # Guarded by the count as stored, not `covered`: the two differ when
+        # a gap was skipped, and the row must still move on.
+        if not await asyncio.to_thread(_save, chat_id, updated, covered + len(batch), stored):
+            return  # another worker summarized this chat meanwhile
+        summary, covered = updated, covered + len(batch)
+        stored = covered
+
+
+async def _run(chat_id) -> None:
+    try:
+        while True:
+            _again.discard(chat_id)
+            try:
+                await _summarize(chat_id)
+            except Exception as e:
+                logger.error(f"Summarizing chat {chat_id} failed: {e}")
+                return
+            if chat_id not in _again:
+                return
+    finally:
+        _running.pop(chat_id, None)
+        _again.discard(chat_id)
+
+
+def schedule(chat_id) -> None:
+    """Folds whatever is due of chat_id's turns into its summary, in the
+    background. Call on the event loop after an answer is saved."""
+    if not CONVERSATION_SUMMARY or chat_id is None:
+        return
+    if chat_id in _running:
+        _again.add(chat_id)
+        return
+    _running[chat_id] = asyncio.get_running_loop().create_task(_run(chat_id))
@@ -0,0 +1,94 @@
+"""
+One small embedded SQLite database for the state this backend owns itself
+(chats for now). Lives next to chroma_db/ in whatever directory the server
+runs from, same as chat_history.json used to.
+
+WAL mode lets readers keep going while a write is in progress, and every
+write goes through transaction(), which takes SQLite's write lock up front
+(BEGIN IMMEDIATE) so two requests appending at the same moment queue up
+instead of clobbering each other the way two json.dump() calls would.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("APP_DB_PATH", "resume_screener.db")
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_applied_schemas = set()
+
+
+def get_connection() -> sqlite3.Connection:
+    """One connection per thread (and per process — a forked worker must not
+    reuse its parent's handle)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid() or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = DB_PATH
+    return conn
+
+
+@contextmanager
+def transaction():
+    """Write transaction. Nested calls join the outer one instead of failing
+    on a second BEGIN."""
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def ensure_schema(name: str, script: str) -> bool:
+    """Runs a store's CREATE TABLE IF NOT EXISTS script once per process.
+    Returns True the first time, so callers can hang one-off migrations
+    (like importing an old JSON file) off it."""
+    key = (DB_PATH, name)
+    if key in _applied_schemas:
+        return False
+    with _schema_lock:
+        if key in _applied_schemas:
+            return False
+        get_connection().executescript(script)
+        _applied_schemas.add(key)
+        return True
+
+
+def get_meta(key: str):
+    ensure_schema("meta", _META_SCHEMA)
+    row = get_connection().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def set_meta(key: str, value: str) -> None:
+    ensure_schema("meta", _META_SCHEMA)
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+_META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
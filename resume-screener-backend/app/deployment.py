@@ -0,0 +1,94 @@
+"""
+Multi-worker mode. Chats, feedback, screenings, job status and the indexing
+queue already live in the shared SQLite database (WAL mode, every write
+under BEGIN IMMEDIATE — see db.py), so any number of worker processes on one
+box can read and write them safely. What can't be shared is Chroma: its
+HNSW index is held in memory by whichever process opened it, and two
+processes writing it would corrupt each other.
+
+With MULTI_WORKER=1 (e.g. `MULTI_WORKER=1 uvicorn app.main:app --workers 4`)
+exactly one process is the index writer: whichever holds an exclusive lock
+on <APP_DB_PATH>.writer.lock. It runs the ingest_jobs queue, so every
+upload, replace, delete and folder sync is applied there. Every other
+worker only reads the index, and reopens its handle when the writer has
+changed it (checked at most every INDEX_REFRESH_SECONDS, default 2). If the
+writer exits, the lock is released and the next worker to ask takes over.
+
+Without MULTI_WORKER the single process is always the writer and nothing
+changes.
+"""
+import logging
+import os
+import threading
+import time
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+MULTI_WORKER = os.getenv("MULTI_WORKER", "0") == "1"
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", "2"))
+
+_lock = threading.Lock()
+_lock_file = None  # open while this process holds the writer lock
+_is_writer = False  # cached outcome, so status polls don't flock each time
+_attempted_at = None  # monotonic time of the last attempt to become writer
+
+
+def _try_lock() -> bool:
+    global _lock_file
+    try:
+        import fcntl
+    except ImportError:  # no flock (Windows): only single-worker mode works there
+        logger.warning("MULTI_WORKER needs fcntl; treating this process as the index writer.")
+        return True
+    lock_file = open(f"{db.DB_PATH}.writer.lock", "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _lock_file = lock_file
+    logger.info(f"Process {os.getpid()} is the index writer.")
+    return True
+
+
+def is_index_writer() -> bool:
+    """Whether this process may write the vector index. In multi-worker mode
+    a process that isn't the writer yet tries to become it again, at most
+    every INDEX_REFRESH_SECONDS, which is how a new writer takes over after
+    the old one exits. Once it is the writer, that's cached."""
+    global _is_writer, _attempted_at
+    if not MULTI_WORKER:
+        return True
+    with _lock:
+        if _is_writer:
+            return True
+        now = time.monotonic()
+        if _attempted_at is not None and now - _attempted_at < INDEX_REFRESH_SECONDS:
+            return False
+        _attempted_at = now
+        _is_writer = _try_lock()
+        return _is_writer
+
+
+def release() -> None:
+    """Gives up the writer lock (shutdown hook)."""
+    global _lock_file, _is_writer, _attempted_at
+    with _lock:
+        if _lock_file is not None:
+            _lock_file.close()
+            _lock_file = None
+        _is_writer = False
+        _attempted_at = None
+
+
+def status() -> dict:
+    """For /api/status, which the frontend polls: reports the cached
+    outcome and only tries for the lock if it never has."""
+    writer = is_index_writer() if not MULTI_WORKER or _attempted_at is None else _is_writer
+    return {"multi_worker": MULTI_WORKER, "pid": os.getpid(), "index_writer": writer}
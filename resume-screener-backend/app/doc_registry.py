@@ -0,0 +1,123 @@
+"""
+One row per indexed job description: id, source, chunk count, when it was
+indexed and any tags it was uploaded with. GET /api/vector-db/docs used to
+pull the metadata of every chunk out of Chroma and group it in Python on
+each call; listing, filtering and paging now run against this table instead,
+and Chroma is only asked for chunks when a caller explicitly includes them.
+
+vector_store keeps it in step with the collection on every add and delete.
+An index built before this table existed is backfilled from Chroma's chunk
+metadata once, the first time the store is opened.
+"""
+from . import db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_docs (
+    id         TEXT PRIMARY KEY,
+    source     TEXT NOT NULL,
+    chunks     INTEGER NOT NULL,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS indexed_docs_source ON indexed_docs(source);
+CREATE INDEX IF NOT EXISTS indexed_docs_indexed_at ON indexed_docs(indexed_at);
+CREATE TABLE IF NOT EXISTS doc_tags (
+    doc_id TEXT NOT NULL REFERENCES indexed_docs(id) ON DELETE CASCADE,
+    tag    TEXT NOT NULL,
+    PRIMARY KEY (doc_id, tag)
+);
+CREATE INDEX IF NOT EXISTS doc_tags_tag ON doc_tags(tag);
+"""
+
+MAX_PAGE_SIZE = 500
+
+
+def _conn():
+    db.ensure_schema("doc_registry", _SCHEMA)
+    return db.get_connection()
+
+
+def upsert(docs) -> None:
+    """docs: (id, source, chunks, indexed_at, tags) tuples. tags=None keeps
+    a re-indexed document's existing tags."""
+    _conn()
+    with db.transaction() as conn:
+        for doc_id, source, chunks, indexed_at, tags in docs:
+            conn.execute(
+                "INSERT INTO indexed_docs (id, source, chunks, indexed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET source = excluded.source, chunks = excluded.chunks, "
+                "indexed_at = excluded.indexed_at",
+                (doc_id, source, chunks, indexed_at),
+            )
+            if tags is not None:
+                conn.execute("DELETE FROM doc_tags WHERE doc_id = ?", (doc_id,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO doc_tags (doc_id, tag) VALUES (?, ?)",
+                    [(doc_id, tag) for tag in tags],
+                )
+
+
+def delete(doc_id: str) -> None:
+    _conn()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM indexed_docs WHERE id = ?", (doc_id,))
+
+
+def ids() -> list:
+    return [row["id"] for row in _conn().execute("SELECT id FROM indexed_docs")]
+
+
+def last_indexed_at():
+    return _conn().execute("SELECT MAX(indexed_at) FROM indexed_docs").fetchone()[0]
+
+
+def page(cursor=None, limit: int = 50, source=None, indexed_after=None, indexed_before=None, tag=None):
+    """Documents ordered by id, after `cursor` (the last id of the previous
+    page). Returns (rows, next_cursor); next_cursor is None on the last page."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    clauses, params = [], []
+    if cursor:
+        clauses.append("d.id > ?")
+        params.append(cursor)
+    if source:
+        clauses.append("d.source = ?")
+        params.append(source)
+    if indexed_after:
+        clauses.append("d.indexed_at >= ?")
+        params.append(indexed_after)
+    if indexed_before:
+        clauses.append("d.indexed_at < ?")
+        params.append(indexed_before)
+    if tag:
+        clauses.append("EXISTS (SELECT 1 FROM doc_tags t WHERE t.doc_id = d.id AND t.tag = ?)")
+        params.append(tag)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _conn().execute(
+        f"SELECT d.id, d.source, d.chunks, d.indexed_at FROM indexed_docs d {where} ORDER BY d.id LIMIT ?",
+        (*params, limit + 1),
+    ).fetchall()
+    docs = [dict(row) for row in rows[:limit]]
+    next_cursor = docs[-1]["id"] if len(rows) > limit else None
+    return docs, next_cursor
+
+
+def tags_for(doc_ids) -> dict:
+    doc_ids = list(doc_ids)
+    tags = {doc_id: [] for doc_id in doc_ids}
+    if not doc_ids:
+        return tags
+    placeholders = ",".join("?" * len(doc_ids))
+    rows = _conn().execute(
+        f"SELECT doc_id, tag FROM doc_tags WHERE doc_id IN ({placeholders}) ORDER BY tag", doc_ids
+    )
+    for row in rows:
+        tags[row["doc_id"]].append(row["tag"])
+    return tags
+
+
+def sources_for(doc_ids) -> dict:
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return {}
+    placeholders = ",".join("?" * len(doc_ids))
+    rows = _conn().execute(f"SELECT id, source FROM indexed_docs WHERE id IN ({placeholders})", doc_ids)
+    return {row["id"]: row["source"] for row in rows}
@@ -0,0 +1,106 @@
+"""
+The one embedding model the whole backend shares. rag_chatbot and
+vector_store used to build their own HuggingFaceEmbeddings — two copies of
+the model in memory, loaded at import time before /api/health could answer,
+and with different normalize_embeddings settings, so stored vectors and query
+vectors weren't even normalized the same way.
+
+get_embeddings() hands out a single lightweight wrapper; the actual model is
+only loaded the first time something is embedded (or when main.py warms it
+in the background at startup).
+
+Configuration (all optional):
+  EMBEDDING_MODEL       default BAAI/bge-small-en-v1.5
+  EMBEDDING_BACKEND     torch (default), onnx or openvino — the last two need
+                        `pip install sentence-transformers[onnx]` / `[openvino]`
+  EMBEDDING_ONNX_FILE   a specific exported file inside the model repo, e.g.
+                        onnx/model_qint8_avx512_vnni.onnx for int8 on CPU
+  EMBEDDING_DEVICE      default cpu
+  EMBEDDING_BATCH_SIZE  sentences per forward pass (default 32)
+"""
+import logging
+import os
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+
+class SharedEmbeddings(Embeddings):
+    """Loads the underlying model on first use; safe to call from many threads."""
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        model_kwargs = {"device": EMBEDDING_DEVICE}
+        if EMBEDDING_BACKEND != "torch":
+            model_kwargs["backend"] = EMBEDDING_BACKEND
+            if EMBEDDING_ONNX_FILE:
+                model_kwargs["model_kwargs"] = {"file_name": EMBEDDING_ONNX_FILE}
+
+        started = time.perf_counter()
+        model = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"normalize_embeddings": True, "batch_size": EMBEDDING_BATCH_SIZE},
+        )
+        self.load_seconds = time.perf_counter() - started
+        logger.info(
+            f"Loaded embedding model {EMBEDDING_MODEL} ({EMBEDDING_BACKEND}) in {self.load_seconds:.2f}s."
+        )
+        return model
+
+    def embed_documents(self, texts):
+        return self._get_model().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._get_model().embed_query(text)
+
+
+_embeddings = SharedEmbeddings()
+
+
+def get_embeddings() -> SharedEmbeddings:
+    return _embeddings
+
+
+def warm_up() -> None:
+    """Forces the model load (and one tiny forward pass) ahead of the first query."""
+    try:
+        _embeddings.embed_query("warm up")
+    except Exception as e:
+        logger.error(f"Embedding warm-up failed: {e}")
+
+
+def status() -> dict:
+    return {
+        "model": EMBEDDING_MODEL,
+        "backend": EMBEDDING_BACKEND,
+        "batch_size": EMBEDDING_BATCH_SIZE,
+        "loaded": _embeddings.loaded,
+        "load_seconds": _embeddings.load_seconds,
+    }
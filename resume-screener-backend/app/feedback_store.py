@@ -1,33 +1,203 @@
-"""Same feedback_YYYY-MM-DD.json logging your Streamlit app used."""
+"""
+Answer ratings. This used to be the same feedback_YYYY-MM-DD.json logging
+your Streamlit app used: every star click read the whole day's file, scanned
+it for the (session_id, message_index) being re-rated and rewrote it with
+indent=4 — O(n) per click on a busy day, and two clicks at the same moment
+could leave a corrupt file.
+
+Ratings now live in the shared SQLite database (see db.py), one row per
+(session_id, message_index), so re-rating an answer is a keyed upsert.
+log_feedback() itself only drops the rating in an in-memory buffer (a later
+click on the same answer replaces an unflushed one); a background thread
+writes the buffer in one transaction every FEEDBACK_FLUSH_SECONDS (default
+1), and shutdown() writes whatever is left.
+
+Each answer's job descriptions are recorded too (record_sources, called when
+the answer is saved), so stats() can aggregate ratings per day, chat or JD
+with one indexed GROUP BY instead of scanning files.
+
+Existing feedback_*.json files are imported once, the first time the store
+is opened, and then left alone on disk.
+"""
+import glob
 import json
+import logging
 import os
+import threading
 from datetime import datetime
 
+from . import db
 
-def log_feedback(session_id: int, message_index: int, question: str, rating: int) -> None:
-    feedback_file = f"feedback_{datetime.now().strftime('%Y-%m-%d')}.json"
-    entry = {
-        "session_id": session_id,
-        "message_index": message_index,
-        "question": question,
-        "rating": rating,
-        "timestamp": datetime.now().isoformat(),
-    }
-
-    data = []
-    if os.path.exists(feedback_file):
+logger = logging.getLogger(__name__)
+
+FEEDBACK_FLUSH_SECONDS = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "1"))
+LEGACY_FEEDBACK_GLOB = "feedback_*.json"
+STATS_GROUPS = ("day", "chat", "jd")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    session_id    INTEGER NOT NULL,
+    message_index INTEGER NOT NULL,
+    question      TEXT NOT NULL,
+    rating        INTEGER NOT NULL,
+    day           TEXT NOT NULL,
+    timestamp     TEXT NOT NULL,
+    PRIMARY KEY (session_id, message_index)
+);
+CREATE INDEX IF NOT EXISTS feedback_day ON feedback(day);
+CREATE TABLE IF NOT EXISTS answer_sources (
+    chat_id       INTEGER NOT NULL,
+    message_index INTEGER NOT NULL,
+    jd_id         TEXT NOT NULL,
+    PRIMARY KEY (chat_id, message_index, jd_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answer_sources_jd ON answer_sources(jd_id);
+"""
+
+_UPSERT = (
+    "INSERT INTO feedback (session_id, message_index, question, rating, day, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(session_id, message_index) DO UPDATE SET question = excluded.question, "
+    "rating = excluded.rating, day = excluded.day, timestamp = excluded.timestamp"
+)
+
+_pending = {}  # (session_id, message_index) -> row tuple for _UPSERT
+_pending_lock = threading.Lock()
+# Held across swap and commit so two flushes (the flusher thread and the one
+# stats() triggers) can't commit out of order and let an older rating win.
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+_stopping = False
+
+
+def _conn():
+    if db.ensure_schema("feedback", _SCHEMA):
+        _import_legacy_json()
+    return db.get_connection()
+
+
+def _import_legacy_json() -> None:
+    """One-time import of existing feedback_YYYY-MM-DD.json files."""
+    if db.get_meta("feedback_json_imported"):
+        return
+    rows = []
+    for path in sorted(glob.glob(LEGACY_FEEDBACK_GLOB)):
         try:
-            with open(feedback_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.error(f"Skipping unreadable feedback file {path}: {e}")
+            continue
+        for entry in entries:
+            timestamp = entry.get("timestamp", "")
+            rows.append((entry["session_id"], entry["message_index"], entry.get("question", ""),
+                         entry["rating"], timestamp[:10], timestamp))
+    with db.transaction() as conn:
+        # Files are read oldest first, so the latest rating of an answer wins.
+        conn.executemany(_UPSERT, rows)
+    db.set_meta("feedback_json_imported", datetime.now().isoformat())
+
+
+def _ensure_flusher() -> None:
+    global _flusher, _stopping
+    if _flusher is None or not _flusher.is_alive():
+        _stopping = False
+        _flusher = threading.Thread(target=_flush_loop, name="feedback-flush", daemon=True)
+        _flusher.start()
+
+
+def _flush_loop() -> None:
+    while not _stopping:
+        _wake.wait(FEEDBACK_FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Feedback flush failed: {e}")
+
+
+def flush() -> None:
+    """Writes every buffered rating now, in one transaction."""
+    with _flush_lock:
+        with _pending_lock:
+            if not _pending:
+                return
+            rows = list(_pending.values())
+            _pending.clear()
+        _conn()
+        try:
+            with db.transaction() as conn:
+                conn.executemany(_UPSERT, rows)
         except Exception:
-            data = []
+            # Put them back unless a newer rating arrived meanwhile.
+            with _pending_lock:
+                for row in rows:
+                    _pending.setdefault((row[0], row[1]), row)
+            raise
+
+
+def shutdown() -> None:
+    """Stops the flusher and writes whatever is still buffered."""
+    global _stopping, _flusher
+    _stopping = True
+    _wake.set()
+    _flusher = None
+    flush()
+
+
+def log_feedback(session_id: int, message_index: int, question: str, rating: int) -> None:
+    now = datetime.now()
+    with _pending_lock:
+        _pending[(session_id, message_index)] = (
+            session_id, message_index, question, rating, now.strftime("%Y-%m-%d"), now.isoformat(),
+        )
+    _ensure_flusher()
+
+
+def record_sources(chat_id: int, message_index: int, jd_ids) -> None:
+    """Which job descriptions the answer at message_index was grounded in."""
+    if not jd_ids:
+        return
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO answer_sources (chat_id, message_index, jd_id) VALUES (?, ?, ?)",
+            [(chat_id, message_index, str(jd_id)) for jd_id in jd_ids],
+        )
 
-    for existing in data:
-        if existing["session_id"] == session_id and existing["message_index"] == message_index:
-            existing.update(entry)
-            break
-    else:
-        data.append(entry)
 
-    with open(feedback_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+def stats(group_by: str = "day", since=None, until=None) -> list:
+    """Ratings aggregated per day, chat or JD, optionally limited to days
+    in [since, until] (YYYY-MM-DD). One row per group: count, average and
+    a count per star (1-5). An answer grounded in several JDs counts
+    towards each of them."""
+    if group_by not in STATS_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(STATS_GROUPS)}")
+    flush()
+    key = {"day": "f.day", "chat": "f.session_id", "jd": "s.jd_id"}[group_by]
+    join = ("JOIN answer_sources s ON s.chat_id = f.session_id AND s.message_index = f.message_index"
+            if group_by == "jd" else "")
+    clauses, params = [], []
+    if since:
+        clauses.append("f.day >= ?")
+        params.append(since)
+    if until:
+        clauses.append("f.day <= ?")
+        params.append(until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    star_counts = ", ".join(f"SUM(f.rating = {star}) AS stars_{star}" for star in range(1, 6))
+    rows = _conn().execute(
+        f"SELECT {key} AS key, COUNT(*) AS count, AVG(f.rating) AS average, {star_counts} "
+        f"FROM feedback f {join} {where} GROUP BY {key} ORDER BY {key}",
+        params,
+    )
+    return [
+        {
+            group_by: row["key"],
+            "count": row["count"],
+            "average": round(row["average"], 3),
+            "ratings": {str(star): row[f"stars_{star}"] for star in range(1, 6)},
+        }
+        for row in rows
+    ]
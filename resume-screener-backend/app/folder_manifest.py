@@ -0,0 +1,52 @@
+"""
+What vector_store.sync_pdfs_folder last indexed from each folder: one row per
+file with its size, mtime and SHA-256. A file whose size and mtime are
+unchanged is skipped without being read; one whose bytes changed is
+re-indexed; a row whose file has gone away means its document gets removed.
+"""
+from . import db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folder_manifest (
+    folder  TEXT NOT NULL,
+    path    TEXT NOT NULL,
+    doc_id  TEXT NOT NULL,
+    size    INTEGER NOT NULL,
+    mtime   REAL NOT NULL,
+    sha256  TEXT NOT NULL,
+    PRIMARY KEY (folder, path)
+);
+"""
+
+
+def _conn():
+    db.ensure_schema("folder_manifest", _SCHEMA)
+    return db.get_connection()
+
+
+def entries(folder: str) -> dict:
+    """path (relative to folder) -> row dict."""
+    rows = _conn().execute(
+        "SELECT path, doc_id, size, mtime, sha256 FROM folder_manifest WHERE folder = ?", (folder,)
+    )
+    return {row["path"]: dict(row) for row in rows}
+
+
+def record(folder: str, rows) -> None:
+    """Upserts (path, doc_id, size, mtime, sha256) rows."""
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO folder_manifest (folder, path, doc_id, size, mtime, sha256) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(folder, path) DO UPDATE SET doc_id = excluded.doc_id, size = excluded.size, "
+            "mtime = excluded.mtime, sha256 = excluded.sha256",
+            [(folder, *row) for row in rows],
+        )
+
+
+def remove(folder: str, paths) -> None:
+    _conn()
+    with db.transaction() as conn:
+        conn.executemany(
+            "DELETE FROM folder_manifest WHERE folder = ? AND path = ?", [(folder, path) for path in paths]
+        )
@@ -0,0 +1,289 @@
+"""
+Background indexing jobs. Uploading 50 job descriptions or syncing a folder
+of thousands takes minutes of parsing and embedding, far longer than an HTTP
+request should stay open, so the endpoints only queue the work here and
+return a job id. Clients poll GET /api/vector-db/jobs/{id}, or follow
+GET /api/vector-db/jobs/{id}/events for per-file progress as NDJSON.
+
+The queue itself, job status and events live in the shared SQLite database
+(see db.py), so a job can be submitted by any worker process. One background
+thread works through it, and only in the index writer (see deployment.py),
+so Chroma writes from different jobs or processes never interleave. Upload
+jobs waiting next to each other are taken together (up to
+INGEST_MAX_BATCH_JOBS) and go through one vector_store.ingest_files call,
+so their chunks share embedding batches. The thread is woken straight away
+by submissions from its own process and polls every INGEST_POLL_SECONDS
+(default 1) for ones from other workers.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from . import db, deployment, vector_store
+
+logger = logging.getLogger(__name__)
+
+INGEST_MAX_BATCH_JOBS = int(os.getenv("INGEST_MAX_BATCH_JOBS", "16"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "1"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    processed   INTEGER NOT NULL DEFAULT 0,
+    total       INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    created_at  TEXT NOT NULL,
+    finished_at TEXT,
+    payload     TEXT
+);
+CREATE INDEX IF NOT EXISTS ingest_jobs_status ON ingest_jobs(status);
+CREATE TABLE IF NOT EXISTS ingest_job_events (
+    job_id TEXT NOT NULL REFERENCES ingest_jobs(id) ON DELETE CASCADE,
+    seq    INTEGER NOT NULL,
+    event  TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+_cond = threading.Condition()
+_worker = None
+_stopping = False
+
+
+def _conn():
+    if db.ensure_schema("ingest_jobs", _SCHEMA):
+        _migrate()
+    return db.get_connection()
+
+
+def _migrate() -> None:
+    """Adds the payload column to a table from before the queue lived here."""
+    conn = db.get_connection()
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(ingest_jobs)")}
+    if "payload" not in columns:
+        with db.transaction() as conn:
+            conn.execute("ALTER TABLE ingest_jobs ADD COLUMN payload TEXT")
+            # Their payloads were only ever in memory.
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'failed', error = 'lost in a restart' "
+                "WHERE status IN ('queued', 'running')"
+            )
+
+
+def _ensure_worker() -> None:
+    global _worker, _stopping
+    if _worker is None or not _worker.is_alive():
+        _stopping = False
+        _worker = threading.Thread(target=_work, name="ingest", daemon=True)
+        _worker.start()
+
+
+def shutdown() -> None:
+    """Stops the worker after the job it's on; queued jobs stay 'queued' and
+    run when the writer next starts."""
+    global _stopping, _worker
+    with _cond:
+        _stopping = True
+        _cond.notify_all()
+    _worker = None
+
+
+def _update(job_id: str, **fields) -> None:
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with db.transaction() as conn:
+        conn.execute(f"UPDATE ingest_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _append_event(job_id: str, event: dict) -> None:
+    with db.transaction() as conn:
+        seq = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM ingest_job_events WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO ingest_job_events (job_id, seq, event) VALUES (?, ?, ?)",
+            (job_id, seq, json.dumps({**event, "seq": seq}, ensure_ascii=False)),
+        )
+
+
+def _finish(job_id: str, status: str, result=None, error=None) -> None:
+    _update(job_id, status=status, result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+            error=error, finished_at=datetime.now().isoformat())
+    _append_event(job_id, {"type": "done", "status": status, "result": result, "error": error})
+
+
+def _claim_batch():
+    """Marks the next queued job running, plus any upload jobs queued right
+    behind an upload job, and returns them as (job_id, kind, payload)."""
+    _conn()
+    with db.transaction() as conn:
+        rows = conn.execute(
+            "SELECT id, kind, payload FROM ingest_jobs WHERE status = 'queued' ORDER BY rowid LIMIT ?",
+            (INGEST_MAX_BATCH_JOBS,),
+        ).fetchall()
+        batch = []
+        for row in rows:
+            if batch and not (batch[0][1] == "upload" and row["kind"] == "upload"):
+                break
+            batch.append((row["id"], row["kind"], json.loads(row["payload"])))
+        conn.executemany("UPDATE ingest_jobs SET status = 'running' WHERE id = ?", [(job[0],) for job in batch])
+    return batch
+
+
+def _take_batch():
+    """Waits until this process is the index writer and a job is queued."""
+    while True:
+        with _cond:
+            if _stopping:
+                return []
+        batch = _claim_batch() if deployment.is_index_writer() else []
+        if batch:
+            return batch
+        with _cond:
+            if not _stopping:
+                _cond.wait(INGEST_POLL_SECONDS)
+
+
+def _fail_interrupted(claimed) -> None:
+    """Fails jobs left 'running' by a writer that exited mid-job. Only the
+    writer runs jobs, so once this process is it, any running job other
+    than the batch it just claimed has been abandoned."""
+    rows = _conn().execute("SELECT id FROM ingest_jobs WHERE status = 'running'").fetchall()
+    for row in rows:
+        if row["id"] not in claimed:
+            _finish(row["id"], "failed", error="interrupted: the indexing process exited mid-job")
+
+
+def _run_function(job_id: str, payload) -> None:
+    module, _, name = payload["fn"].partition(":")
+    fn = getattr(importlib.import_module(module), name)
+    args = payload["args"]
+
+    def progress(processed: int, total: int) -> None:
+        _update(job_id, processed=processed, total=total)
+        _append_event(job_id, {"type": "progress", "processed": processed, "total": total})
+
+    result = fn(*args, progress=progress)
+    _finish(job_id, "done", result)
+
+
+def _run_uploads(batch) -> None:
+    results, items = {}, []
+    for job_id, _, files in batch:
+        results[job_id] = {"indexed": [], "failed": []}
+        _update(job_id, total=len(files))
+        items.extend((path, doc_id, tags, job_id) for path, doc_id, tags in files)
+
+    def on_file(item, error):
+        path, doc_id, _, job_id = item
+        result = results[job_id]
+        if error:
+            result["failed"].append({"id": doc_id, "error": error})
+        else:
+            result["indexed"].append(doc_id)
+        _update(job_id, processed=len(result["indexed"]) + len(result["failed"]))
+        _append_event(job_id, {"type": "file", "id": doc_id, "status": "failed" if error else "indexed",
+                               "error": error})
+        if os.path.exists(path):
+            os.remove(path)
+
+    try:
+        vector_store.ingest_files(items, on_file)
+    finally:
+        for path, *_ in items:
+            if os.path.exists(path):
+                os.remove(path)
+    for job_id, result in results.items():
+        _finish(job_id, "failed" if result["failed"] and not result["indexed"] else "done", result)
+
+
+def _work() -> None:
+    recovered = False
+    while True:
+        batch = _take_batch()
+        if not batch:
+            return
+        if not recovered:
+            _fail_interrupted({job_id for job_id, _, _ in batch})
+            recovered = True
+        try:
+            if batch[0][1] == "upload":
+                _run_uploads(batch)
+            else:
+                _run_function(batch[0][0], batch[0][2])
+        except Exception as e:
+            logger.error(f"Ingest job(s) {[job_id for job_id, _, _ in batch]} failed: {e}")
+            for job_id, _, _ in batch:
+                _finish(job_id, "failed", error=str(e))
+
+
+def _enqueue(kind: str, payload) -> dict:
+    _conn()
+    job_id = uuid.uuid4().hex
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO ingest_jobs (id, kind, status, created_at, payload) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, kind, datetime.now().isoformat(), json.dumps(payload, ensure_ascii=False)),
+        )
+    with _cond:
+        _ensure_worker()
+        _cond.notify()
+    return get_job(job_id)
+
+
+def start() -> None:
+    """Starts the worker (startup hook), so jobs queued before a restart or
+    by other workers run without waiting for a new submission."""
+    _conn()
+    with _cond:
+        _ensure_worker()
+
+
+def submit(kind: str, fn, *args) -> dict:
+    """Queues fn(*args, progress=callback) and returns the new job record.
+    fn must be a module-level function and args JSON-serializable, since
+    the job may run in another worker process. fn reports progress as
+    callback(processed, total) and returns a JSON-serializable result."""
+    return _enqueue(kind, {"fn": f"{fn.__module__}:{fn.__qualname__}", "args": list(args)})
+
+
+def submit_upload(files) -> dict:
+    """Queues (temp_path, doc_id, tags) files for indexing; an existing doc
+    id is replaced. The job deletes each temp file once it's done with it."""
+    return _enqueue("upload", list(files))
+
+
+def get_job(job_id: str):
+    row = _conn().execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job.pop("payload", None)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def events_after(job_id: str, after: int = 0) -> list:
+    rows = _conn().execute(
+        "SELECT event FROM ingest_job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+    )
+    return [json.loads(row["event"]) for row in rows]
+
+
+async def wait_for(job_id: str, timeout: float) -> dict:
+    """Polls until the job is done or failed, or `timeout` seconds pass;
+    returns the job record either way."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await asyncio.to_thread(get_job, job_id)
+        if job["status"] in ("done", "failed") or loop.time() >= deadline:
+            return job
+        await asyncio.sleep(0.2)
@@ -0,0 +1,155 @@
+"""
+Persistent BM25 inverted index over job-description chunks, for hybrid
+retrieval. Pure vector search tends to miss queries that hinge on one exact
+token — a requisition code, a job title, a rare skill like "Kafka" or
+"SOC2" — because bge-small smears those into the rest of the sentence.
+
+Postings live in the shared SQLite database (see db.py), keyed by the same
+chunk ids as Chroma. vector_store adds and removes postings alongside every
+Chroma write, and backfills the index from the collection once. A lookup
+reads the query terms' document frequencies, then scores and ranks in
+SQLite, returning only the top k.
+
+reciprocal_rank_fusion() combines this ranking with Chroma's dense one; see
+rag_chatbot.retrieve_documents (RETRIEVAL_MODE=hybrid).
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+from . import db
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were will with "
+    "you your we our they their".split()
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lexical_chunks (
+    chunk_id  TEXT PRIMARY KEY,
+    parent_id TEXT NOT NULL,
+    length    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lexical_chunks_parent ON lexical_chunks(parent_id);
+CREATE TABLE IF NOT EXISTS lexical_postings (
+    term     TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    tf       INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lexical_postings_chunk ON lexical_postings(chunk_id);
+"""
+
+# (chunk count, average length), recomputed lazily after writes.
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    return [t.rstrip(".") for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _conn():
+    db.ensure_schema("lexical_index", _SCHEMA)
+    return db.get_connection()
+
+
+def invalidate_stats() -> None:
+    """Forgets the cached corpus stats, e.g. after another process wrote the index."""
+    global _stats
+    with _stats_lock:
+        _stats = None
+
+
+def _corpus_stats():
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            count, avg_length = _conn().execute("SELECT COUNT(*), AVG(length) FROM lexical_chunks").fetchone()
+            _stats = (count, avg_length or 1.0)
+        return _stats
+
+
+def add_chunks(chunks) -> None:
+    """Indexes (chunk_id, parent_id, text) triples, replacing any existing
+    postings for the same chunk ids."""
+    _conn()
+    with db.transaction() as conn:
+        for chunk_id, parent_id, text in chunks:
+            terms = Counter(tokenize(text))
+            conn.execute("DELETE FROM lexical_postings WHERE chunk_id = ?", (chunk_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO lexical_chunks (chunk_id, parent_id, length) VALUES (?, ?, ?)",
+                (chunk_id, parent_id, sum(terms.values())),
+            )
+            conn.executemany(
+                "INSERT INTO lexical_postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                [(term, chunk_id, tf) for term, tf in terms.items()],
+            )
+    invalidate_stats()
+
+
+def delete_chunks(chunk_ids) -> None:
+    _conn()
+    with db.transaction() as conn:
+        for chunk_id in chunk_ids:
+            conn.execute("DELETE FROM lexical_postings WHERE chunk_id = ?", (chunk_id,))
+            conn.execute("DELETE FROM lexical_chunks WHERE chunk_id = ?", (chunk_id,))
+    invalidate_stats()
+
+
+def delete_parent(parent_id: str) -> None:
+    """Drops every chunk of one document."""
+    conn = _conn()
+    chunk_ids = [row[0] for row in conn.execute(
+        "SELECT chunk_id FROM lexical_chunks WHERE parent_id = ?", (parent_id,)
+    )]
+    delete_chunks(chunk_ids + [parent_id])
+
+
+def search(query: str, k: int) -> list:
+    """(chunk_id, BM25 score) for the k best-matching chunks, best first."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    count, avg_length = _corpus_stats()
+    if count == 0:
+        return []
+    conn = _conn()
+    placeholders = ",".join("?" * len(terms))
+    # Document frequencies come straight off the (term, chunk_id) primary
+    # key; the BM25 sum, ORDER BY and LIMIT then run in SQLite, so a common
+    # term's postings are never all pulled into Python just to keep k.
+    df = conn.execute(
+        f"SELECT term, COUNT(*) FROM lexical_postings WHERE term IN ({placeholders}) GROUP BY term",
+        terms,
+    ).fetchall()
+    if not df:
+        return []
+    idf = [(term, math.log(1 + (count - n + 0.5) / (n + 0.5))) for term, n in df]
+    values = ",".join("(?, ?)" for _ in idf)
+    rows = conn.execute(
+        f"WITH q(term, idf) AS (VALUES {values}) "
+        f"SELECT p.chunk_id, SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * c.length / ?))) AS score "
+        f"FROM q JOIN lexical_postings p ON p.term = q.term "
+        f"JOIN lexical_chunks c ON c.chunk_id = p.chunk_id "
+        f"GROUP BY p.chunk_id ORDER BY score DESC LIMIT ?",
+        [x for pair in idf for x in pair] + [BM25_K1, BM25_K1, BM25_B, BM25_B, avg_length, k],
+    ).fetchall()
+    return [(chunk_id, score) for chunk_id, score in rows]
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K) -> list:
+    """Fuses several best-first lists of ids: score(id) = sum of
+    1 / (k + rank) over the lists it appears in. Returns ids, best first."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] += 1.0 / (k + rank)
+    return [item for item, _ in fused.most_common()]
@@ -0,0 +1,372 @@
+"""
+Every LLM call goes through here. aanswer_query used to send each request
+straight to Groq: no concurrency limit, no queue, and a 429 from the
+provider just became an error string in the answer. When a whole team hit
+"screen" at once, the burst went over the rate limit, Groq answered with a
+storm of 429s, and everyone waited longer.
+
+astream() now, in order:
+  * coalesces identical in-flight prompts (same model, same rendered
+    messages) into one upstream call. Whoever asks while it is running gets
+    every chunk streamed so far and then the rest as it arrives. The call is
+    cancelled only when its last listener has gone;
+  * admits calls through two token buckets, requests per minute
+    (LLM_RPM) and tokens per minute (LLM_TPM: prompt tokens plus
+    LLM_COMPLETION_ESTIMATE, corrected once the answer is in), and at most
+    LLM_MAX_CONCURRENCY at a time. Waiting calls queue by priority:
+    INTERACTIVE (chat) always goes ahead of BATCH (batch and matrix
+    screening), FIFO within a priority. A batch call that an interactive
+    request joins is promoted;
+  * retries a call that failed before its first chunk with a 429, 5xx or
+    connection error, up to LLM_MAX_RETRIES times, with full-jitter
+    exponential backoff (or the provider's Retry-After). A 429 also pauses
+    admission for everybody until then.
+  * applies backpressure. Once LLM_MAX_QUEUE calls are waiting, admission()
+    raises Overloaded with a Retry-After estimate (the chat endpoint answers
+    429), and otherwise reports the queue position a new call would take.
+
+  LLM_RPM                  requests per minute (default 30, 0 = no limit)
+  LLM_TPM                  tokens per minute (default 0 = no limit)
+  LLM_WORKERS              MULTI_WORKER only: worker processes sharing
+                           LLM_RPM/LLM_TPM (default $WEB_CONCURRENCY, else 1)
+  LLM_MAX_CONCURRENCY      upstream calls at once, per worker (default 8)
+  LLM_MAX_QUEUE            calls allowed to wait (default 100)
+  LLM_COMPLETION_ESTIMATE  completion tokens reserved per call (default 512)
+  LLM_MAX_RETRIES          retries of a failed call (default 3)
+  LLM_RETRY_BASE_SECONDS   first backoff step (default 1, doubling, max 30)
+
+The scheduler lives on the event loop and keeps no locks: every state change
+happens on the loop thread. It is per process, so in multi-worker mode (see
+deployment.py) LLM_RPM and LLM_TPM are the whole deployment's budget and each
+worker admits calls within an even 1/LLM_WORKERS share of them. Set
+LLM_WORKERS to the --workers count; uvicorn's WEB_CONCURRENCY is used if set.
+The queue, concurrency and 429 pauses stay per worker.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import time
+
+from . import deployment, metrics
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+LLM_WORKERS = 1
+if deployment.MULTI_WORKER:
+    LLM_WORKERS = max(1, int(os.getenv("LLM_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "512"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+_MAX_BACKOFF_SECONDS = 30.0
+
+INTERACTIVE = 0
+BATCH = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+queue_seconds = metrics.Histogram("llm_queue_seconds", "Time LLM calls waited for admission.", ["priority"])
+upstream_total = metrics.Counter(
+    "llm_upstream_total", "LLM calls by outcome (ok, error, retry, coalesced, rejected).", ["outcome"]
+)
+
+
+class Overloaded(Exception):
+    """The admission queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute`/60 per second.
+    Its level may go negative when a call used more than it reserved."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` (at most a full bucket) can be taken."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.level -= amount
+
+
+class _Flight:
+    """One upstream call and everyone listening to it."""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.ticket = None  # its entry in the admission queue while waiting
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.listeners = 0
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class _Scheduler:
+    def __init__(self, loop):
+        self.loop = loop
+        # This worker's share of the deployment-wide budget.
+        self.requests = _Bucket(LLM_RPM / LLM_WORKERS)
+        self.tokens = _Bucket(LLM_TPM / LLM_WORKERS)
+        self.running = 0
+        self.paused_until = 0.0
+        self.waiting = []  # heap of [priority, seq] tickets
+        self.seq = itertools.count()
+        self.flights = {}
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def position(self, ticket) -> int:
+        """1-based place in the admission queue."""
+        return sum(1 for other in self.waiting if other < ticket) + 1
+
+    def retry_after(self) -> float:
+        rate = self.requests.capacity / 60 if self.requests.capacity > 0 else LLM_MAX_CONCURRENCY
+        return max(1.0, len(self.waiting) / rate, self.paused_until - time.monotonic())
+
+    def _delay(self, tokens: int) -> float:
+        """Seconds before the queue head may start, or None while every
+        concurrency slot is taken."""
+        if self.running >= LLM_MAX_CONCURRENCY:
+            return None
+        now = time.monotonic()
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now), self.paused_until - now)
+
+    async def admit(self, flight: _Flight, tokens: int, trace=None) -> None:
+        if len(self.waiting) >= LLM_MAX_QUEUE:
+            upstream_total.inc(1, "rejected")
+            raise Overloaded(self.retry_after())
+        ticket = [flight.priority, next(self.seq)]
+        flight.ticket = ticket
+        heapq.heappush(self.waiting, ticket)
+        started = time.perf_counter()
+        try:
+            while True:
+                changed = self.changed
+                timeout = None
+                if self.waiting[0] is ticket:
+                    timeout = self._delay(tokens)
+                    if timeout is not None and timeout <= 0:
+                        break
+                elif trace is not None:
+                    trace.fields["llm_queue_position"] = self.position(ticket)
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self.waiting.remove(ticket)
+            heapq.heapify(self.waiting)
+            flight.ticket = None
+            self.notify()
+            raise
+        heapq.heappop(self.waiting)
+        flight.ticket = None
+        self.running += 1
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        waited = time.perf_counter() - started
+        queue_seconds.observe(waited, _PRIORITY_NAMES[ticket[0]])
+        if trace is not None:
+            trace.add_stage("llm_queue", waited)
+        # The next caller in line may be able to start too.
+        self.notify()
+
+    def release(self, reserved: int, used: int) -> None:
+        self.running -= 1
+        self.tokens.take(used - reserved)
+        self.notify()
+
+    def promote(self, flight: _Flight, priority: int) -> None:
+        if priority < flight.priority:
+            flight.priority = priority
+            if flight.ticket is not None:
+                flight.ticket[0] = priority
+                heapq.heapify(self.waiting)
+                self.notify()
+
+    async def run(self, flight: _Flight, key: str, llm, messages, trace) -> None:
+        reserved = sum(count_tokens(str(m.content)) for m in messages) + LLM_COMPLETION_ESTIMATE
+        try:
+            for attempt in itertools.count():
+                await self.admit(flight, reserved, trace)
+                completion = ""
+                try:
+                    async for chunk in llm.astream(messages):
+                        if chunk.content:
+                            completion += chunk.content
+                            flight.chunks.append(chunk.content)
+                            flight.notify()
+                    upstream_total.inc(1, "ok")
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if flight.chunks or attempt >= LLM_MAX_RETRIES or not _retryable(e):
+                        raise
+                    delay = _retry_delay(e, attempt)
+                    if _status(e) == 429:
+                        # Everybody else would hit the same limit.
+                        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                    upstream_total.inc(1, "retry")
+                    logger.warning(f"LLM call failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                finally:
+                    self.release(reserved, reserved - LLM_COMPLETION_ESTIMATE + count_tokens(completion))
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except BaseException as e:
+            if not isinstance(e, Overloaded):
+                upstream_total.inc(1, "error")
+            flight.error = e
+        finally:
+            flight.done = True
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            flight.notify()
+
+
+def _status(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retryable(error) -> bool:
+    status = _status(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    name = type(error).__name__
+    return "RateLimit" in name or "Connection" in name or "Timeout" in name
+
+
+def _retry_delay(error, attempt: int) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(retry_after, _MAX_BACKOFF_SECONDS)
+    return random.uniform(0, min(_MAX_BACKOFF_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+_scheduler = None
+
+
+def _get() -> _Scheduler:
+    global _scheduler
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler.loop is not loop:
+        _scheduler = _Scheduler(loop)
+    return _scheduler
+
+
+def _flight_key(llm, messages) -> str:
+    model = f"{type(llm).__name__}|{getattr(llm, 'model_name', '')}|{getattr(llm, 'temperature', '')}|{id(llm)}"
+    payload = json.dumps([model, [(m.type, str(m.content)) for m in messages]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def admission(priority: int = INTERACTIVE) -> int:
+    """Where a call made now at `priority` would queue: 0 if it could start
+    straight away, else its 1-based position. Raises Overloaded when the
+    queue is full."""
+    scheduler = _get()
+    if len(scheduler.waiting) >= LLM_MAX_QUEUE:
+        upstream_total.inc(1, "rejected")
+        raise Overloaded(scheduler.retry_after())
+    ahead = sum(1 for ticket in scheduler.waiting if ticket[0] <= priority)
+    if ahead == 0 and scheduler._delay(0) == 0:
+        return 0
+    return ahead + 1
+
+
+async def astream(llm, messages, priority: int = INTERACTIVE, trace=None):
+    """Streams the text of `llm`'s answer to `messages`, admitted, retried
+    and shared with identical in-flight calls as described above. Raises
+    whatever the upstream call finally failed with, or Overloaded."""
+    scheduler = _get()
+    key = _flight_key(llm, messages)
+    flight = scheduler.flights.get(key)
+    if flight is None:
+        flight = _Flight(priority)
+        scheduler.flights[key] = flight
+        flight.task = scheduler.loop.create_task(scheduler.run(flight, key, llm, messages, trace))
+    else:
+        scheduler.promote(flight, priority)
+        upstream_total.inc(1, "coalesced")
+        if trace is not None:
+            trace.fields["llm_coalesced"] = True
+    flight.listeners += 1
+    try:
+        sent = 0
+        while True:
+            changed = flight.changed
+            while sent < len(flight.chunks):
+                sent += 1
+                yield flight.chunks[sent - 1]
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await changed.wait()
+    finally:
+        flight.listeners -= 1
+        if flight.listeners == 0 and not flight.done:
+            flight.task.cancel()
+            if scheduler.flights.get(key) is flight:
+                del scheduler.flights[key]
+
+
+def status() -> dict:
+    """Queue depth per priority and calls in flight, for /api/status."""
+    scheduler = _scheduler
+    share = {"rpm": LLM_RPM / LLM_WORKERS, "tpm": LLM_TPM / LLM_WORKERS}
+    if scheduler is None:
+        return {"running": 0, "waiting": {name: 0 for name in _PRIORITY_NAMES.values()}, "in_flight": 0, **share}
+    waiting = list(scheduler.waiting)
+    return {
+        **share,
+        "running": scheduler.running,
+        "waiting": {name: sum(1 for t in waiting if t[0] == p) for p, name in _PRIORITY_NAMES.items()},
+        "in_flight": len(scheduler.flights),
+        "paused_for": max(0.0, round(scheduler.paused_until - time.monotonic(), 1)),
+    }
@@ -1,14 +1,73 @@
+import logging
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
 
-from dotenv import load_dotenv
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+_import_started = time.perf_counter()
+
+from dotenv import load_dotenv  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse, PlainTextResponse  # noqa: E402
 
 load_dotenv()  # reads .env before anything (rag_chatbot, vector_store) needs the keys
 
-from .routers import chats, vector_db, feedback  # noqa: E402  (import after load_dotenv on purpose)
+from . import (  # noqa: E402
+    deployment, embeddings, feedback_store, ingest_jobs, llm_scheduler, metrics, pdf_extraction, screening_store,
+    vector_store,
+)
+from .rag_chatbot import get_system_status  # noqa: E402
+from .resume_cache import resume_cache  # noqa: E402
+from .session_memory import sessions  # noqa: E402
+from .routers import candidates, chats, vector_db, feedback, screenings  # noqa: E402  (import after load_dotenv on purpose)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# Set EMBEDDINGS_WARMUP=0 to skip loading the embedding model at startup and
+# let the first query pay for it instead.
+EMBEDDINGS_WARMUP = os.getenv("EMBEDDINGS_WARMUP", "1") != "0"
+
+logger = logging.getLogger(__name__)
+
+metrics.Gauge("rag_warm_sessions", "Chats with a warm memory window.", lambda: len(sessions))
+metrics.Gauge("resume_cache_hit_rate", "Extracted-resume cache hit rate.",
+              lambda: resume_cache.stats()["hit_rate"])
+
+
+def startup_report() -> dict:
+    return {"import_seconds": round(IMPORT_SECONDS, 3), "embeddings": embeddings.status()}
+
+
+def _warm_embeddings():
+    embeddings.warm_up()
+    logger.info(f"Startup timing: {startup_report()}")
+
 
-app = FastAPI(title="Resume Screener API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Startup timing: imports took {IMPORT_SECONDS:.2f}s.")
+    # Open the shared Chroma handle once, here, so /api/status only ever
+    # reads its cached counters.
+    vector_store.open_existing()
+    # Picks up jobs queued before a restart or by other workers; only runs
+    # them in the index writer (see deployment.py).
+    ingest_jobs.start()
+    # Screenings left 'running' by a process that has since exited would
+    # otherwise keep their clients polling forever.
+    screening_store.fail_interrupted()
+    if EMBEDDINGS_WARMUP:
+        # Background thread, so /api/health answers while the model loads.
+        threading.Thread(target=_warm_embeddings, name="embeddings-warmup", daemon=True).start()
+    yield
+    feedback_store.shutdown()
+    ingest_jobs.shutdown()
+    pdf_extraction.shutdown()
+    vector_store.close()
+    deployment.release()
+
+
+app = FastAPI(title="Resume Screener API", lifespan=lifespan)
 frontend_origins = [
     origin.strip()
     for origin in os.getenv("FRONTEND_ORIGIN", "http://localhost:5173").split(",")
@@ -20,12 +79,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Resume-Prescores", "X-LLM-Queue-Position", "Retry-After"],
 )
 app.include_router(chats.router)
 app.include_router(vector_db.router)
 app.include_router(feedback.router)
+app.include_router(screenings.router)
+app.include_router(candidates.router)
 
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/api/status")
+def status():
+    """Readiness from cached counters (no Chroma or model access), cheap
+    enough to poll many times a second. 503 until the embedding model is
+    loaded, unless EMBEDDINGS_WARMUP=0 deferred it to the first query."""
+    report = get_system_status()
+    report["ready"] = report["embedding_model_loaded"] or not EMBEDDINGS_WARMUP
+    report["worker"] = deployment.status()
+    report["llm"] = llm_scheduler.status()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/api/startup")
+def startup_timing():
+    """How long imports and the embedding model load took for this process."""
+    return startup_report()
+
+
+@app.get("/api/resume-cache/stats")
+def resume_cache_stats():
+    """Hit rate and size of the extracted-resume cache, for sizing RESUME_CACHE_MAX_BYTES."""
+    return resume_cache.stats()
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-stage latency histograms, token counts and request outcomes in the
+    Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
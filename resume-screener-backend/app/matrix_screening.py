@@ -0,0 +1,237 @@
+"""
+Matrix screening: M resumes against N job descriptions at once. Screening
+so far meant one free-text JD query per call (extract_job_query plus the
+retriever), so finding which open role fits each of a stack of candidates
+took M×N LLM calls, or M calls per JD re-run by hand for every role.
+
+Here the whole table comes from one matrix product:
+  * every resume is embedded in one batch (prerank.resume_vectors, so
+    embeddings already in resume_cache are reused);
+  * the stored chunk vectors of the selected JDs (or of every indexed JD)
+    are read straight from the Chroma collection, nothing re-embedded;
+  * (M × d) @ (d × chunks) gives every resume-chunk similarity, and a
+    resume's score for a JD is its best-matching chunk of that JD — the
+    same dense score prerank uses.
+
+The result is ranked both ways: each resume's best JDs, and each JD's best
+resumes. Only if asked, the `narrate` best pairs (each resume's top JD, best
+resumes first) go to the LLM for a written screening against that one JD,
+up to SCREENING_CONCURRENCY at a time and at batch priority in
+llm_scheduler.
+
+  MATRIX_MAX_JDS        JDs scored when none are selected (default 200);
+                        with more indexed, jd_ids has to pick them
+  MATRIX_MAX_NARRATIVES cap on LLM narratives per request (default 10)
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import aclosing
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from . import context_budget, doc_registry, llm_scheduler, metrics, prerank, vector_store
+from .batch_screening import SCREENING_CONCURRENCY, extract_match_score
+from .rag_chatbot import SCREEN_MARKER, get_context_with_metadata, stream_llm
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+MATRIX_MAX_JDS = int(os.getenv("MATRIX_MAX_JDS", "200"))
+MATRIX_MAX_NARRATIVES = int(os.getenv("MATRIX_MAX_NARRATIVES", "10"))
+# Chunks read from Chroma per get() when loading JD vectors.
+_LOAD_PAGE_SIZE = 5000
+
+_NARRATIVE_QUERY = (
+    "Screen this resume against the job description above only. Give a match "
+    "score (0-100%), strengths, weaknesses and a recommendation."
+)
+
+
+def load_jd_vectors(jd_ids=None):
+    """(jd_ids, normalized chunk matrix, column -> JD index) for the given
+    JDs, or every indexed JD when jd_ids is empty. Columns are grouped by JD
+    in jd_ids order. Raises LookupError listing selected ids with no
+    vectors, and ValueError when there is nothing to score or, with no JDs
+    selected, more than MATRIX_MAX_JDS are indexed. When defaulted to every
+    JD, registered ones without vectors (nothing indexed) are skipped."""
+    collection = vector_store.get_vectorstore()._collection
+    selected = bool(jd_ids)
+    if selected:
+        jd_ids = list(dict.fromkeys(jd_ids))
+    else:
+        jd_ids = sorted(doc_registry.ids())
+        if len(jd_ids) > MATRIX_MAX_JDS:
+            raise ValueError(
+                f"{len(jd_ids)} job descriptions are indexed; select at most {MATRIX_MAX_JDS} with jd_ids"
+            )
+    if not jd_ids:
+        raise ValueError("No job descriptions are indexed yet")
+
+    position = {jd_id: i for i, jd_id in enumerate(jd_ids)}
+    vectors, owners = [], []
+    for start in range(0, len(jd_ids), _LOAD_PAGE_SIZE):
+        batch = jd_ids[start:start + _LOAD_PAGE_SIZE]
+        for where, ids in (({"parent_id": {"$in": batch}}, None), (None, batch)):
+            # The second get() picks up entries indexed before chunking,
+            # stored as one vector under the doc id itself.
+            offset = 0
+            while True:
+                results = collection.get(
+                    ids=ids, where=where, include=["embeddings", "metadatas"],
+                    limit=_LOAD_PAGE_SIZE, offset=offset,
+                )
+                for chunk_id, metadata, embedding in zip(results["ids"], results["metadatas"], results["embeddings"]):
+                    parent = (metadata or {}).get("parent_id") or chunk_id
+                    if parent in position and (where is not None or parent == chunk_id):
+                        vectors.append(embedding)
+                        owners.append(position[parent])
+                if ids is not None or len(results["ids"]) < _LOAD_PAGE_SIZE:
+                    break
+                offset += _LOAD_PAGE_SIZE
+
+    found = set(owners)
+    missing = [jd_id for i, jd_id in enumerate(jd_ids) if i not in found]
+    if missing and selected:
+        raise LookupError(", ".join(missing))
+    if missing:
+        logger.info(f"Matrix screening skips {len(missing)} job description(s) with no indexed text")
+        kept = [i for i in range(len(jd_ids)) if i in found]
+        if not kept:
+            raise ValueError("No job descriptions are indexed yet")
+        renumber = {old: new for new, old in enumerate(kept)}
+        jd_ids = [jd_ids[i] for i in kept]
+        owners = [renumber[i] for i in owners]
+    owners = np.asarray(owners, dtype=np.int64)
+    order = np.argsort(owners, kind="stable")
+    matrix = np.asarray(vectors, dtype=np.float32)[order]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return jd_ids, matrix, owners[order]
+
+
+def score_matrix(resume_matrix: np.ndarray, jd_matrix: np.ndarray, owners: np.ndarray, n_jds: int) -> np.ndarray:
+    """(M × N) scores: for each resume and JD, the best similarity between
+    the resume and any of that JD's chunks. `owners` must be sorted, with
+    every JD in 0..n_jds-1 present."""
+    similarities = resume_matrix @ jd_matrix.T  # (M × chunks)
+    starts = np.searchsorted(owners, np.arange(n_jds))
+    return np.maximum.reduceat(similarities, starts, axis=1)
+
+
+def rank(scores: np.ndarray, resumes, jds: list, top_k: int) -> dict:
+    """The assignment table: each resume's top_k JDs (resumes ordered by
+    their best score) and each JD's top_k resumes."""
+    top_k = max(1, min(top_k, scores.shape[1]))
+    by_resume = []
+    for i in np.argsort(-scores.max(axis=1), kind="stable"):
+        order = np.argsort(-scores[i], kind="stable")[:top_k]
+        by_resume.append({
+            "filename": resumes[i].filename,
+            "index": int(i),
+            "matches": [{**jds[j], "score": round(float(scores[i, j]), 4)} for j in order],
+        })
+    by_jd = []
+    for j, jd in enumerate(jds):
+        order = np.argsort(-scores[:, j], kind="stable")[:min(top_k, scores.shape[0])]
+        by_jd.append({
+            **jd,
+            "candidates": [
+                {"filename": resumes[i].filename, "index": int(i), "score": round(float(scores[i, j]), 4)}
+                for i in order
+            ],
+        })
+    return {"by_resume": by_resume, "by_jd": by_jd}
+
+
+def _jd_context(jd_id: str, query_tokens: int) -> str:
+    results = vector_store.get_vectorstore()._collection.get(
+        where={"parent_id": jd_id}, include=["documents", "metadatas"]
+    )
+    if not results["ids"]:
+        results = vector_store.get_vectorstore()._collection.get(ids=[jd_id], include=["documents", "metadatas"])
+    docs = [Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(results["documents"], results["metadatas"])]
+    docs.sort(key=lambda d: d.metadata.get("chunk_index", 0))
+    docs, _ = context_budget.select_chunks(docs, context_budget.jd_budget(query_tokens, 0))
+    return get_context_with_metadata(docs)
+
+
+async def _narrate(resume, jd: dict, score: float, semaphore) -> dict:
+    trace = metrics.RequestTrace("matrix_narrative", jd_id=jd["id"])
+    async with semaphore:
+        try:
+            (text,), report = context_budget.fit_resumes([resume.text])
+            trace.record_trim("resumes", report)
+            query = f"{_NARRATIVE_QUERY}{SCREEN_MARKER}\nResume 1: {resume.filename}\n{text}"
+            with trace.stage("prompt_assembly"):
+                context = await asyncio.to_thread(_jd_context, jd["id"], count_tokens(query))
+            trace.add_tokens("prompt", count_tokens(context) + count_tokens(query))
+            started = time.perf_counter()
+            narrative = ""
+            chain_input = {"input": query, "context": context, "history": []}
+            async with aclosing(stream_llm(chain_input, llm_scheduler.BATCH, trace)) as chunks:
+                async for chunk in chunks:
+                    if not narrative:
+                        trace.mark_first_token()
+                    narrative += chunk
+            trace.add_stage("generation", time.perf_counter() - started)
+            trace.add_tokens("completion", count_tokens(narrative))
+        except Exception as e:
+            logger.error(f"Matrix narrative for {resume.filename} x {jd['id']} failed: {e}")
+            trace.finish("error", error=str(e))
+            return {"filename": resume.filename, **jd, "score": round(score, 4), "error": str(e)}
+    trace.finish("ok")
+    return {
+        "filename": resume.filename,
+        **jd,
+        "score": round(score, 4),
+        "llm_score": extract_match_score(narrative),
+        "narrative": narrative,
+    }
+
+
+async def screen_matrix(resumes, jd_ids=None, top_k: int = 3, narrate: int = 0) -> dict:
+    """Scores every resume (ExtractedResume list) against the selected JDs
+    (all indexed ones when jd_ids is empty) and returns the ranked table,
+    the full score matrix and, for the `narrate` best pairs, an LLM
+    screening. Raises LookupError / ValueError as load_jd_vectors does."""
+    trace = metrics.RequestTrace("matrix_screening", resumes=len(resumes))
+    try:
+        with trace.stage("jd_vectors"):
+            jd_ids, jd_matrix, owners = await asyncio.to_thread(load_jd_vectors, jd_ids)
+        with trace.stage("resume_embedding"):
+            resume_matrix = await asyncio.to_thread(prerank.resume_vectors, resumes)
+    except Exception:
+        trace.finish("error")
+        raise
+    sources = await asyncio.to_thread(doc_registry.sources_for, jd_ids)
+    jds = [{"id": jd_id, "source": sources.get(jd_id)} for jd_id in jd_ids]
+
+    with trace.stage("similarity"):
+        scores = score_matrix(resume_matrix, jd_matrix, owners, len(jds))
+        table = rank(scores, resumes, jds, top_k)
+
+    narratives = []
+    narrate = max(0, min(narrate, MATRIX_MAX_NARRATIVES, len(resumes)))
+    if narrate:
+        semaphore = asyncio.Semaphore(SCREENING_CONCURRENCY)
+        pairs = [(row["index"], row["matches"][0]) for row in table["by_resume"][:narrate]]
+        with trace.stage("narratives"):
+            narratives = await asyncio.gather(*(
+                _narrate(resumes[i], {"id": match["id"], "source": match["source"]}, match["score"], semaphore)
+                for i, match in pairs
+            ))
+    trace.finish("ok", jds=len(jds), narratives=len(narratives))
+    return {
+        "jds": jds,
+        "resumes": [r.filename for r in resumes],
+        "scores": np.round(scores, 4).tolist(),
+        **table,
+        "narratives": narratives,
+        "timings_ms": {k: round(v * 1000, 2) for k, v in trace.stages.items()},
+    }
+
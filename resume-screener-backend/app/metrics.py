@@ -0,0 +1,201 @@
+"""
+Latency instrumentation for the RAG pipeline. rag_chatbot.log only ever had
+plain info lines, so there was no way to tell whether a slow answer was
+spent parsing PDFs, searching Chroma or waiting on Groq.
+
+Each request gets a RequestTrace. Stages are timed with perf_counter (a few
+hundred nanoseconds each, nothing allocated per chunk while streaming) and
+fed into process-wide Prometheus-style histograms served by GET /api/metrics.
+When the request finishes, one structured JSON log line with every stage,
+time-to-first-token and token counts goes to rag_chatbot.log.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labelvalues) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, labelvalues, [("le", repr(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, *labelvalues) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback, so it costs nothing between scrapes."""
+
+    def __init__(self, name: str, help_text: str, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        _registry.append(self)
+
+    def render(self) -> list:
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram("rag_stage_seconds", "Time spent per pipeline stage.", ["stage"])
+request_seconds = Histogram("rag_request_seconds", "End-to-end request time.", ["kind"])
+time_to_first_token_seconds = Histogram(
+    "rag_time_to_first_token_seconds", "Request start to first streamed chunk.", ["kind"]
+)
+tokens_total = Counter("rag_tokens_total", "Prompt/completion tokens (estimated).", ["direction"])
+context_trimmed_tokens_total = Counter(
+    "rag_context_trimmed_tokens_total", "Tokens cut from prompts by the context budget.", ["part"]
+)
+requests_total = Counter("rag_requests_total", "Finished requests by outcome.", ["kind", "outcome"])
+
+
+class RequestTrace:
+    """Per-request timing. Pass it down explicitly: the handler creates it,
+    then hands it to the async generator that StreamingResponse iterates
+    after the handler has returned, which finishes it once the stream ends."""
+
+    def __init__(self, kind: str, **fields):
+        self.kind = kind
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tokens = {}
+        self.first_token_at = None
+        self.finished = False
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - started)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        stage_seconds.observe(seconds, name)
+
+    def mark_first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            time_to_first_token_seconds.observe(self.first_token_at - self.started, self.kind)
+
+    def add_tokens(self, direction: str, count: int) -> None:
+        self.tokens[direction] = self.tokens.get(direction, 0) + count
+        tokens_total.inc(count, direction)
+
+    def record_trim(self, part: str, report: dict) -> None:
+        """Notes a context_budget report ({"tokens_in", "tokens_out"}) for one
+        part of the prompt."""
+        self.fields.setdefault("context", {})[part] = report
+        trimmed = report["tokens_in"] - report["tokens_out"]
+        if trimmed > 0:
+            context_trimmed_tokens_total.inc(trimmed, part)
+
+    def finish(self, outcome: str = "ok", **fields) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.started
+        request_seconds.observe(total, self.kind)
+        requests_total.inc(1, self.kind, outcome)
+        record = {
+            "event": "rag_request",
+            "kind": self.kind,
+            "outcome": outcome,
+            "total_ms": round(total * 1000, 2),
+            "ttft_ms": round((self.first_token_at - self.started) * 1000, 2) if self.first_token_at else None,
+            "stages_ms": {k: round(v * 1000, 2) for k, v in self.stages.items()},
+            "tokens": self.tokens,
+            **self.fields,
+            **fields,
+        }
+        logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def maybe_stage(trace, name: str):
+    """trace.stage(name) when there is a trace, a no-op otherwise."""
+    if trace is None:
+        yield
+    else:
+        with trace.stage(name):
+            yield
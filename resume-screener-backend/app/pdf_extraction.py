@@ -0,0 +1,162 @@
+"""
+Resume text extraction, kept off the event loop. query_chat used to run
+PyPDFLoader on each uploaded resume one after another inside the async
+handler, so a recruiter uploading 20 resumes froze every other request on
+the worker (other chats' streams, health checks) until the last page was
+parsed.
+
+Extraction now runs in a small process pool, all files at once, straight
+from the uploaded bytes (no temp file needed), through pdf_text.
+Text already extracted from identical bytes comes from resume_cache instead.
+
+Limits:
+  RESUME_PARSE_WORKERS  processes in the pool (default min(4, CPU count))
+  RESUME_PARSE_TIMEOUT  seconds allowed per file (default 30)
+  RESUME_MAX_BYTES      largest accepted upload (default 10 MB)
+
+Note a timed-out parse only stops being waited on — the worker process
+finishes (or keeps chewing on) that file in the background, which is why the
+pool is small and bounded rather than one process per upload.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
+from . import pdf_text
+from .resume_cache import content_digest, resume_cache
+
+RESUME_PARSE_WORKERS = int(os.getenv("RESUME_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+RESUME_PARSE_TIMEOUT = float(os.getenv("RESUME_PARSE_TIMEOUT", "30"))
+RESUME_MAX_BYTES = int(os.getenv("RESUME_MAX_BYTES", str(10 * 1024 * 1024)))
+
+_pool = None
+
+
+class ExtractedResume(NamedTuple):
+    filename: str
+    digest: str  # SHA-256 of the uploaded bytes, the resume_cache key
+    text: str
+    # The resume_cache entry as found at extraction (None on a miss), so
+    # later stages (prerank's embedding) don't look it up, and count, again.
+    cached: dict = None
+
+
+class ExtractionError(Exception):
+    def __init__(self, filename: str, reason: str):
+        super().__init__(f"{filename}: {reason}")
+        self.filename = filename
+        self.reason = reason
+
+
+def extract_text_from_bytes(data: bytes) -> str:
+    """A resume's text, pages joined by blank lines, read straight from
+    memory by pdf_text (fastest parser that reads it well, capped). Runs
+    inside the pool's worker processes."""
+    return pdf_text.extract_text(data)
+
+
+def load_pdf_pages(path: str) -> list:
+    """One Document per page of a job description on disk (metadata as
+    PDFPlumberLoader gave it: source and 0-based page, plus the parser
+    used), for vector_store.ingest_files. Runs inside the pool's worker
+    processes."""
+    from langchain.docstore.document import Document
+
+    return [
+        Document(page_content=page.text, metadata={"source": path, "page": page.number - 1, "parser": page.parser})
+        for page in pdf_text.iter_pages(path)
+    ]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the server process has torch/tokenizer
+        # threads running, and forking those is asking for a deadlock.
+        _pool = ProcessPoolExecutor(
+            max_workers=RESUME_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def map_in_pool(fn, items):
+    """Yields (item, result) as each fn(item) finishes in the pool, with the
+    exception as the result if it failed. Blocking — call from a thread."""
+    global _pool
+    futures = {get_pool().submit(fn, item): item for item in items}
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            _pool = None
+            result = e
+        except Exception as e:
+            result = e
+        yield futures[future], result
+
+
+async def _extract_one(filename: str, data: bytes) -> str:
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(get_pool(), extract_text_from_bytes, data),
+            RESUME_PARSE_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise ExtractionError(filename, f"timed out after {RESUME_PARSE_TIMEOUT:g}s")
+    except BrokenProcessPool as e:
+        # A worker died (e.g. a PDF that crashed the parser); start a fresh
+        # pool for the next request instead of failing forever.
+        _pool = None
+        raise ExtractionError(filename, f"parser crashed ({e})")
+    except Exception as e:
+        raise ExtractionError(filename, str(e))
+
+
+async def read_upload(upload) -> bytes:
+    """Reads a FastAPI UploadFile, enforcing RESUME_MAX_BYTES."""
+    too_big = f"larger than the {RESUME_MAX_BYTES // (1024 * 1024)} MB limit"
+    size = getattr(upload, "size", None)
+    if size is not None and size > RESUME_MAX_BYTES:
+        raise ExtractionError(upload.filename, too_big)
+    data = await upload.read()
+    if len(data) > RESUME_MAX_BYTES:
+        raise ExtractionError(upload.filename, too_big)
+    return data
+
+
+async def _extract_cached(filename: str, data: bytes):
+    digest = content_digest(data)
+    cached = await asyncio.to_thread(resume_cache.get, digest)
+    if cached is not None and "text" in cached:
+        return ExtractedResume(filename, digest, cached["text"], cached)
+    text = await _extract_one(filename, data)
+    await asyncio.to_thread(resume_cache.put, digest, text=text)
+    return ExtractedResume(filename, digest, text)
+
+
+async def extract_resumes(uploads) -> list:
+    """An ExtractedResume for each upload, parsed concurrently in the pool
+    (or served from resume_cache). Raises ExtractionError for the first file,
+    in upload order, that failed."""
+    files = [(upload.filename, await read_upload(upload)) for upload in uploads]
+    results = await asyncio.gather(
+        *(_extract_cached(filename, data) for filename, data in files),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
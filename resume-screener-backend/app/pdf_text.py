@@ -0,0 +1,195 @@
+"""
+One PDF text extractor for job descriptions and resumes. Ingestion used
+PDFPlumberLoader and screening used pypdf. pdfplumber is several times
+slower per page than pypdf (and PyMuPDF faster still), and both loaders
+parsed every page into memory before anything joined the text, however
+long the PDF.
+
+iter_pages() streams pages one at a time from the fastest available parser
+(PDF_PARSERS order, default pymupdf, pypdf, pdfplumber; parsers that aren't
+installed are skipped). The first PDF_PROBE_PAGES pages are checked for text
+yield. If they come out poor, the document is read again with the next
+parser: too few characters per page, or a low share of readable characters
+("(cid:12)" glyph ids, replacement characters, control codes from odd font
+encodings). This mostly happens on tables and unusual encodings, where
+pdfplumber does better. Extraction stops at PDF_MAX_PAGES pages or
+PDF_MAX_CHARS characters, so a 900-page upload costs no more than its
+first few pages. Whitespace is normalized once, here, for every caller.
+
+  PDF_PARSERS             parser order (default "pymupdf,pypdf,pdfplumber")
+  PDF_MAX_PAGES           pages read per PDF (default 50, 0 = all)
+  PDF_MAX_CHARS           characters read per PDF (default 200000, 0 = all)
+  PDF_PROBE_PAGES         pages checked before trusting a parser (default 2)
+  PDF_MIN_CHARS_PER_PAGE  less than this per probed page is poor (default 100)
+  PDF_MIN_QUALITY         share of readable characters below which the
+                          text is poor (default 0.9)
+
+benchmarks/pdf_parsers.py compares the parsers on a sample corpus.
+"""
+import io
+import itertools
+import logging
+import os
+import re
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+PDF_PARSERS = [p.strip() for p in os.getenv("PDF_PARSERS", "pymupdf,pypdf,pdfplumber").split(",") if p.strip()]
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "200000"))
+PDF_PROBE_PAGES = int(os.getenv("PDF_PROBE_PAGES", "2"))
+PDF_MIN_CHARS_PER_PAGE = int(os.getenv("PDF_MIN_CHARS_PER_PAGE", "100"))
+PDF_MIN_QUALITY = float(os.getenv("PDF_MIN_QUALITY", "0.9"))
+
+_CID_RE = re.compile(r"\(cid:\d+\)")
+_SPACES_RE = re.compile(r"[ \t\f\v\u00a0\u2000-\u200a\u202f\u205f\u3000]+")
+_ZERO_WIDTH_RE = re.compile(r"[\u200b\u200c\u200d\u2060\ufeff\u00ad]")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class Page(NamedTuple):
+    number: int  # 1-based
+    text: str
+    parser: str
+
+
+def normalize(text: str) -> str:
+    """Unicode spaces and runs of blanks become one space, zero-width
+    characters and soft hyphens go, lines are stripped and at most one blank
+    line is kept between paragraphs. Line breaks stay: section detection in
+    vector_store and context_budget depends on them."""
+    text = _ZERO_WIDTH_RE.sub("", text.replace("\r\n", "\n").replace("\r", "\n"))
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def text_quality(text: str) -> float:
+    """Share of characters that look like real text (1.0 for empty text).
+    Undecoded glyph ids such as "(cid:12)" count entirely as unreadable."""
+    if not text:
+        return 1.0
+    rest = _CID_RE.sub("", text)
+    readable = sum(1 for ch in rest if ch.isprintable() or ch == "\n") - rest.count("\ufffd")
+    return max(0.0, readable / len(text))
+
+
+def _is_poor(pages) -> bool:
+    text = "\n".join(page.text for page in pages)
+    return len(text) < PDF_MIN_CHARS_PER_PAGE * max(1, len(pages)) or text_quality(text) < PDF_MIN_QUALITY
+
+
+def _open(source):
+    """A path or a binary stream for `source` (a path or bytes)."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _pymupdf_pages(source):
+    import fitz
+
+    if isinstance(source, (bytes, bytearray)):
+        document = fitz.open(stream=bytes(source), filetype="pdf")
+    else:
+        document = fitz.open(source)
+    with document:
+        for page in document:
+            yield page.get_text()
+
+
+def _pypdf_pages(source):
+    from pypdf import PdfReader
+
+    # PdfReader parses a page's content stream only when it's asked for.
+    for page in PdfReader(_open(source)).pages:
+        yield page.extract_text() or ""
+
+
+def _pdfplumber_pages(source):
+    import pdfplumber
+
+    with pdfplumber.open(_open(source)) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+            # pdfplumber caches every parsed object on the page otherwise.
+            page.close()
+
+
+PARSERS = {"pymupdf": _pymupdf_pages, "pypdf": _pypdf_pages, "pdfplumber": _pdfplumber_pages}
+_MODULES = {"pymupdf": "fitz", "pypdf": "pypdf", "pdfplumber": "pdfplumber"}
+
+
+def available_parsers(names=None) -> list:
+    """The parsers in `names` (default PDF_PARSERS) that can be imported here."""
+    found = []
+    for name in names or PDF_PARSERS:
+        if name not in PARSERS:
+            raise ValueError(f"Unknown PDF parser {name!r}, expected one of {', '.join(PARSERS)}")
+        try:
+            __import__(_MODULES[name])
+        except ImportError:
+            continue
+        found.append(name)
+    return found
+
+
+def _capped(pages, parser: str, max_pages: int, max_chars: int):
+    """Normalized Pages from a parser's raw page texts, up to the caps."""
+    chars = 0
+    for number, raw in enumerate(itertools.islice(pages, max_pages or None), 1):
+        text = normalize(raw)
+        if max_chars and chars + len(text) >= max_chars:
+            yield Page(number, text[:max_chars - chars], parser)
+            return
+        chars += len(text)
+        yield Page(number, text, parser)
+
+
+def _score(pages) -> float:
+    text = "\n".join(page.text for page in pages)
+    return len(text) * text_quality(text)
+
+
+def iter_pages(source, parsers=None, max_pages: int = None, max_chars: int = None):
+    """Yields the Pages of a PDF (path or bytes), as described above. If
+    every parser's probe is poor, the one that got the most readable text
+    is used anyway. Raises the last parser's error if none could read the
+    file at all."""
+    names = available_parsers(parsers)
+    if not names:
+        raise RuntimeError("No PDF parser installed (pymupdf, pypdf or pdfplumber)")
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    max_chars = PDF_MAX_CHARS if max_chars is None else max_chars
+
+    best, error = None, None  # best: (score, probe, rest of the pages) of the best poor parser
+    for name in names:
+        pages = _capped(PARSERS[name](source), name, max_pages, max_chars)
+        try:
+            probe = list(itertools.islice(pages, max(1, PDF_PROBE_PAGES)))
+        except Exception as e:
+            pages.close()
+            logger.warning(f"{name} couldn't read the PDF ({e}), trying the next parser")
+            error = e
+            continue
+        if not _is_poor(probe):
+            if best is not None:
+                best[2].close()
+            yield from probe
+            yield from pages
+            return
+        logger.info(f"{name} text yield looks poor, trying the next parser")
+        score = _score(probe)
+        if best is None or score > best[0]:
+            if best is not None:
+                best[2].close()
+            best = (score, probe, pages)
+        else:
+            pages.close()
+    if best is None:
+        raise error
+    yield from best[1]
+    yield from best[2]
+
+
+def extract_text(source, **kwargs) -> str:
+    """All extracted pages of a PDF, joined by blank lines."""
+    return "\n\n".join(page.text for page in iter_pages(source, **kwargs))
@@ -0,0 +1,160 @@
+"""
+Cheap local first stage before LLM screening. Every uploaded resume used to
+go to the LLM at full cost, even obvious mismatches; with 100 resumes in one
+request that's most of the tokens and all of the tail latency.
+
+Each resume is embedded with the shared bge-small model (embeddings cached in
+resume_cache by content hash) and scored against the job-description chunks
+the query retrieves from Chroma — one NumPy matrix product over stored
+vectors, nothing re-embedded on the JD side. An optional BM25 keyword-overlap
+score is blended in. Only the best PRERANK_TOP_K resumes (and only those at
+or above PRERANK_MIN_SCORE) go on to the LLM; the scores for all of them are
+returned so the UI can show why a resume was left out.
+
+  PRERANK_TOP_K           resumes passed to the LLM (default 10, 0 = no cap)
+  PRERANK_MIN_SCORE       drop resumes scoring below this (default unset = off)
+  PRERANK_KEYWORD_WEIGHT  share of the BM25 score in the blend (default 0.2)
+  PRERANK_JD_CHUNKS       JD chunks retrieved to score against (default 8)
+"""
+import logging
+import math
+import os
+from collections import Counter
+
+import numpy as np
+
+from . import embeddings, vector_store
+from .lexical_index import tokenize
+from .rag_chatbot import extract_job_query
+from .resume_cache import resume_cache
+
+logger = logging.getLogger(__name__)
+
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "10"))
+PRERANK_MIN_SCORE = float(os.getenv("PRERANK_MIN_SCORE")) if os.getenv("PRERANK_MIN_SCORE") else None
+PRERANK_KEYWORD_WEIGHT = float(os.getenv("PRERANK_KEYWORD_WEIGHT", "0.2"))
+PRERANK_JD_CHUNKS = int(os.getenv("PRERANK_JD_CHUNKS", "8"))
+# Resumes are embedded as up to PRERANK_MAX_CHUNKS windows of this many
+# characters, averaged — bge-small would otherwise only see the first page.
+PRERANK_CHUNK_CHARS = 1500
+PRERANK_MAX_CHUNKS = 4
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def resume_vectors(resumes) -> np.ndarray:
+    """One normalized vector per resume (rows in input order). Embeddings
+    already in resume_cache for the current model (as found at extraction,
+    resume.cached) are reused; the rest are embedded together in a single
+    batch."""
+    model = embeddings.EMBEDDING_MODEL
+    vectors = [None] * len(resumes)
+    windows, owners = [], []
+    for i, resume in enumerate(resumes):
+        cached = resume.cached or {}
+        if cached.get("embedding_model") == model and cached.get("embedding"):
+            vectors[i] = np.asarray(cached["embedding"], dtype=np.float32)
+            continue
+        text = resume.text or resume.filename
+        for start in range(0, min(len(text), PRERANK_CHUNK_CHARS * PRERANK_MAX_CHUNKS), PRERANK_CHUNK_CHARS):
+            windows.append(text[start:start + PRERANK_CHUNK_CHARS])
+            owners.append(i)
+
+    if windows:
+        embedded = np.asarray(embeddings.get_embeddings().embed_documents(windows), dtype=np.float32)
+        owners = np.asarray(owners)
+        for i in np.unique(owners):
+            vector = embedded[owners == i].mean(axis=0)
+            vector /= np.linalg.norm(vector) or 1.0
+            vectors[i] = vector
+            resume_cache.put(resumes[i].digest, embedding=vector.tolist(), embedding_model=model)
+
+    return np.vstack(vectors)
+
+
+def jd_chunks(job_query: str, k: int = PRERANK_JD_CHUNKS):
+    """(normalized embedding matrix, texts) of the JD chunks closest to the
+    query, read straight from the Chroma collection."""
+    collection = vector_store.get_vectorstore()._collection
+    if collection.count() == 0:
+        return np.zeros((0, 0), dtype=np.float32), []
+    query_vector = embeddings.get_embeddings().embed_query(job_query)
+    results = collection.query(
+        query_embeddings=[query_vector],
+        n_results=min(k, collection.count()),
+        include=["embeddings", "documents"],
+    )
+    matrix = np.asarray(results["embeddings"][0], dtype=np.float32)
+    return _normalize_rows(matrix), results["documents"][0]
+
+
+def bm25_scores(query_tokens: list, documents: list, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 of one query against a small in-memory corpus (the uploaded resumes)."""
+    doc_tokens = [Counter(tokenize(doc)) for doc in documents]
+    lengths = np.asarray([sum(c.values()) for c in doc_tokens], dtype=np.float32)
+    avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+    scores = np.zeros(len(documents), dtype=np.float32)
+    for term in set(query_tokens):
+        tf = np.asarray([c.get(term, 0) for c in doc_tokens], dtype=np.float32)
+        df = int((tf > 0).sum())
+        if df == 0:
+            continue
+        idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / avg_length))
+    return scores
+
+
+def prerank(message: str, resumes, top_k: int = PRERANK_TOP_K, min_score: float = PRERANK_MIN_SCORE):
+    """Scores `resumes` (ExtractedResume list) against the JDs `message` asks
+    about. Returns (selected resumes in original order, per-resume score
+    dicts in input order). With no JDs indexed, everything is selected
+    unscored, and so is a pre-ranking failure — it's an optimization, never
+    a reason to fail the screening."""
+    if not resumes:
+        return [], []
+    try:
+        return _prerank(message, resumes, top_k, min_score)
+    except Exception as e:
+        logger.error(f"Pre-ranking failed, screening every resume: {e}")
+        return list(resumes), _unscored(resumes)
+
+
+def _unscored(resumes):
+    return [{"filename": r.filename, "score": None, "selected": True} for r in resumes]
+
+
+def _prerank(message, resumes, top_k, min_score):
+    job_query = extract_job_query(message)
+    jd_matrix, jd_texts = jd_chunks(job_query)
+    if not jd_texts:
+        return list(resumes), _unscored(resumes)
+
+    # Best-matching JD chunk per resume: (m x d) @ (d x n) -> max over n.
+    dense = (resume_vectors(resumes) @ jd_matrix.T).max(axis=1)
+    keyword = np.zeros(len(resumes), dtype=np.float32)
+    if PRERANK_KEYWORD_WEIGHT > 0:
+        keyword = bm25_scores(tokenize(job_query + " " + " ".join(jd_texts)), [r.text for r in resumes])
+        if keyword.max() > 0:
+            keyword = keyword / keyword.max()
+    combined = (1 - PRERANK_KEYWORD_WEIGHT) * dense + PRERANK_KEYWORD_WEIGHT * keyword
+
+    order = np.argsort(-combined)
+    keep = [i for i in order if min_score is None or combined[i] >= min_score]
+    if top_k > 0:
+        keep = keep[:top_k]
+    keep = set(int(i) for i in keep)
+
+    scores = [
+        {
+            "filename": r.filename,
+            "score": round(float(combined[i]), 4),
+            "dense": round(float(dense[i]), 4),
+            "keyword": round(float(keyword[i]), 4),
+            "selected": i in keep,
+        }
+        for i, r in enumerate(resumes)
+    ]
+    return [r for i, r in enumerate(resumes) if i in keep], scores
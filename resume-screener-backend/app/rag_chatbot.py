@@ -4,15 +4,24 @@ from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.schema.output_parser import StrOutputParser
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain.docstore.document import Document
 
 # from langchain.schema import HumanMessage, AIMessage
+import asyncio
 import os
+from contextlib import aclosing
 from datetime import datetime
+from typing import NamedTuple
 from dotenv import load_dotenv
 import logging
+import time
+
+from . import context_budget, conversation_summary, lexical_index, llm_scheduler, vector_store as shared_vector_store
+from .embeddings import get_embeddings
+from .metrics import maybe_stage
+from .response_cache import RESPONSE_CACHE_ENABLED, doc_keys_for, response_cache, stream_cached
+from .session_memory import pair_turns, sessions
+from .tokens import count_tokens
 
 # -------------------- Setup Logging --------------------
 logging.basicConfig(
@@ -52,30 +61,25 @@ Here's the relevant context from Job Description documents:
 
 # -------------------- Core Models and Memory --------------------
 #embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-embeddings = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-small-en-v1.5",
-    encode_kwargs={'normalize_embeddings': True}
-)
+# Shared with vector_store, loaded lazily on first use — see embeddings.py.
+embeddings = get_embeddings()
 
 #llm_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash-preview-05-20", temperature=0.2, streaming=True)
 llm_model = ChatGroq(model="llama-3.3-70b-versatile",temperature=0.2,streaming=True)
-memory = ConversationBufferWindowMemory(k=6, return_messages=True)
+# Writes the rolling chat summaries, see conversation_summary.py.
 summaryllm=ChatGroq(model="llama-3.1-8b-instant",temperature=0.6,streaming=True)
 
 
 
 # -------------------- Vector Store --------------------
 def load_vector_store():
-    db_path = "chroma_db"
-    logger.info("Attempting to load vector store...")
+    """The process-wide Chroma handle from vector_store (opened once, not
+    rebuilt per call), or None while chroma_db/ doesn't exist yet."""
     try:
-        if os.path.exists(db_path):
-            vector_store = Chroma(persist_directory=db_path, embedding_function=embeddings)
-            logger.info("Vector store loaded successfully.")
-            return vector_store
-        else:
+        vector_store = shared_vector_store.open_existing()
+        if vector_store is None:
             logger.warning("Vector store directory not found.")
-            return None
+        return vector_store
     except Exception as e:
         logger.error(f"Failed to load vector store: {e}")
         return None
@@ -83,14 +87,19 @@ def load_vector_store():
 
 
 # -------------------- Retriever --------------------
+# Counted in chunks, not whole JDs — job descriptions are indexed as chunks
+# (see vector_store.chunk_pages) and regrouped per JD in the context below.
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "6"))
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", "20"))
+
 def get_retriever(vector_store):
     logger.info("Creating retriever with MMR settings.")
     try:
         retriever = vector_store.as_retriever(
             search_type="mmr",
             search_kwargs={
-                "k": 2,
-                "fetch_k": 5,
+                "k": RETRIEVER_K,
+                "fetch_k": RETRIEVER_FETCH_K,
                 "lambda_mult": 0.7
             }
         )
@@ -103,20 +112,44 @@ def get_retriever(vector_store):
 
 
 # -------------------- Context Formatter --------------------
+def group_chunks_by_parent(documents):
+    """Retrieved chunks grouped per job description, JDs in order of their
+    best-ranked chunk and each JD's chunks back in document order."""
+    groups = {}
+    for doc in documents:
+        metadata = getattr(doc, "metadata", None) or {}
+        parent = metadata.get("parent_id") or metadata.get("source") or id(doc)
+        groups.setdefault(parent, []).append(doc)
+    for chunks in groups.values():
+        chunks.sort(key=lambda c: (c.metadata or {}).get("chunk_index", 0))
+    return groups
+
+
+def _group_metadata(chunks):
+    metadata = chunks[0].metadata or {}
+    parts = [f"source: {metadata['source']}"] if metadata.get("source") else []
+    pages = sorted({c.metadata["page"] for c in chunks if c.metadata.get("page")})
+    if pages:
+        parts.append("pages: " + ", ".join(str(p) for p in pages))
+    sections = list(dict.fromkeys(c.metadata["section"] for c in chunks if c.metadata.get("section")))
+    if sections:
+        parts.append("sections: " + ", ".join(sections))
+    return " | ".join(parts)
+
+
 def get_context_with_metadata(documents):
     try:
         if not documents:
             logger.info("No documents retrieved for context.")
             return "No relevant BSK services found for this query."
 
-        logger.info(f"Formatting context for {len(documents)} retrieved documents.")
+        logger.info(f"Formatting context for {len(documents)} retrieved chunks.")
         context_parts = []
-        for i, doc in enumerate(documents, 1):
-            service_info = f"Job Description {i}:\n{doc.page_content}"
-            if hasattr(doc, 'metadata') and doc.metadata:
-                metadata_str = " | ".join([f"{k}: {v}" for k, v in doc.metadata.items() if v])
-                if metadata_str:
-                    service_info += f"\n[Metadata: {metadata_str}]"
+        for i, chunks in enumerate(group_chunks_by_parent(documents).values(), 1):
+            service_info = f"Job Description {i}:\n" + "\n...\n".join(c.page_content for c in chunks)
+            metadata_str = _group_metadata(chunks)
+            if metadata_str:
+                service_info += f"\n[Metadata: {metadata_str}]"
             context_parts.append(service_info)
 
         return "\n\n".join(context_parts)
@@ -127,147 +160,298 @@ def get_context_with_metadata(documents):
 
 
 # -------------------- Extract Job Query for Retrieval --------------------
-def extract_job_query(input_str):
-    if "\n\nScreen the following resumes:" in input_str:
-        return input_str.split("\n\nScreen the following resumes:")[0]
-    else:
-        return input_str
+# Everything after one of these markers is resume text / screening summaries,
+# not something to search the job description index with.
+SCREEN_MARKER = "\n\nScreen the following resumes:"
+RANK_MARKER = "\n\nRank the following screened candidates:"
 
 
-# -------------------- RAG Chain Creation --------------------
-def create_rag_chain():
-    logger.info("Creating RAG chain...")
+def extract_job_query(input_str):
+    for marker in (SCREEN_MARKER, RANK_MARKER):
+        if marker in input_str:
+            input_str = input_str.split(marker)[0]
+    return input_str
+
+
+# -------------------- Retriever Creation --------------------
+# There used to be an LCEL chain here (prompt | llm_model | parser) as well.
+# Every answer now goes through stream_llm(), and with it llm_scheduler, so
+# only the retriever is built; the prompt is formatted in stream_llm().
+def create_retriever():
+    global _retriever
+    logger.info("Creating retriever...")
     try:
         vector_store = load_vector_store()
         if not vector_store:
-            logger.error("Vector store unavailable. Chain not created.")
+            logger.error("Vector store unavailable. Retriever not created.")
             return None
 
         retriever = get_retriever(vector_store)
         if not retriever:
-            logger.error("Retriever creation failed. Chain not created.")
+            logger.error("Retriever creation failed.")
             return None
 
-        chain = (
-            {
-                "context": lambda x: get_context_with_metadata(retriever.invoke(extract_job_query(x["input"]))),
-                "history": lambda x: memory.load_memory_variables({})["history"],
-                "input": lambda x: x["input"]
-            }
-            | custom_prompt_template
-            | llm_model
-            | StrOutputParser()
-        )
-
-        logger.info("RAG chain created successfully.")
-        return chain
+        _retriever = retriever
+        logger.info("Retriever created successfully.")
+        return retriever
     except Exception as e:
-        logger.error(f"Failed to create RAG chain: {e}")
+        logger.error(f"Failed to create retriever: {e}")
         return None
 
 
 
-# -------------------- Initialize Chain --------------------
-# NOTE: this used to be built exactly once, here, at import time
-# (`rag_chain = create_rag_chain()`), which is called before FastAPI has
-# even started serving requests. If the chroma_db/ directory doesn't exist
-# yet at that moment (e.g. a fresh checkout, before anyone has uploaded a
-# job description), create_rag_chain() returns None *permanently* — even
-# after PDFs get added later through the vector-db endpoints, since nothing
-# ever re-ran create_rag_chain(). Every query would then silently fall into
-# the "Could not load vector store" branch below forever, even with an
-# indexed vector store sitting right there.
+# -------------------- Initialize Retriever --------------------
+# NOTE: the chain this replaced used to be built exactly once, here, at
+# import time, which is called before FastAPI has even started serving
+# requests. If the chroma_db/ directory doesn't exist yet at that moment
+# (e.g. a fresh checkout, before anyone has uploaded a job description),
+# it stayed None *permanently* — even after PDFs get added later through
+# the vector-db endpoints. Every query would then silently fall into the
+# "Could not load vector store" branch below forever, even with an indexed
+# vector store sitting right there.
 #
-# get_rag_chain() re-attempts the build lazily/on-demand instead, so the
-# very next query after your first PDF is indexed picks it up.
-_rag_chain = create_rag_chain()
-
-
-def get_rag_chain():
-    global _rag_chain
-    if _rag_chain is None:
-        _rag_chain = create_rag_chain()
-    return _rag_chain
+# get_active_retriever() re-attempts the build lazily/on-demand instead, so
+# the very next query after your first PDF is indexed picks it up.
+_retriever = None
+create_retriever()
+
+
+def get_active_retriever():
+    global _retriever
+    if _retriever is None:
+        return create_retriever()
+    # In multi-worker mode vector_store reopens its handle once the index
+    # writer has changed the index; follow it to the new one.
+    current = shared_vector_store.open_existing()
+    if current is not None and current is not _retriever.vectorstore:
+        _retriever = get_retriever(current) or _retriever
+    return _retriever
+
+
+# -------------------- Retrieval --------------------
+# "mmr" is pure vector search; "hybrid" fuses Chroma's dense ranking with
+# BM25 over lexical_index by reciprocal rank fusion, which catches queries
+# that hinge on an exact title, requisition code or rare skill.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "mmr")
+
+
+def retrieve_documents(query_vector, query_text=None):
+    """Top RETRIEVER_K chunks for an already-embedded query — so the same
+    vector can key the response cache. MMR with the retriever's settings,
+    or hybrid search when RETRIEVAL_MODE=hybrid and query_text is given."""
+    if RETRIEVAL_MODE == "hybrid" and query_text:
+        return hybrid_search(query_vector, query_text)
+    return _retriever.vectorstore.max_marginal_relevance_search_by_vector(
+        query_vector, **_retriever.search_kwargs
+    )
+
+
+def retrieve_for_job_query(job_query, trace=None):
+    """The JD chunks for a job query, embedded and retrieved once, for
+    callers that build many prompts against the same JD (batch_screening).
+    Raises RuntimeError when there's no index to retrieve from."""
+    if not get_active_retriever():
+        raise RuntimeError("Could not load vector store.")
+    with maybe_stage(trace, "query_embedding"):
+        query_vector = embeddings.embed_query(job_query)
+    with maybe_stage(trace, "retrieval"):
+        return retrieve_documents(query_vector, job_query)
+
+
+def hybrid_search(query_vector, query_text, k=RETRIEVER_K, fetch_k=RETRIEVER_FETCH_K):
+    """Fuses the fetch_k nearest chunks by vector with the fetch_k best BM25
+    matches and returns the top k as Documents."""
+    collection = _retriever.vectorstore._collection
+    n_results = min(fetch_k, collection.count())
+    if n_results == 0:
+        return []
+    dense = collection.query(
+        query_embeddings=[query_vector], n_results=n_results, include=["documents", "metadatas"]
+    )
+    found = {
+        chunk_id: Document(page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(dense["ids"][0], dense["documents"][0], dense["metadatas"][0])
+    }
+    lexical = [chunk_id for chunk_id, _ in lexical_index.search(query_text, fetch_k)]
+    top = lexical_index.reciprocal_rank_fusion([dense["ids"][0], lexical])[:k]
+
+    missing = [chunk_id for chunk_id in top if chunk_id not in found]
+    if missing:
+        results = collection.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+            found[chunk_id] = Document(page_content=text, metadata=metadata or {})
+    # A chunk deleted since lexical_index was read just drops out.
+    return [found[chunk_id] for chunk_id in top if chunk_id in found]
+
+
+# Bump when custom_prompt_template changes in a way that should invalidate
+# cached answers; the model name is folded in automatically.
+PROMPT_VERSION = "1"
+
+
+def _response_cache_model_key():
+    return f"{getattr(llm_model, 'model_name', type(llm_model).__name__)}|prompt-v{PROMPT_VERSION}"
 
 
 # -------------------- Answer Query --------------------
-def answer_query(query):
+class _PreparedQuery(NamedTuple):
+    query_vector: list
+    doc_keys: tuple  # None unless the answer may go in the response cache
+    cached: str  # cached answer, or None
+    chain_input: dict  # None when the answer comes from the cache
+
+
+def _prepare(query, chat_id, trace):
+    """Everything before generation: embedding, retrieval, the response cache
+    lookup, memory load and prompt assembly. Blocking (local model, Chroma,
+    SQLite), so aanswer_query runs it in a thread."""
+    job_query = extract_job_query(query)
+    with maybe_stage(trace, "query_embedding"):
+        query_vector = embeddings.embed_query(job_query)
+    with maybe_stage(trace, "retrieval"):
+        docs = retrieve_documents(query_vector, job_query)
+    if trace is not None:
+        # The JDs this answer is grounded in; chats.py records them so
+        # feedback can be aggregated per JD.
+        trace.fields["jd_ids"] = [str(parent) for parent in group_chunks_by_parent(docs)]
+
+    doc_keys = None
+    if RESPONSE_CACHE_ENABLED and job_query == query:
+        doc_keys = doc_keys_for(docs)
+        cached = response_cache.lookup(query_vector, doc_keys, _response_cache_model_key())
+        if cached is not None:
+            logger.info("Serving answer from the response cache.")
+            if trace is not None:
+                trace.fields["response_cache"] = "hit"
+            return _PreparedQuery(query_vector, doc_keys, cached, None)
+
+    with maybe_stage(trace, "memory_load"):
+        history = conversation_summary.compose(chat_id, sessions.history(chat_id))
+    with maybe_stage(trace, "prompt_assembly"):
+        # Resumes were already fitted by the caller; history and JD context
+        # are fitted here, the JD context getting whatever budget is left.
+        query_tokens = count_tokens(query)
+        history, history_report = context_budget.fit_history(history)
+        docs, jd_report = context_budget.select_chunks(
+            docs, context_budget.jd_budget(query_tokens, history_report["tokens_out"])
+        )
+        context = get_context_with_metadata(docs)
+    if trace is not None:
+        trace.record_trim("history", history_report)
+        trace.record_trim("jd_context", jd_report)
+        trace.add_tokens("prompt", count_tokens(context) + history_report["tokens_out"] + query_tokens)
+    return _PreparedQuery(query_vector, doc_keys, None, {"input": query, "context": context, "history": history})
+
+
+def _finish(query, chat_id, trace, prepared, full_response, generation_seconds):
+    if trace is not None:
+        trace.add_stage("generation", generation_seconds)
+        trace.add_tokens("completion", count_tokens(full_response))
+
+    if prepared.doc_keys is not None and prepared.cached is None and full_response:
+        response_cache.store(prepared.query_vector, prepared.doc_keys, _response_cache_model_key(), full_response)
+
+    if chat_id is not None:
+        with maybe_stage(trace, "memory_save"):
+            # Only the user's own message, as chat_store has it: the resume
+            # text after SCREEN_MARKER would otherwise ride along in every
+            # later prompt of the chat, and a rebuilt window would differ.
+            sessions.save_turn(chat_id, extract_job_query(query), full_response)
+        logger.info(f"Saved conversation context to memory for chat {chat_id}.")
+
+
+def _query_failed(e, trace) -> str:
+    error_msg = f"Error processing query: {str(e)}"
+    logger.error(error_msg)
+    if trace is not None:
+        trace.fields["error"] = str(e)
+    return error_msg
+
+
+def stream_llm(chain_input, priority=llm_scheduler.INTERACTIVE, trace=None):
+    """The answer to an assembled prompt ({"input", "context", "history"}),
+    streamed through llm_scheduler: rate-limited, queued by priority,
+    retried, and shared with an identical prompt already in flight."""
+    messages = custom_prompt_template.format_messages(**chain_input)
+    return llm_scheduler.astream(llm_model, messages, priority, trace)
+
+
+async def aanswer_query(query, chat_id=None, trace=None, priority=llm_scheduler.INTERACTIVE):
+    """Streams the answer for `query`, as an async generator, so a stream
+    holds no thread while waiting on Groq. History comes from (and the new
+    turn is saved to) chat_id's own memory window; with no chat_id the query
+    is answered with no history at all. Pass a metrics.RequestTrace as
+    `trace` to have each stage timed; the caller finishes it. The LLM call
+    goes through llm_scheduler at `priority`.
+    Closing it (e.g. when the client disconnects) cancels the upstream
+    request straight away, unless another identical query is still
+    listening to it."""
     logger.info(f"Received query: {query}")
-    chain = get_rag_chain()
-    if not chain:
+    if not await asyncio.to_thread(get_active_retriever):
         error_msg = "Error: Could not load vector store."
         logger.error(error_msg)
         yield error_msg
         return
 
     try:
+        prepared = await asyncio.to_thread(_prepare, query, chat_id, trace)
         full_response = ""
-        for chunk in chain.stream({"input": query}):
-            full_response += chunk
-            yield chunk
-
-        memory.save_context({"input": query}, {"output": full_response})
-        logger.info("Saved conversation context to memory.")
+        generation_started = time.perf_counter()
+        if prepared.cached is not None:
+            for chunk in stream_cached(prepared.cached):
+                if trace is not None and not full_response:
+                    trace.mark_first_token()
+                full_response += chunk
+                yield chunk
+        else:
+            async with aclosing(stream_llm(prepared.chain_input, priority, trace)) as chunks:
+                async for chunk in chunks:
+                    if trace is not None and not full_response:
+                        trace.mark_first_token()
+                    full_response += chunk
+                    yield chunk
+        _finish(query, chat_id, trace, prepared, full_response, time.perf_counter() - generation_started)
 
     except Exception as e:
-        error_msg = f"Error processing query: {str(e)}"
-        logger.error(error_msg)
-        yield error_msg
+        yield _query_failed(e, trace)
 
 # -------------------- Clear Memory --------------------
-def clear_memory():
+def clear_memory(chat_id=None):
+    """Drops one chat's warm memory window, or every window if chat_id is None."""
     try:
-        global memory
-        memory.clear()
+        if chat_id is None:
+            sessions.clear()
+        else:
+            sessions.discard(chat_id)
         logger.info("Memory cleared.")
     except Exception as e:
         logger.error(f"Error clearing memory: {e}")
 
 # -------------------- Load Chat History to Memory --------------------
-def load_chat_to_memory(chat_messages):
-    """Load chat messages into the conversation memory."""
+def load_chat_to_memory(chat_messages, chat_id):
+    """Load chat messages into that chat's conversation memory. Only needed to
+    force a refresh — aanswer_query() rebuilds a missing window on its own."""
     try:
-        global memory
-        # Clear existing memory first
-        memory.clear()
-        
-        # Load messages into memory (skip the last few to stay within window limit)
-        # We'll load in pairs (user message + assistant response)
-        message_pairs = []
-        for i in range(0, len(chat_messages) - 1, 2):
-            if i + 1 < len(chat_messages):
-                user_msg = chat_messages[i]
-                assistant_msg = chat_messages[i + 1]
-                
-                if user_msg["role"] == "user" and assistant_msg["role"] == "Virtual Assistant":
-                    message_pairs.append((user_msg["content"], assistant_msg["content"]))
-        
-        # Load the most recent message pairs (within memory window limit)
-        # Since memory has k=6, we can load up to 3 conversation pairs
-        recent_pairs = message_pairs[-3:] if len(message_pairs) > 3 else message_pairs
-        
-        for user_content, assistant_content in recent_pairs:
-            memory.save_context({"input": user_content}, {"output": assistant_content})
-        
-        logger.info(f"Loaded {len(recent_pairs)} conversation pairs into memory.")
-        
+        sessions.prime(chat_id, chat_messages)
+        logger.info(f"Loaded {min(len(pair_turns(chat_messages)), sessions.window_k)} conversation pairs into memory for chat {chat_id}.")
     except Exception as e:
         logger.error(f"Error loading chat to memory: {e}")
 
 # -------------------- System Status --------------------
 def get_system_status():
-    logger.info("System status requested.")
-    try:
-        status = {
-            "rag_chain_initialized": get_rag_chain() is not None,
-            "memory_conversations": len(memory.load_memory_variables({}).get("history", [])),
-            "vector_store_available": load_vector_store() is not None,
-            "timestamp": datetime.now().isoformat()
-        }
-        return status
-    except Exception as e:
-        logger.error(f"Error retrieving system status: {e}")
-        return {"error": str(e), "timestamp": datetime.now().isoformat()}
+    """Cached counters only — no Chroma access, no retriever rebuild, no logging —
+    so a load balancer can poll it as often as it likes."""
+    store = shared_vector_store.stats()
+    return {
+        # Key kept for API compatibility: the retriever is all there is now.
+        "rag_chain_initialized": _retriever is not None,
+        "vector_store_available": store["open"],
+        "documents": store["documents"],
+        "last_indexed_at": store["last_indexed_at"],
+        "embedding_model_loaded": embeddings.loaded,
+        "warm_sessions": len(sessions),
+        "timestamp": datetime.now().isoformat()
+    }
     
 
 # #----------------------Summary LLM---------------------------
@@ -0,0 +1,116 @@
+"""
+Opt-in semantic cache for aanswer_query(). Recruiters ask near-identical JD
+questions ("what skills does the backend JD need?") many times a day, and
+each one used to pay for retrieval plus a full Groq generation.
+
+An answer is reused only when all of these match:
+  - the query embedding is at least RESPONSE_CACHE_THRESHOLD cosine-similar
+    (vectors are already normalized, so that's a dot product),
+  - the same job-description documents were retrieved, at the same indexed
+    version,
+  - the same model and prompt template produced it.
+Entries expire after RESPONSE_CACHE_TTL_SECONDS and the cache holds at most
+RESPONSE_CACHE_MAX_ENTRIES (least recently used dropped first).
+vector_store calls invalidate_docs() whenever a document is added, replaced
+or deleted, so a changed JD never serves a stale answer.
+
+Conversation history is deliberately not part of the key, and queries that
+carry resumes are never cached — enable it (RESPONSE_CACHE_ENABLED=1) for
+self-contained JD questions, not follow-ups like "what about the second one?".
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Cached answers are re-streamed in pieces this size so the frontend sees
+# the same chunked text/plain stream as a live generation.
+RESPONSE_CACHE_CHUNK_CHARS = 40
+
+
+class ResponseCache:
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (vector, doc_keys, model_key, answer, created)
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, e in self._entries.items() if now - e[4] > self.ttl_seconds]:
+            del self._entries[key]
+
+    def lookup(self, query_vector, doc_keys, model_key: str):
+        """The cached answer for a matching query, or None."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        doc_keys = frozenset(doc_keys)
+        with self._lock:
+            self._expire(time.monotonic())
+            best_key, best_score = None, self.threshold
+            for key, (vector, keys, model, _, _) in self._entries.items():
+                if keys != doc_keys or model != model_key:
+                    continue
+                score = float(vector @ query_vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][3]
+
+    def store(self, query_vector, doc_keys, model_key: str, answer: str) -> None:
+        with self._lock:
+            self._entries[self._next_key] = (
+                np.asarray(query_vector, dtype=np.float32), frozenset(doc_keys), model_key, answer, time.monotonic(),
+            )
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_docs(self, doc_ids) -> int:
+        """Drops every answer that was built from any of `doc_ids`."""
+        doc_ids = set(doc_ids)
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if any(parent in doc_ids for parent, _ in e[1])]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": RESPONSE_CACHE_ENABLED, "entries": len(self._entries),
+                    "hits": self.hits, "misses": self.misses}
+
+
+def doc_keys_for(documents) -> set:
+    """(parent doc id, indexed version) for each retrieved chunk."""
+    keys = set()
+    for doc in documents:
+        metadata = getattr(doc, "metadata", None) or {}
+        parent = metadata.get("parent_id") or metadata.get("source") or ""
+        keys.add((parent, metadata.get("indexed_at", "")))
+    return keys
+
+
+def stream_cached(answer: str):
+    for start in range(0, len(answer), RESPONSE_CACHE_CHUNK_CHARS):
+        yield answer[start:start + RESPONSE_CACHE_CHUNK_CHARS]
+
+
+response_cache = ResponseCache()
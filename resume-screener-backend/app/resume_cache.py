@@ -0,0 +1,127 @@
+"""
+Content-addressed cache for uploaded resumes. Screening the same resume
+against several JDs, or in several chats, used to re-parse the same PDF
+every time; entries here are keyed by the SHA-256 of the uploaded bytes, so
+a repeat upload skips extraction entirely no matter what the file is called.
+
+Each entry is a small JSON file under RESUME_CACHE_DIR holding whatever has
+been computed for that resume so far ("text" today; embeddings and parsed
+sections can be merged into the same entry). Total size is capped at
+RESUME_CACHE_MAX_BYTES with least-recently-used eviction, and stats() reports
+the hit rate so the cap can be sized from real traffic.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+RESUME_CACHE_DIR = os.getenv("RESUME_CACHE_DIR", "resume_cache")
+RESUME_CACHE_MAX_BYTES = int(os.getenv("RESUME_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResumeCache:
+    def __init__(self, directory: str = RESUME_CACHE_DIR, max_bytes: int = RESUME_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = None  # digest -> size on disk, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def _load_index(self):
+        """Scans the cache directory once per process, oldest access first."""
+        if self._index is not None:
+            return self._index
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        st = os.stat(os.path.join(root, name))
+                        entries.append((st.st_mtime, name[:-5], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((digest, size) for _, digest, size in entries)
+        self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def get(self, digest: str):
+        """The cached entry dict for `digest`, or None."""
+        with self._lock:
+            index = self._load_index()
+            if digest in index:
+                path = self._path(digest)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    os.utime(path)
+                    index.move_to_end(digest)
+                    self.hits += 1
+                    return entry
+                except (OSError, ValueError):
+                    # Evicted by another worker or half-written; treat as a miss.
+                    self._total_bytes -= index.pop(digest)
+            self.misses += 1
+            return None
+
+    def put(self, digest: str, **fields) -> None:
+        """Merges `fields` into the entry for `digest`."""
+        with self._lock:
+            index = self._load_index()
+            path = self._path(digest)
+            entry = {}
+            if digest in index:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    entry = {}
+                self._total_bytes -= index.pop(digest)
+            entry.update(fields)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+            size = os.path.getsize(path)
+            index[digest] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            digest, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+resume_cache = ResumeCache()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .. import candidate_index, deployment, ingest_jobs
+
+router = APIRouter(prefix="/api/candidates", tags=["candidates"])
+
+DELETE_WAIT_SECONDS = 10.0
+
+
+class SearchIn(BaseModel):
+    query: Optional[str] = None
+    jd_id: Optional[str] = None
+    top_n: int = 10
+
+
+@router.get("")
+def list_candidates(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=candidate_index.MAX_PAGE_SIZE)):
+    """One page of the candidate pool; pass next_cursor back as `cursor`."""
+    items, next_cursor = candidate_index.page(cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.post("/search")
+def search_candidates(payload: SearchIn):
+    """Ranks every remembered candidate against an indexed JD (`jd_id`) or
+    a free-text `query` and returns the best `top_n`."""
+    if not payload.jd_id and not (payload.query and payload.query.strip()):
+        raise HTTPException(status_code=422, detail="Give a jd_id or a query")
+    if not 1 <= payload.top_n <= candidate_index.MAX_SEARCH_RESULTS:
+        raise HTTPException(
+            status_code=422, detail=f"top_n must be between 1 and {candidate_index.MAX_SEARCH_RESULTS}"
+        )
+    started = time.perf_counter()
+    try:
+        matches = candidate_index.search(payload.query, payload.jd_id, payload.top_n)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Job description not found")
+    return {"matches": matches, "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@router.get("/{candidate_id}")
+def get_candidate(candidate_id: str):
+    candidate = candidate_index.get(candidate_id)
+    if candidate is None:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return candidate
+
+
+@router.delete("/{candidate_id}")
+async def delete_candidate(candidate_id: str):
+    """Forgets a candidate. Like DELETE /api/vector-db/docs/{id}, queued
+    for the index writer when this worker isn't it."""
+    if await asyncio.to_thread(candidate_index.get, candidate_id) is None:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    if deployment.is_index_writer():
+        await asyncio.to_thread(candidate_index.delete_candidates, [candidate_id])
+        return {"ok": True}
+    job = await asyncio.to_thread(ingest_jobs.submit, "delete-candidates", candidate_index.delete_candidates,
+                                  [candidate_id])
+    job = await ingest_jobs.wait_for(job["id"], DELETE_WAIT_SECONDS)
+    if job["status"] == "done":
+        return {"ok": True}
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Delete failed")
+    return JSONResponse(job, status_code=202)
@@ -1,13 +1,19 @@
-import os
-import tempfile
+import asyncio
+import json
+import math
+from contextlib import aclosing
+
+import anyio
 from typing import List
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
-from langchain_community.document_loaders import PyPDFLoader
 
-from .. import chat_store
-from ..rag_chatbot import answer_query, load_chat_to_memory
+from .. import (
+    candidate_index, chat_store, context_budget, conversation_summary, feedback_store, llm_scheduler, metrics,
+    pdf_extraction, prerank,
+)
+from ..rag_chatbot import SCREEN_MARKER, aanswer_query, clear_memory
 
 router = APIRouter(prefix="/api/chats", tags=["chats"])
 
@@ -20,13 +26,7 @@ def _to_api_role(role: str) -> str:
 
 @router.get("")
 def list_chats():
-    chat_data = chat_store.load_chat_history()
-    chats = [
-        {"id": int(cid), "title": info["title"], "created_at": info["created_at"]}
-        for cid, info in chat_data.items()
-    ]
-    chats.sort(key=lambda c: c["id"], reverse=True)
-    return chats
+    return chat_store.list_chats()
 
 
 @router.post("")
@@ -38,6 +38,7 @@ def new_chat():
 def remove_chat(chat_id: int):
     if not chat_store.delete_chat(chat_id):
         raise HTTPException(status_code=404, detail="Chat not found")
+    clear_memory(chat_id)
     return {"ok": True}
 
 
@@ -62,58 +63,99 @@ async def query_chat(
     message: str = Form(...),
     resumes: List[UploadFile] = File(default=[]),
 ):
-    chat = chat_store.get_chat(chat_id)
+    chat = await asyncio.to_thread(chat_store.get_chat, chat_id)
     if chat is None:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    # Prime the shared conversation memory with this chat's prior turns,
-    # exactly like Resume_Screener.py did when switching sessions.
-    load_chat_to_memory(chat["messages"])
+    # Backpressure: when the LLM queue is full, say so (and when to come
+    # back) before anything is parsed or saved.
+    try:
+        queue_position = llm_scheduler.admission(llm_scheduler.INTERACTIVE)
+    except llm_scheduler.Overloaded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
 
+    trace = metrics.RequestTrace("chat_query", chat_id=chat_id, resumes=len(resumes))
     backend_query = message
-    temp_paths: List[str] = []
     lowered = message.lower()
+    headers = {"X-LLM-Queue-Position": str(queue_position)}
 
     if resumes and any(k in lowered for k in SCREEN_KEYWORDS):
-        resume_blocks = []
-        for i, resume in enumerate(resumes):
-            try:
-                content = await resume.read()
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(content)
-                    temp_paths.append(tmp.name)
-                docs = PyPDFLoader(temp_paths[-1]).load()
-                text = "\n\n".join(d.page_content for d in docs)
-            except Exception as e:
-                # A bad/corrupt/scanned-image PDF here used to crash the whole
-                # endpoint with a raw 500, which is what "Failed to reach the
-                # screening assistant" was actually masking. Fail loudly with
-                # a message the frontend can show instead.
-                for path in temp_paths:
-                    if os.path.exists(path):
-                        os.remove(path)
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"Couldn't read resume '{resume.filename}': {e}",
-                )
-            resume_blocks.append(f"Resume {i + 1}: {resume.filename}\n{text}")
-        backend_query += "\n\nScreen the following resumes:\n" + "\n\n".join(resume_blocks)
+        try:
+            # All files parse concurrently in a process pool, so the event
+            # loop keeps serving other requests meanwhile.
+            with trace.stage("pdf_extraction"):
+                extracted = await pdf_extraction.extract_resumes(resumes)
+        except pdf_extraction.ExtractionError as e:
+            trace.finish("extraction_error", error=str(e))
+            # A bad/corrupt/scanned-image PDF here used to crash the whole
+            # endpoint with a raw 500, which is what "Failed to reach the
+            # screening assistant" was actually masking. Fail loudly with
+            # a message the frontend can show instead.
+            raise HTTPException(
+                status_code=422,
+                detail=f"Couldn't read resume '{e.filename}': {e.reason}",
+            )
+        # Every screened resume joins the candidate pool (embedded in the
+        # background, only if it's new) so later JDs can search it.
+        await asyncio.to_thread(candidate_index.remember, extracted)
+        # Local embedding pre-ranking: only the most relevant resumes reach
+        # the LLM; scores for all of them go back in X-Resume-Prescores.
+        with trace.stage("prerank"):
+            selected, prescores = await asyncio.to_thread(prerank.prerank, message, extracted)
+        headers["X-Resume-Prescores"] = json.dumps(prescores)
+        # Resumes share one token budget, weighted by pre-rank score; any
+        # over their share are cut down to their key sections.
+        scores = [p["score"] for p in prescores if p["selected"]]
+        texts, resume_report = context_budget.fit_resumes([r.text for r in selected], scores)
+        trace.record_trim("resumes", resume_report)
+        resume_blocks = [
+            f"Resume {i + 1}: {resume.filename}\n{text}" for i, (resume, text) in enumerate(zip(selected, texts))
+        ]
+        backend_query += SCREEN_MARKER + "\n" + "\n\n".join(resume_blocks)
+        # The frontend doesn't read the header, so resumes the pre-ranking
+        # cut are named in the prompt and the answer has to say so.
+        left_out = [p["filename"] for p in prescores if not p["selected"]]
+        if left_out:
+            backend_query += (
+                f"\n\nNote: {len(left_out)} of the {len(extracted)} uploaded resumes were left out by "
+                f"pre-screening as the weakest matches and are not shown above: {', '.join(left_out)}. "
+                "Start your answer by telling the user which resumes were not screened."
+            )
 
     is_first_message = len(chat["messages"]) == 0
-    chat_store.save_message(chat_id, "user", message)
-    if is_first_message:
-        chat_store.update_chat_title(chat_id, message)
-
-    def generate():
+    with trace.stage("chat_store_write"):
+        await asyncio.to_thread(chat_store.save_message, chat_id, "user", message)
+        if is_first_message:
+            await asyncio.to_thread(chat_store.update_chat_title, chat_id, message)
+
+    # An async generator, so Starlette streams it on the event loop instead
+    # of parking a threadpool thread per response for the whole generation.
+    # If the client disconnects the stream is cancelled, which closes
+    # aanswer_query's chain.astream and with it the Groq request.
+    def save_answer(text):
+        message_index = chat_store.save_message(chat_id, chat_store.ASSISTANT_ROLE, text)
+        if message_index is not None:
+            feedback_store.record_sources(chat_id, message_index, trace.fields.get("jd_ids"))
+
+    async def generate():
         full_response = ""
+        outcome = "disconnected"
         try:
-            for chunk in answer_query(backend_query):
-                full_response += chunk
-                yield chunk
+            async with aclosing(aanswer_query(backend_query, chat_id, trace)) as chunks:
+                async for chunk in chunks:
+                    full_response += chunk
+                    yield chunk
+            outcome = "error" if "error" in trace.fields else "ok"
         finally:
-            chat_store.save_message(chat_id, chat_store.ASSISTANT_ROLE, full_response)
-            for path in temp_paths:
-                if os.path.exists(path):
-                    os.remove(path)
-
-    return StreamingResponse(generate(), media_type="text/plain")
+            # Shielded: on a disconnect this runs inside a cancelled scope,
+            # and whatever was generated so far should still be saved.
+            with anyio.CancelScope(shield=True):
+                with trace.stage("chat_store_write"):
+                    await asyncio.to_thread(save_answer, full_response)
+            if full_response:
+                conversation_summary.schedule(chat_id)
+            trace.finish(outcome)
+
+    return StreamingResponse(generate(), media_type="text/plain", headers=headers)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from ..feedback_store import log_feedback
+from .. import feedback_store
 
 router = APIRouter(prefix="/api/feedback", tags=["feedback"])
 
@@ -15,5 +17,16 @@ class FeedbackIn(BaseModel):
 
 @router.post("")
 def submit_feedback(payload: FeedbackIn):
-    log_feedback(payload.session_id, payload.message_index, payload.question, payload.rating)
+    feedback_store.log_feedback(payload.session_id, payload.message_index, payload.question, payload.rating)
     return {"ok": True}
+
+
+@router.get("/stats")
+def feedback_stats(group_by: str = "day", since: Optional[str] = None, until: Optional[str] = None):
+    """Ratings aggregated per "day", "chat" or "jd" (the job descriptions
+    each rated answer was grounded in); `since`/`until` take YYYY-MM-DD."""
+    if group_by not in feedback_store.STATS_GROUPS:
+        raise HTTPException(
+            status_code=422, detail=f"group_by must be one of {', '.join(feedback_store.STATS_GROUPS)}"
+        )
+    return {"group_by": group_by, "groups": feedback_store.stats(group_by, since, until)}
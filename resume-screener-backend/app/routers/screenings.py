@@ -0,0 +1,90 @@
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from .. import batch_screening, candidate_index, matrix_screening, pdf_extraction, prerank, screening_store
+
+router = APIRouter(prefix="/api/screenings", tags=["screenings"])
+
+
+def _ndjson(events):
+    async def generate():
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("")
+async def create_screening(
+    message: str = Form(...),
+    resumes: List[UploadFile] = File(...),
+):
+    """Screens resumes against the JD described in `message`, one LLM call
+    per resume that survives embedding pre-ranking. Streams newline-delimited
+    JSON events: "started" (with the screening_id and every resume's
+    pre-score), "skipped" listing any resume below PRERANK_MIN_SCORE,
+    one "result" per resume as it finishes (with "error" set
+    instead of a screening if its LLM call failed), a final "ranking",
+    then "done". If the connection drops, resume with
+    GET /api/screenings/{id}/events?after=<last seq seen>."""
+    try:
+        extracted = await pdf_extraction.extract_resumes(resumes)
+    except pdf_extraction.ExtractionError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Couldn't read resume '{e.filename}': {e.reason}",
+        )
+    await asyncio.to_thread(candidate_index.remember, extracted)
+    # No PRERANK_TOP_K cap here: a batch screening is asked to screen every
+    # resume. Only PRERANK_MIN_SCORE, if set, leaves any out.
+    selected, prescores = await asyncio.to_thread(prerank.prerank, message, extracted, 0)
+    screening_id = await batch_screening.start_screening(message, selected, prescores)
+    return _ndjson(batch_screening.stream_events(screening_id))
+
+
+@router.post("/matrix")
+async def create_matrix_screening(
+    resumes: List[UploadFile] = File(...),
+    jd_ids: List[str] = Form(default=[]),
+    top_k: int = Form(3),
+    narrate: int = Form(0),
+):
+    """Scores every resume against every selected JD (repeat "jd_ids"; none
+    means all indexed JDs) with one embedding batch and one matrix product,
+    no LLM calls. Returns the score matrix, each resume's top_k JDs and each
+    JD's top_k resumes. narrate=n additionally has the LLM screen the n best
+    pairs (each resume's top JD, best resumes first)."""
+    try:
+        extracted = await pdf_extraction.extract_resumes(resumes)
+    except pdf_extraction.ExtractionError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Couldn't read resume '{e.filename}': {e.reason}",
+        )
+    await asyncio.to_thread(candidate_index.remember, extracted)
+    jd_ids = [jd_id.strip() for jd_id in jd_ids if jd_id.strip()]
+    try:
+        return await matrix_screening.screen_matrix(extracted, jd_ids, top_k=top_k, narrate=narrate)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=f"Job description(s) not found: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/{screening_id}")
+def get_screening(screening_id: str):
+    screening = screening_store.get_screening(screening_id)
+    if screening is None:
+        raise HTTPException(status_code=404, detail="Screening not found")
+    return {**screening, "events": screening_store.events_after(screening_id)}
+
+
+@router.get("/{screening_id}/events")
+def screening_events(screening_id: str, after: int = 0):
+    if screening_store.get_screening(screening_id) is None:
+        raise HTTPException(status_code=404, detail="Screening not found")
+    return _ndjson(batch_screening.stream_events(screening_id, after))
@@ -1,61 +1,120 @@
-import os
+import asyncio
+import json
 import tempfile
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .. import vector_store
+from .. import deployment, doc_registry, ingest_jobs, vector_store
 
 router = APIRouter(prefix="/api/vector-db", tags=["vector-db"])
 
+DELETE_WAIT_SECONDS = 10.0
+
 
 @router.get("/docs")
-def list_docs():
-    ids = vector_store.list_all_index_ids()
-    return [{"id": doc_id, "source": doc_id} for doc_id in ids]
+def list_docs(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=doc_registry.MAX_PAGE_SIZE),
+    include: List[str] = Query(default=[]),
+    source: Optional[str] = None,
+    indexed_after: Optional[str] = None,
+    indexed_before: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    """One page of indexed documents, metadata only by default. Pass the
+    returned next_cursor back as `cursor` for the next page. `include` may
+    repeat "tags", "metadatas" (per-chunk metadata) and "documents" (chunk
+    text); `indexed_after`/`indexed_before` take ISO dates."""
+    unknown = set(include) - set(vector_store.LIST_INCLUDES)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown include value(s): {', '.join(sorted(unknown))}")
+    return vector_store.list_indexed_docs(
+        cursor, limit, include, source=source, indexed_after=indexed_after,
+        indexed_before=indexed_before, tag=tag,
+    )
+
 
+async def _spool(upload: UploadFile) -> str:
+    content = await upload.read()
 
-@router.post("/docs")
-async def add_docs(files: List[UploadFile] = File(...)):
-    added = []
-    for file in files:
-        content = await file.read()
+    def write():
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
             tmp.write(content)
-            tmp_path = tmp.name
-        try:
-            vector_store.add_pdf_to_db(tmp_path, doc_id=file.filename)
-            added.append(file.filename)
-        finally:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-    return {"added": added}
+            return tmp.name
+
+    return await asyncio.to_thread(write)
 
 
-@router.post("/sync-folder")
+@router.post("/docs", status_code=202)
+async def add_docs(files: List[UploadFile] = File(...), tags: List[str] = Form(default=[])):
+    """Queues the PDFs for indexing and returns the job straight away; uploads
+    queued close together are parsed and embedded as one batch. Follow
+    GET /jobs/{job_id}/events for per-file progress."""
+    tags = [t.strip() for t in tags if t.strip()] or None
+    pending = [(await _spool(file), file.filename, tags) for file in files]
+    return await asyncio.to_thread(ingest_jobs.submit_upload, pending)
+
+
+@router.post("/sync-folder", status_code=202)
 def sync_folder():
-    """Optional bulk-import fallback: index any PDFs sitting in a `pdfs/`
-    folder in the backend directory that aren't indexed yet. The normal
-    upload flow (POST /docs) never required this folder — this just exists
-    for the "drop files in a folder" workflow alongside it."""
-    return vector_store.sync_pdfs_folder("pdfs")
+    """Optional bulk-import fallback: brings the index in line with the PDFs
+    sitting in a `pdfs/` folder in the backend directory (new, edited and
+    deleted files). The normal upload flow (POST /docs) never required this
+    folder — this just exists for the "drop files in a folder" workflow
+    alongside it. Runs as a background job; poll GET /jobs/{job_id}."""
+    return ingest_jobs.submit("sync-folder", vector_store.sync_pdfs_folder, "pdfs")
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingest_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+def job_events(job_id: str, after: int = 0):
+    """Newline-delimited JSON: "progress"/"file" events as the job works,
+    ending with "done". Replays from `after` (an event's seq)."""
+    if ingest_jobs.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def generate():
+        last = after
+        while True:
+            for event in await asyncio.to_thread(ingest_jobs.events_after, job_id, last):
+                last = event["seq"]
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+                if event["type"] == "done":
+                    return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
 @router.delete("/docs/{doc_id}")
-def delete_doc(doc_id: str):
-    vector_store.delete_index_by_id(doc_id)
-    return {"ok": True}
+async def delete_doc(doc_id: str):
+    """Deletes straight away in the index writer. In another worker (see
+    deployment.py) the delete is queued for the writer and awaited; if it
+    takes longer than DELETE_WAIT_SECONDS the job comes back with a 202."""
+    if deployment.is_index_writer():
+        await asyncio.to_thread(vector_store.delete_index_by_id, doc_id)
+        return {"ok": True}
+    job = await asyncio.to_thread(ingest_jobs.submit, "delete", vector_store.delete_docs, [doc_id])
+    job = await ingest_jobs.wait_for(job["id"], DELETE_WAIT_SECONDS)
+    if job["status"] == "done":
+        return {"ok": True}
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Delete failed")
+    return JSONResponse(job, status_code=202)
 
 
-@router.put("/docs/{doc_id}")
+@router.put("/docs/{doc_id}", status_code=202)
 async def replace_doc(doc_id: str, file: UploadFile = File(...)):
-    content = await file.read()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
-    try:
-        vector_store.update_index(doc_id, tmp_path)
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-    return {"ok": True}
+    """Queues a new version of doc_id. It's indexed alongside the old one and
+    the old chunks are deleted only after, so the JD stays searchable."""
+    pending = [(await _spool(file), doc_id, None)]
+    return await asyncio.to_thread(ingest_jobs.submit_upload, pending)
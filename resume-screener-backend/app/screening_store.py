@@ -0,0 +1,154 @@
+"""
+Persistence for batch screenings (/api/screenings). Every per-resume result
+is written as an event the moment it finishes, so a client whose connection
+drops can reconnect and replay from the last event it saw instead of
+re-running the whole batch.
+
+A screening runs as a task in the process that started it, recorded as its
+owner. If that process exits mid-run (restart, crash, a worker recycled in
+multi-worker mode) the row would stay 'running' and every client following
+it would wait forever, so fail_interrupted() fails screenings whose owner
+is gone: for all of them at startup, and for one screening whenever a
+client is following it from a process that doesn't own it.
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+
+from . import db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenings (
+    id          TEXT PRIMARY KEY,
+    job_query   TEXT NOT NULL,
+    total       INTEGER NOT NULL,
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    finished_at TEXT,
+    owner       TEXT
+);
+CREATE TABLE IF NOT EXISTS screening_events (
+    screening_id TEXT NOT NULL REFERENCES screenings(id) ON DELETE CASCADE,
+    seq          INTEGER NOT NULL,
+    event        TEXT NOT NULL,
+    PRIMARY KEY (screening_id, seq)
+);
+"""
+
+
+# "<pid>:<random>" of this process; the random part tells it apart from an
+# earlier process that had the same pid (e.g. pid 1 in a restarted container).
+OWNER = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _conn():
+    if db.ensure_schema("screenings", _SCHEMA):
+        _migrate()
+    return db.get_connection()
+
+
+def _migrate() -> None:
+    """Adds the owner column to a table from before screenings had one."""
+    conn = db.get_connection()
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(screenings)")}
+    if "owner" not in columns:
+        with db.transaction() as conn:
+            conn.execute("ALTER TABLE screenings ADD COLUMN owner TEXT")
+
+
+def create_screening(job_query: str, total: int) -> str:
+    _conn()
+    screening_id = uuid.uuid4().hex
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO screenings (id, job_query, total, status, created_at, owner) "
+            "VALUES (?, ?, ?, 'running', ?, ?)",
+            (screening_id, job_query, total, datetime.now().isoformat(), OWNER),
+        )
+    return screening_id
+
+
+def _append(conn, screening_id: str, event: dict) -> int:
+    seq = conn.execute(
+        "SELECT COALESCE(MAX(seq), 0) + 1 FROM screening_events WHERE screening_id = ?", (screening_id,)
+    ).fetchone()[0]
+    conn.execute(
+        "INSERT INTO screening_events (screening_id, seq, event) VALUES (?, ?, ?)",
+        (screening_id, seq, json.dumps({**event, "seq": seq}, ensure_ascii=False)),
+    )
+    return seq
+
+
+def append_event(screening_id: str, event: dict) -> int:
+    """Stores `event` and returns its sequence number (1-based)."""
+    _conn()
+    with db.transaction() as conn:
+        return _append(conn, screening_id, event)
+
+
+def finish_screening(screening_id: str, status: str = "done") -> None:
+    _conn()
+    with db.transaction() as conn:
+        conn.execute(
+            "UPDATE screenings SET status = ?, finished_at = ? WHERE id = ?",
+            (status, datetime.now().isoformat(), screening_id),
+        )
+
+
+def _owner_gone(owner) -> bool:
+    if owner == OWNER:
+        return False
+    if not owner:
+        return True  # from before owners were recorded
+    pid = int(owner.split(":", 1)[0])
+    if pid == os.getpid() or os.name == "nt":
+        # Our pid but not us: an earlier process. (Multi-worker mode needs
+        # fcntl, so on Windows no other live process runs screenings.)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False  # alive, just not ours to signal
+    return False
+
+
+def fail_interrupted(screening_id: str = None) -> int:
+    """Fails 'running' screenings (all, or just screening_id) whose owning
+    process has exited, recording an "error" and a final "done" event so
+    their streams end. Returns how many were failed."""
+    query = "SELECT id, owner FROM screenings WHERE status = 'running'"
+    params = ()
+    if screening_id is not None:
+        query, params = query + " AND id = ?", (screening_id,)
+    orphaned = [row["id"] for row in _conn().execute(query, params).fetchall() if _owner_gone(row["owner"])]
+    failed = 0
+    for orphan in orphaned:
+        with db.transaction() as conn:
+            # Guarded on status, so concurrent callers fail it only once.
+            if conn.execute(
+                "UPDATE screenings SET status = 'failed', finished_at = ? WHERE id = ? AND status = 'running'",
+                (datetime.now().isoformat(), orphan),
+            ).rowcount:
+                _append(conn, orphan, {"type": "error", "detail": "interrupted: the screening process exited mid-run"})
+                _append(conn, orphan, {"type": "done", "status": "failed"})
+                failed += 1
+    return failed
+
+
+def get_screening(screening_id: str):
+    row = _conn().execute(
+        "SELECT id, job_query, total, status, created_at, finished_at FROM screenings WHERE id = ?",
+        (screening_id,),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def events_after(screening_id: str, after: int = 0) -> list:
+    rows = _conn().execute(
+        "SELECT event FROM screening_events WHERE screening_id = ? AND seq > ? ORDER BY seq",
+        (screening_id, after),
+    )
+    return [json.loads(row["event"]) for row in rows]
@@ -0,0 +1,143 @@
+"""
+Per-chat conversation memory. rag_chatbot used to keep one global
+ConversationBufferWindowMemory that every request cleared and re-filled from
+the chat's full message list, so two chats streaming at once overwrote each
+other's history. Each chat now gets its own window, kept warm in a small
+LRU, and only rebuilt from chat_store (last few messages, not the whole chat)
+when it isn't already cached.
+
+In multi-worker mode (see deployment.py) a chat's turns can be answered by
+different workers, so a warm window is only used while the chat's answer
+count in chat_store still matches the turns the window has seen (counted
+when it was built, plus one per save_turn); otherwise it's rebuilt from the
+store. Answers rather than messages: by the time the next request reads
+its history, its own user message is already saved.
+
+Sizing:
+  SESSION_CACHE_SIZE   how many chats to keep warm (default 256)
+  SESSION_TTL_SECONDS  drop a warm window after this long unused (default 1800)
+  SESSION_WINDOW_K     conversation pairs kept per chat (default 3)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langchain.memory import ConversationBufferWindowMemory
+
+from . import chat_store, deployment
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_WINDOW_K = int(os.getenv("SESSION_WINDOW_K", "3"))
+
+
+def pair_turns(chat_messages) -> list:
+    """(user, assistant) pairs in order, skipping any user message that never
+    got an answer (e.g. a stream that errored before anything was saved)."""
+    pairs = []
+    pending_user = None
+    for msg in chat_messages:
+        if msg["role"] == "user":
+            pending_user = msg["content"]
+        elif msg["role"] == chat_store.ASSISTANT_ROLE and pending_user is not None:
+            pairs.append((pending_user, msg["content"]))
+            pending_user = None
+    return pairs
+
+
+class SessionMemoryManager:
+    def __init__(self, max_sessions: int = SESSION_CACHE_SIZE, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 window_k: int = SESSION_WINDOW_K, validate: bool = deployment.MULTI_WORKER):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.window_k = window_k
+        self.validate = validate
+        self._sessions = OrderedDict()  # chat_id -> (memory, last_used, answer count or None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _new_memory(self, pairs) -> ConversationBufferWindowMemory:
+        memory = ConversationBufferWindowMemory(k=self.window_k, return_messages=True)
+        for user_content, assistant_content in pairs[-self.window_k:]:
+            memory.save_context({"input": user_content}, {"output": assistant_content})
+        return memory
+
+    def _fresh(self, entry, now: float, count) -> bool:
+        return entry is not None and now - entry[1] <= self.ttl_seconds and entry[2] == count
+
+    def get(self, chat_id) -> ConversationBufferWindowMemory:
+        now = time.monotonic()
+        count = chat_store.answer_count(chat_id) if self.validate else None
+        with self._lock:
+            entry = self._sessions.get(chat_id)
+            if self._fresh(entry, now, count):
+                self._sessions[chat_id] = (entry[0], now, count)
+                self._sessions.move_to_end(chat_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Rebuild outside the lock so a slow read for one chat doesn't stall
+        # every other chat. Extra messages cover unanswered/unpaired turns.
+        recent = chat_store.get_recent_messages(chat_id, self.window_k * 2 + 2)
+        memory = self._new_memory(pair_turns(recent))
+
+        with self._lock:
+            entry = self._sessions.get(chat_id)
+            if self._fresh(entry, now, count):
+                # Someone else rebuilt it while we were reading; keep theirs.
+                memory = entry[0]
+            self._sessions[chat_id] = (memory, now, count)
+            self._sessions.move_to_end(chat_id)
+            self._evict(now)
+        return memory
+
+    def _evict(self, now: float) -> None:
+        for chat_id in [cid for cid, (_, used, _) in self._sessions.items() if now - used > self.ttl_seconds]:
+            del self._sessions[chat_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def history(self, chat_id) -> list:
+        if chat_id is None:
+            return []
+        return self.get(chat_id).load_memory_variables({})["history"]
+
+    def save_turn(self, chat_id, user_content: str, assistant_content: str) -> None:
+        if chat_id is None:
+            return
+        memory = self.get(chat_id)
+        memory.save_context({"input": user_content}, {"output": assistant_content})
+        with self._lock:
+            entry = self._sessions.get(chat_id)
+            if self.validate and entry is not None and entry[0] is memory:
+                # The caller saves this answer to chat_store right after, so
+                # the window is expected to be one answer ahead from now on.
+                self._sessions[chat_id] = (memory, entry[1], entry[2] + 1)
+
+    def prime(self, chat_id, chat_messages) -> None:
+        """Replace a chat's warm window with the given message list."""
+        memory = self._new_memory(pair_turns(chat_messages))
+        with self._lock:
+            count = None
+            if self.validate:
+                count = sum(1 for msg in chat_messages if msg["role"] == chat_store.ASSISTANT_ROLE)
+            self._sessions[chat_id] = (memory, time.monotonic(), count)
+            self._sessions.move_to_end(chat_id)
+            self._evict(time.monotonic())
+
+    def discard(self, chat_id) -> None:
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+sessions = SessionMemoryManager()
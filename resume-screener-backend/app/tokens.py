@@ -0,0 +1,33 @@
+"""
+Token counting without a tokenizer dependency. Groq's Llama models don't ship
+a tokenizer we can load cheaply, and we only need counts for budgets and
+metrics, so this uses tiktoken's cl100k_base when it happens to be installed
+and otherwise the usual ~4 characters per token estimate.
+"""
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or no network to fetch the encoding
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut at a word boundary so it fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    tokens = count_tokens(text)
+    while tokens > max_tokens:
+        keep = max(1, int(len(text) * max_tokens / tokens) - 1)
+        cut = text.rfind(" ", 0, keep)
+        text = text[:cut if cut > 0 else keep].rstrip()
+        tokens = count_tokens(text)
+    return text
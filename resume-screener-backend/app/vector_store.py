@@ -4,77 +4,543 @@ plain functions with no import-time side effects — the original ran
 add_pdfs_to_db("pdfs") automatically on import, which isn't safe once this
 gets imported every time the FastAPI server (re)starts.
 """
+import hashlib
 import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
 from langchain_chroma import Chroma
 from langchain.docstore.document import Document
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from . import db, deployment, doc_registry, folder_manifest, lexical_index, pdf_extraction
+from .embeddings import get_embeddings
+from .response_cache import response_cache
 
 PERSIST_DIRECTORY = "chroma_db"
 
-_embedding_function = None
+# Job descriptions are indexed as overlapping chunks rather than one vector
+# per PDF — bge-small only reads the first 512 tokens of whatever it's given,
+# so a whole merged JD was mostly never embedded. Sizes are in characters
+# (~4 per token), so the default chunk sits comfortably inside that window.
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Chunks per embedding call when indexing, across all files in the batch.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+# The one Chroma handle for the process — rag_chatbot's retriever, pre-ranking
+# and the indexing functions below all share it. Document count and last
+# index time are kept alongside it so status checks never touch Chroma.
 _vectorstore = None
+_doc_ids = set()
+_last_indexed_at = None
+_lock = threading.Lock()
+
+# Multi-worker mode (see deployment.py): every write to the index stores a
+# new generation id in store_meta; a worker whose handle was opened at an
+# older generation reopens it.
+INDEX_GENERATION_KEY = "vector_index_generation"
+_generation = None
+_checked_at = 0.0
+
+# Screened resumes live in a second collection in the same chroma_db/ (see
+# candidate_index.py). It has its own generation, so a new candidate doesn't
+# make every worker reopen the JD index and drop what's derived from it.
+CANDIDATE_COLLECTION = "candidates"
+CANDIDATE_GENERATION_KEY = "candidate_index_generation"
+_candidate_store = None
+_candidate_generation = None
+_candidate_checked_at = 0.0
 
 
 def get_embedding_function():
-    global _embedding_function
-    if _embedding_function is None:
-        _embedding_function = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    return _embedding_function
+    # Same instance rag_chatbot queries with, so stored and query vectors are
+    # always normalized the same way.
+    return get_embeddings()
 
 
 def get_vectorstore():
-    global _vectorstore
-    if _vectorstore is None:
-        os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
-        _vectorstore = Chroma(
-            persist_directory=PERSIST_DIRECTORY,
-            embedding_function=get_embedding_function(),
+    """The shared handle, creating chroma_db/ if it doesn't exist yet.
+    Dropping a stale handle and reopening happen under one lock, and the
+    handle returned is the one this call saw, so a refresh in another
+    thread can never hand back None."""
+    global _vectorstore, _candidate_store, _generation
+    seen = _changed_generation() if _vectorstore is not None and deployment.MULTI_WORKER else None
+    refreshed = False
+    with _lock:
+        if seen is not None and seen != _generation and _vectorstore is not None:
+            # Not yet reopened by another thread since the check.
+            _release_chroma_system()
+            _vectorstore = None
+            _candidate_store = None
+            refreshed = True
+        vectorstore = _vectorstore
+        if vectorstore is None:
+            os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+            # Read before opening, so a write landing mid-open still
+            # triggers a refresh next time.
+            _generation = db.get_meta(INDEX_GENERATION_KEY)
+            vectorstore = Chroma(
+                persist_directory=PERSIST_DIRECTORY,
+                embedding_function=get_embedding_function(),
+            )
+            _load_counters(vectorstore)
+            _vectorstore = vectorstore
+    if refreshed:
+        lexical_index.invalidate_stats()
+        response_cache.clear()
+    return vectorstore
+
+
+def open_existing():
+    """The shared handle if chroma_db/ exists, else None — without creating
+    the directory. Used at startup and by rag_chatbot."""
+    if _vectorstore is None and not os.path.exists(PERSIST_DIRECTORY):
+        return None
+    return get_vectorstore()
+
+
+def get_candidate_store():
+    """The resume collection, creating it if needed. Cosine space, since
+    candidate_index turns distances into similarity scores."""
+    global _candidate_store, _candidate_generation
+    get_vectorstore()
+    seen = _changed_candidate_generation() if _candidate_store is not None and deployment.MULTI_WORKER else None
+    with _lock:
+        if seen is not None and seen != _candidate_generation and _candidate_store is not None:
+            # Releasing the cached Chroma client only affects handles opened
+            # afterwards, so the JD handle, lexical_index stats and the
+            # response cache are left alone.
+            _release_chroma_system()
+            _candidate_store = None
+        store = _candidate_store
+        if store is None:
+            _candidate_generation = db.get_meta(CANDIDATE_GENERATION_KEY)
+            store = Chroma(
+                collection_name=CANDIDATE_COLLECTION,
+                persist_directory=PERSIST_DIRECTORY,
+                embedding_function=get_embedding_function(),
+                collection_metadata={"hnsw:space": "cosine"},
+            )
+            _candidate_store = store
+    return store
+
+
+def close() -> None:
+    """Drops the shared handles (shutdown hook). The next call reopens them."""
+    global _vectorstore, _candidate_store
+    with _lock:
+        _vectorstore = None
+        _candidate_store = None
+
+
+def _release_chroma_system() -> None:
+    """Makes the next Chroma() for PERSIST_DIRECTORY load the index from disk
+    again instead of reusing this process's cached client. The old client
+    isn't stopped, so queries already running on it finish normally."""
+    from chromadb.api.client import SharedSystemClient
+
+    systems = getattr(SharedSystemClient, "_identifer_to_system", None)
+    if systems is None:
+        SharedSystemClient.clear_system_cache()
+        return
+    for key in [key for key in systems if os.path.normpath(key) == os.path.normpath(PERSIST_DIRECTORY)]:
+        systems.pop(key, None)
+
+
+def _changed_generation():
+    """The index generation in store_meta if another process (the index
+    writer) has changed the index since the handle was opened, else None.
+    Checks at most every deployment.INDEX_REFRESH_SECONDS."""
+    global _checked_at
+    now = time.monotonic()
+    if now - _checked_at < deployment.INDEX_REFRESH_SECONDS:
+        return None
+    _checked_at = now
+    generation = db.get_meta(INDEX_GENERATION_KEY)
+    return generation if generation != _generation else None
+
+
+def mark_changed() -> None:
+    """Records that this process wrote chroma_db/, so other workers reopen it."""
+    global _generation
+    _generation = uuid.uuid4().hex
+    db.set_meta(INDEX_GENERATION_KEY, _generation)
+
+
+def _changed_candidate_generation():
+    """_changed_generation for the candidate collection alone."""
+    global _candidate_checked_at
+    now = time.monotonic()
+    if now - _candidate_checked_at < deployment.INDEX_REFRESH_SECONDS:
+        return None
+    _candidate_checked_at = now
+    generation = db.get_meta(CANDIDATE_GENERATION_KEY)
+    return generation if generation != _candidate_generation else None
+
+
+def mark_candidates_changed() -> None:
+    """mark_changed for the candidate collection."""
+    global _candidate_generation
+    _candidate_generation = uuid.uuid4().hex
+    db.set_meta(CANDIDATE_GENERATION_KEY, _candidate_generation)
+
+
+def _backfill_registry(vectorstore) -> None:
+    """One-time: registers every document already in the collection."""
+    results = vectorstore._collection.get(include=["metadatas"])
+    docs = {}
+    for chunk_id, metadata in zip(results["ids"], results["metadatas"]):
+        metadata = metadata or {}
+        parent = _parent_id(chunk_id, metadata)
+        entry = docs.setdefault(parent, [parent, metadata.get("source", parent), 0, None, None])
+        entry[2] += 1
+        indexed_at = metadata.get("indexed_at")
+        if indexed_at and (entry[3] is None or indexed_at > entry[3]):
+            entry[3] = indexed_at
+    doc_registry.upsert(docs.values())
+    db.set_meta("doc_registry_backfilled", datetime.now().isoformat())
+
+
+def _backfill_lexical_index(vectorstore) -> None:
+    """One-time: adds every chunk already in the collection to lexical_index."""
+    collection = vectorstore._collection
+    for offset in range(0, collection.count(), INGEST_BATCH_SIZE):
+        results = collection.get(include=["documents", "metadatas"], limit=INGEST_BATCH_SIZE, offset=offset)
+        lexical_index.add_chunks(
+            (chunk_id, _parent_id(chunk_id, metadata), text or "")
+            for chunk_id, metadata, text in zip(results["ids"], results["metadatas"], results["documents"])
         )
-    return _vectorstore
+    db.set_meta("lexical_index_backfilled", datetime.now().isoformat())
+
+
+def _load_counters(vectorstore) -> None:
+    global _last_indexed_at
+    # Only the index writer backfills; other workers see its result.
+    if deployment.is_index_writer():
+        if not db.get_meta("doc_registry_backfilled"):
+            _backfill_registry(vectorstore)
+        if not db.get_meta("lexical_index_backfilled"):
+            _backfill_lexical_index(vectorstore)
+    _doc_ids.clear()
+    _doc_ids.update(doc_registry.ids())
+    _last_indexed_at = doc_registry.last_indexed_at()
+
+
+def stats() -> dict:
+    """Cached counters only; never opens or queries Chroma."""
+    return {
+        "open": _vectorstore is not None,
+        "documents": len(_doc_ids),
+        "last_indexed_at": _last_indexed_at,
+    }
+
+
+def _parent_id(chunk_id: str, metadata) -> str:
+    # Entries indexed before chunking was added are one vector per PDF, stored
+    # under the doc id itself with only a "source" in their metadata.
+    return (metadata or {}).get("parent_id") or chunk_id
+
+
+LIST_INCLUDES = ("tags", "metadatas", "documents")
+
+
+def list_indexed_docs(cursor=None, limit: int = 50, include=(), source=None,
+                      indexed_after=None, indexed_before=None, tag=None):
+    """One page of indexed PDFs (id, source, chunk count, indexed_at), read
+    from doc_registry and filtered there. Chroma is only queried when
+    `include` asks for "metadatas" and/or "documents", and then just for the
+    chunks of this page's documents; "tags" adds each document's tags.
+    Returns {"items": [...], "next_cursor": ...}."""
+    get_vectorstore()  # backfills the registry on first use
+    docs, next_cursor = doc_registry.page(cursor, limit, source, indexed_after, indexed_before, tag)
+    if "tags" in include:
+        tags = doc_registry.tags_for(d["id"] for d in docs)
+        for doc in docs:
+            doc["tags"] = tags[doc["id"]]
+    if ("metadatas" in include or "documents" in include) and docs:
+        # Metadata always comes back (it's small and carries the parent id
+        # and chunk order); bodies only when asked for.
+        fields = ["metadatas", "documents"] if "documents" in include else ["metadatas"]
+        results = get_vectorstore()._collection.get(
+            where={"parent_id": {"$in": [doc["id"] for doc in docs]}}, include=fields
+        )
+        by_parent = {}
+        for i, chunk_id in enumerate(results["ids"]):
+            metadata = results["metadatas"][i] or {}
+            chunk = {"id": chunk_id}
+            if "metadatas" in include:
+                chunk["metadata"] = metadata
+            if "documents" in include:
+                chunk["text"] = results["documents"][i]
+            by_parent.setdefault(_parent_id(chunk_id, metadata), []).append((metadata.get("chunk_index", 0), chunk))
+        for doc in docs:
+            doc["chunk_list"] = [chunk for _, chunk in sorted(by_parent.get(doc["id"], []), key=lambda c: c[0])]
+    return {"items": docs, "next_cursor": next_cursor}
 
 
 def list_all_index_ids():
+    """Indexed doc ids from the cached set — no Chroma read."""
+    get_vectorstore()
+    return sorted(_doc_ids)
+
+
+def _headings(text: str):
+    """(offset, heading) for lines that look like section titles in a JD —
+    short, no sentence punctuation, and either "Title:" or Title/UPPER case."""
+    found, offset = [], 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if 0 < len(stripped) <= 60 and not stripped.endswith((".", ",", ";")):
+            words = stripped.rstrip(":").split()
+            if stripped.endswith(":") or (
+                len(words) <= 6 and (stripped.isupper() or all(w[:1].isupper() for w in words if w[:1].isalpha()))
+            ):
+                found.append((offset, stripped.rstrip(":")))
+        offset += len(line)
+    return found
+
+
+def chunk_pages(pages, doc_id: str, version: str = ""):
+    """Splits one PDF's pages into overlapping chunks small enough for
+    bge-small's 512-token window. Each chunk records its page, the section
+    heading it falls under, the parent doc id it belongs to and the version
+    of that document it was indexed as."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    indexed_at = datetime.now().isoformat()
+    chunks, section = [], ""
+    for page_number, page in enumerate(pages, 1):
+        text = page.page_content
+        headings = _headings(text)
+        cursor = 0
+        for piece in splitter.split_text(text):
+            start = text.find(piece, cursor)
+            if start == -1:
+                start = cursor
+            cursor = start + 1
+            for offset, heading in headings:
+                if offset > start:
+                    break
+                section = heading
+            chunks.append(Document(
+                page_content=piece,
+                metadata={
+                    "source": doc_id,
+                    "parent_id": doc_id,
+                    "page": page.metadata.get("page", page_number - 1) + 1,
+                    "section": section,
+                    "chunk_index": len(chunks),
+                    "indexed_at": indexed_at,
+                    "version": version,
+                },
+            ))
+    for chunk in chunks:
+        chunk.metadata["chunk_count"] = len(chunks)
+    return chunks
+
+
+def _chunk_id(metadata) -> str:
+    if metadata.get("version"):
+        return f"{metadata['parent_id']}::{metadata['version']}::chunk-{metadata['chunk_index']}"
+    return f"{metadata['parent_id']}::chunk-{metadata['chunk_index']}"
+
+
+def _add_chunks(chunks, doc_tags: dict) -> None:
+    """Embeds and stores chunks INGEST_BATCH_SIZE at a time, then records
+    each doc id in doc_tags as indexed (in doc_registry too, with its tags
+    if not None)."""
+    global _last_indexed_at
+    vectorstore = get_vectorstore()
+    for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+        batch = chunks[start:start + INGEST_BATCH_SIZE]
+        ids = [_chunk_id(c.metadata) for c in batch]
+        vectorstore.add_documents(batch, ids=ids)
+        lexical_index.add_chunks(
+            (chunk_id, c.metadata["parent_id"], c.page_content) for chunk_id, c in zip(ids, batch)
+        )
+    indexed_at = datetime.now().isoformat()
+    counts = Counter(c.metadata["parent_id"] for c in chunks)
+    doc_registry.upsert((doc_id, doc_id, counts[doc_id], indexed_at, tags) for doc_id, tags in doc_tags.items())
+    with _lock:
+        _doc_ids.update(doc_tags)
+        _last_indexed_at = indexed_at
+    mark_changed()
+
+
+def _drop_old_versions(doc_id: str, version: str) -> None:
+    """Deletes every chunk of doc_id not belonging to `version`, including
+    unversioned and pre-chunking entries. Runs after the new version is
+    stored, so the document never disappears from search mid-replace."""
     collection = get_vectorstore()._collection
-    results = collection.get()
-    return results["ids"]
+    results = collection.get(where={"parent_id": doc_id}, include=["metadatas"])
+    stale = [
+        chunk_id for chunk_id, metadata in zip(results["ids"], results["metadatas"])
+        if (metadata or {}).get("version") != version
+    ]
+    collection.delete(ids=stale + [doc_id])
+    lexical_index.delete_chunks(stale + [doc_id])
+    response_cache.invalidate_docs([doc_id])
+    mark_changed()
+
+
+def ingest_files(items, on_file=None) -> None:
+    """Indexes (file_path, doc_id, tags, ...) items as one batch: PDFs parse in
+    pdf_extraction's process pool, and chunks from every file are embedded
+    together INGEST_BATCH_SIZE at a time as parses finish. Each document is
+    written as a new version, then older versions are deleted, so replacing
+    a JD never leaves a window where it's missing.
+
+    on_file(item, error) is called once per item (extra tuple fields are
+    passed through untouched): error is None once its chunks are stored,
+    else why it wasn't indexed — including a PDF with no extractable text,
+    which is never registered and leaves any earlier version in place.
+    If the same doc id
+    appears more than once, the last item wins."""
+    on_file = on_file or (lambda item, error: None)
+    latest = {item[1]: item for item in items}
+    for item in items:
+        if latest[item[1]] is not item:
+            on_file(item, "superseded by a later upload of the same document")
+    by_path = {item[0]: item for item in latest.values()}
+
+    pending_chunks, pending_items, versions = [], [], {}
+
+    def flush():
+        _add_chunks(pending_chunks, {item[1]: item[2] for item in pending_items})
+        for item in pending_items:
+            _drop_old_versions(item[1], versions[item[1]])
+            on_file(item, None)
+        pending_chunks.clear()
+        pending_items.clear()
+
+    for path, pages in pdf_extraction.map_in_pool(pdf_extraction.load_pdf_pages, by_path):
+        item = by_path[path]
+        if isinstance(pages, BaseException):
+            on_file(item, str(pages) or type(pages).__name__)
+            continue
+        version = uuid.uuid4().hex[:12]
+        chunks = chunk_pages(pages, item[1], version)
+        if not chunks:
+            # Registering it would list a JD nothing can retrieve, and as a
+            # replacement it would delete the good previous version.
+            on_file(item, "no extractable text (scanned or image-only PDF?)")
+            continue
+        versions[item[1]] = version
+        pending_chunks.extend(chunks)
+        pending_items.append(item)
+        if len(pending_chunks) >= INGEST_BATCH_SIZE:
+            flush()
+    if pending_items:
+        flush()
+
+
+def add_pdfs_to_db(files, tags=None):
+    """Indexes several PDFs in one go. `files` is a list of (file_path,
+    doc_id); every file's chunks are embedded together in batches of
+    INGEST_BATCH_SIZE rather than one small embedding call per upload.
+    Returns the doc ids that were indexed; raises if any file failed."""
+    errors = []
+
+    def on_file(item, error):
+        if error:
+            errors.append(f"{item[1]}: {error}")
+
+    ingest_files([(file_path, doc_id, tags) for file_path, doc_id in files], on_file)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return [doc_id for _, doc_id in files]
 
 
 def add_pdf_to_db(file_path: str, doc_id: str):
-    """Loads one PDF, merges all pages into a single document, and indexes it
-    under doc_id (matches the original add_pdfs_to_db behaviour, one file at a time)."""
-    vectorstore = get_vectorstore()
-    loader = PDFPlumberLoader(file_path)
-    docs = loader.load()
-    full_text = "\n".join(doc.page_content for doc in docs)
-    merged_doc = Document(page_content=full_text, metadata={"source": doc_id})
-    vectorstore.add_documents([merged_doc], ids=[doc_id])
+    """Loads one PDF, splits it into chunks and indexes them under doc_id."""
+    add_pdfs_to_db([(file_path, doc_id)])
 
 
 def delete_index_by_id(doc_id: str):
-    get_vectorstore().delete(ids=[doc_id])
+    """Removes every chunk of doc_id (and a pre-chunking single-vector entry, if any)."""
+    collection = get_vectorstore()._collection
+    collection.delete(where={"parent_id": doc_id})
+    collection.delete(ids=[doc_id])
+    lexical_index.delete_parent(doc_id)
+    doc_registry.delete(doc_id)
+    with _lock:
+        _doc_ids.discard(doc_id)
+    response_cache.invalidate_docs([doc_id])
+    mark_changed()
+
+
+def delete_docs(doc_ids, progress=None):
+    """delete_index_by_id for several documents, as an ingest_jobs job."""
+    doc_ids = list(doc_ids)
+    for i, doc_id in enumerate(doc_ids, 1):
+        delete_index_by_id(doc_id)
+        if progress:
+            progress(i, len(doc_ids))
+    return {"deleted": doc_ids}
 
 
 def update_index(doc_id: str, new_pdf_path: str):
-    vectorstore = get_vectorstore()
-    vectorstore.delete(ids=[doc_id])
-    loader = PDFPlumberLoader(new_pdf_path)
-    docs = loader.load()
-    full_text = "\n".join(doc.page_content for doc in docs)
-    merged_doc = Document(page_content=full_text, metadata={"source": doc_id})
-    vectorstore.add_documents([merged_doc], ids=[doc_id])
-
-
-def sync_pdfs_folder(folder: str = "pdfs"):
-    """Optional bulk-import: index every .pdf sitting in `folder` (relative to
-    wherever the server process runs, i.e. the backend directory) that isn't
-    already indexed, using the filename as the doc id — same convention as
-    the API upload path. Skips ids already in the store rather than
-    re-indexing them, so it's safe to call repeatedly (e.g. on startup, or
-    from a manual "sync" button) without duplicating documents.
+    """Re-indexes doc_id from a new PDF, keeping its tags. The new version is
+    stored before the old one is deleted."""
+    add_pdf_to_db(new_pdf_path, doc_id)
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _scan_folder(folder: str, known: dict):
+    """Compares the folder against its manifest. Returns (to_index, touched,
+    unchanged, skipped): files to (re)index as (path, doc_id, size, mtime,
+    sha256), manifest rows to refresh without re-indexing, filenames left as
+    they are, and new files whose doc id is already taken by a document the
+    manifest doesn't track (an API upload), which sync leaves alone.
+    Consumes `known`, leaving only rows whose file is gone."""
+    to_index, touched, unchanged, skipped = [], [], [], []
+    for filename in sorted(os.listdir(folder)):
+        if not filename.lower().endswith(".pdf"):
+            continue
+        st = os.stat(os.path.join(folder, filename))
+        row = known.pop(filename, None)
+        if row and row["size"] == st.st_size and row["mtime"] == st.st_mtime:
+            unchanged.append(filename)
+            continue
+        digest = _file_sha256(os.path.join(folder, filename))
+        entry = (filename, filename, st.st_size, st.st_mtime, digest)
+        if row and row["sha256"] == digest:
+            touched.append(entry)  # only the mtime moved
+            unchanged.append(filename)
+        elif row is None and filename in _doc_ids:
+            # Indexed through the upload API (or by a sync from before the
+            # manifest, which can't be told apart): not ours to replace, nor
+            # to delete later when the file leaves the folder.
+            skipped.append({"id": filename, "reason": "already indexed outside the folder sync"})
+        else:
+            to_index.append(entry)
+    return to_index, touched, unchanged, skipped
+
+
+def sync_pdfs_folder(folder: str = "pdfs", progress=None):
+    """Optional bulk-import: brings the index in line with every .pdf sitting
+    in `folder` (relative to wherever the server process runs, i.e. the
+    backend directory), using the filename as the doc id — same convention
+    as the API upload path. Incremental: a manifest of size, mtime and
+    SHA-256 per file (folder_manifest) means unchanged files aren't even
+    read, edited files are re-indexed, and files deleted from the folder
+    are removed from the index. Documents added through the upload API are
+    never touched.
+
+    New and changed files go through ingest_files (process-pool parsing,
+    batched embedding, swap-then-delete replacement). `progress(processed,
+    total)` is called as files complete; meant to run as an ingest_jobs job
+    rather than inside a request.
 
     This is a fallback alongside the upload API, not a replacement for it —
-    add_pdf_to_db() below (used by the /vector-db/docs upload endpoint)
+    add_pdfs_to_db() above (used by the /vector-db/docs upload endpoint)
     works with no folder involved at all.
     """
     if not os.path.isdir(folder):
@@ -83,17 +549,39 @@ def sync_pdfs_folder(folder: str = "pdfs"):
         # working directories). Create it now so the sync becomes a normal
         # "found nothing yet" result instead of a 404 error.
         os.makedirs(folder, exist_ok=True)
-        return {"added": [], "skipped": [], "note": f"Created '{folder}/' — drop PDFs in there and sync again"}
+        return {"added": [], "updated": [], "removed": [], "unchanged": [], "failed": [], "skipped": [],
+                "note": f"Created '{folder}/' — drop PDFs in there and sync again"}
 
-    existing_ids = set(list_all_index_ids())
-    added, skipped = [], []
-    for filename in sorted(os.listdir(folder)):
-        if not filename.lower().endswith(".pdf"):
-            continue
-        if filename in existing_ids:
-            skipped.append(filename)
-            continue
-        add_pdf_to_db(os.path.join(folder, filename), doc_id=filename)
-        added.append(filename)
+    manifest_key = os.path.abspath(folder)
+    get_vectorstore()  # loads _doc_ids
+    known = folder_manifest.entries(manifest_key)
+    to_index, touched, unchanged, skipped = _scan_folder(folder, known)
+    if touched:
+        folder_manifest.record(manifest_key, touched)
+
+    removed = [row["doc_id"] for row in known.values()]
+    for doc_id in removed:
+        delete_index_by_id(doc_id)
+    folder_manifest.remove(manifest_key, list(known))
+
+    total = len(to_index)
+    if progress:
+        progress(0, total)
+    added, updated, failed = [], [], []
+    entries = {entry[0]: entry for entry in to_index}
+    existing = set(_doc_ids)
+
+    def on_file(item, error):
+        entry = entries[item[1]]
+        if error:
+            failed.append({"id": item[1], "error": error})
+        else:
+            (updated if item[1] in existing else added).append(item[1])
+            folder_manifest.record(manifest_key, [entry])
+        if progress:
+            progress(len(added) + len(updated) + len(failed), total)
+
+    ingest_files([(os.path.join(folder, entry[0]), entry[1], None) for entry in to_index], on_file)
 
-    return {"added": added, "skipped": skipped}
+    return {"added": added, "updated": updated, "removed": removed, "unchanged": unchanged, "failed": failed,
+            "skipped": skipped}
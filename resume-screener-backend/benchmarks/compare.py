@@ -0,0 +1,66 @@
+"""
+Side-by-side view of two benchmark result files:
+
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Prints every numeric result present in either file with its relative change.
+For *_ms and *seconds (latencies) lower is better; for *_per_second and
+hit_rate higher is better — changes beyond --threshold percent in the wrong
+direction are flagged.
+"""
+import argparse
+import json
+
+
+def flatten(results, prefix="") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def _higher_is_better(name: str) -> bool:
+    leaf = name.rsplit(".", 1)[-1]
+    return leaf.endswith("_per_second") or leaf == "hit_rate"
+
+
+def _is_latency(name: str) -> bool:
+    leaf = name.rsplit(".", 1)[-1]
+    return leaf.endswith("_ms") or leaf.endswith("seconds")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="flag regressions above this percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"before: {before.get('commit') or '?'}{' (dirty)' if before.get('dirty') else ''}")
+    print(f"after:  {after.get('commit') or '?'}{' (dirty)' if after.get('dirty') else ''}")
+    if before.get("config") != after.get("config"):
+        print("warning: the runs used different configurations")
+
+    old, new = flatten(before["results"]), flatten(after["results"])
+    width = max((len(name) for name in old.keys() | new.keys()), default=10)
+    for name in sorted(old.keys() | new.keys()):
+        a, b = old.get(name), new.get(name)
+        if a is None or b is None:
+            print(f"{name:<{width}}  {a if a is not None else '-':>12}  {b if b is not None else '-':>12}")
+            continue
+        change = (b - a) / a * 100 if a else 0.0
+        worse = (change < -args.threshold) if _higher_is_better(name) else (
+            _is_latency(name) and change > args.threshold)
+        print(f"{name:<{width}}  {a:>12}  {b:>12}  {change:+8.1f}%{'  <-- regression' if worse else ''}")
+
+
+if __name__ == "__main__":
+    main()
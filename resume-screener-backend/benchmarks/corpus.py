@@ -0,0 +1,135 @@
+"""
+Synthetic job descriptions and resumes, written as real (text-layer) PDFs so
+they go through the same pdf_text path as uploads. Generation is seeded:
+the same --seed and counts give byte-identical corpora, so results from
+different commits are comparable.
+
+The PDF writer is deliberately minimal — one Helvetica font, one text
+object per page — but produces files any PDF parser accepts.
+"""
+import os
+import random
+
+TITLES = ["Data Engineer", "Backend Developer", "Frontend Developer", "ML Engineer", "DevOps Engineer",
+          "Product Manager", "QA Analyst", "Security Engineer", "Data Scientist", "Mobile Developer",
+          "Site Reliability Engineer", "Business Analyst", "Solutions Architect", "Support Engineer"]
+SKILLS = ["Python", "Java", "Go", "Rust", "TypeScript", "React", "Kafka", "Spark", "Airflow", "SQL",
+          "PostgreSQL", "Kubernetes", "Terraform", "AWS", "GCP", "Azure", "Docker", "PyTorch", "TensorFlow",
+          "FastAPI", "Django", "GraphQL", "Redis", "Snowflake", "dbt", "SOC2", "Jenkins", "Linux", "Swift",
+          "Kotlin", "Tableau", "Excel", "Scala", "Hadoop", "Elasticsearch", "gRPC", "C++", "Figma"]
+LOCATIONS = ["Bengaluru", "Hyderabad", "Pune", "Remote", "Berlin", "London", "Austin", "Toronto", "Singapore"]
+VERBS = ["Built", "Designed", "Led", "Migrated", "Optimized", "Maintained", "Shipped", "Automated", "Scaled"]
+OBJECTS = ["a streaming pipeline", "the billing service", "an internal analytics platform", "CI/CD for 40 repos",
+           "a customer-facing API", "the data warehouse", "model training infrastructure", "the mobile app"]
+SCHOOLS = ["IIT Delhi", "NIT Trichy", "Jadavpur University", "TU Munich", "University of Toronto", "BITS Pilani"]
+FIRST = ["Aarav", "Diya", "Rohan", "Meera", "Sam", "Alex", "Priya", "Kiran", "Jordan", "Ananya", "Noah", "Ira"]
+LAST = ["Sharma", "Das", "Iyer", "Kapoor", "Lee", "Garcia", "Nair", "Sen", "Patel", "Brown", "Khan", "Roy"]
+
+# The same paragraph at the end of every JD, as real postings have — it
+# exercises context_budget's boilerplate dropping.
+EEO = ("We are an equal opportunity employer and value diversity at our company. We do not discriminate "
+       "on the basis of race, religion, color, national origin, gender, sexual orientation, age, marital "
+       "status, veteran status, or disability status.")
+
+
+def _wrap(text: str, width: int = 90) -> list:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + [line] if line else lines
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace").decode("latin-1")
+
+
+def make_pdf(text: str, lines_per_page: int = 60) -> bytes:
+    """A minimal PDF with `text` as its text layer (paragraphs wrapped)."""
+    lines = []
+    for paragraph in text.split("\n"):
+        lines.extend(_wrap(paragraph) or [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # 1 catalog, 2 pages, 3 font, then (page, content) per page.
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in page) + " ET"
+        stream = stream.encode("latin-1")
+        page_num, content_num = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_num} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {content_num} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def job_description(rng: random.Random, index: int) -> dict:
+    title = rng.choice(TITLES)
+    skills = rng.sample(SKILLS, 6)
+    code = f"REQ-{10000 + index}"
+    duties = [f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)}." for _ in range(rng.randint(6, 14))]
+    text = "\n\n".join([
+        f"{title} ({code})",
+        f"Location: {rng.choice(LOCATIONS)}. Experience: {rng.randint(1, 12)}+ years.",
+        "About the role\n" + " ".join(duties),
+        "Required skills\n" + ", ".join(skills[:4]),
+        "Nice to have\n" + ", ".join(skills[4:]),
+        EEO,
+    ])
+    return {"id": f"jd-{index:06d}", "title": title, "code": code, "skills": skills, "text": text}
+
+
+def resume(rng: random.Random, index: int) -> dict:
+    name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    skills = rng.sample(SKILLS, rng.randint(5, 10))
+    jobs = []
+    for _ in range(rng.randint(2, 5)):
+        bullets = [f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} with {rng.choice(skills)}." for _ in range(rng.randint(3, 6))]
+        jobs.append(f"{rng.choice(TITLES)}, {rng.randint(2012, 2024)}\n" + "\n".join(bullets))
+    text = "\n".join([
+        name,
+        "Summary",
+        f"{rng.choice(TITLES)} with {rng.randint(1, 15)} years of experience.",
+        "Skills",
+        ", ".join(skills),
+        "Experience",
+        "\n".join(jobs),
+        "Education",
+        f"B.Tech, {rng.choice(SCHOOLS)}, {rng.randint(2005, 2022)}",
+    ])
+    return {"id": f"resume-{index:06d}", "name": name, "skills": skills, "text": text}
+
+
+def write_corpus(directory: str, kind: str, count: int, seed: int = 0) -> list:
+    """Writes `count` PDFs of `kind` ("jd" or "resume") to directory and
+    returns their records, each with a "path"."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(f"{kind}-{seed}")
+    make = job_description if kind == "jd" else resume
+    records = []
+    for index in range(count):
+        record = make(rng, index)
+        record["path"] = os.path.join(directory, f"{record['id']}.pdf")
+        with open(record["path"], "wb") as f:
+            f.write(make_pdf(record["text"]))
+        records.append(record)
+    return records
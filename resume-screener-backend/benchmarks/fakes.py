@@ -0,0 +1,149 @@
+"""
+Stand-ins for the two things the backend can't run offline: the Groq LLM and
+the bge-small embedding model. install() has to run before `app` is
+imported, because rag_chatbot builds its ChatGroq clients at import time.
+
+FakeChatGroq streams a fixed-length, deterministic answer with a configurable
+delay before the first token and between tokens, so time-to-first-token and
+concurrent-stream numbers measure the backend, not Groq.
+
+Every upstream call is counted in `upstream`, and the last message it was
+sent is appended to upstream["started"], in the order calls began; setting
+upstream["rate_limit_next"] makes that many of the following calls fail
+with a 429 (FakeRateLimitError) before their first token, the way Groq
+answers a burst over its rate limit.
+
+HashingEmbeddings feature-hashes tokens into a normalized vector of the same
+size as bge-small's (384), so Chroma, MMR and the response cache see
+realistic vectors without loading a model.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+EMBEDDING_DIM = 384
+
+# Set by install(); applied to every FakeChatGroq built afterwards.
+_defaults = {}
+upstream = {"calls": 0, "rate_limit_next": 0, "started": []}
+
+_WORDS = ("candidate strengths experience python sql stakeholder delivery ownership cloud "
+          "mentoring communication gaps recommendation interview shortlist").split()
+
+
+def _seed(messages) -> int:
+    text = str(messages[-1].content) if messages else ""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=4).digest(), "big")
+
+
+def answer_tokens(messages, n_tokens: int) -> List[str]:
+    """The same n_tokens tokens for the same last message."""
+    seed = _seed(messages)
+    tokens = [f"Match score: {seed % 101}%. "]
+    for i in range(1, n_tokens):
+        tokens.append(_WORDS[(seed + i * 7) % len(_WORDS)] + " ")
+    return tokens[:n_tokens]
+
+
+class FakeRateLimitError(Exception):
+    """Shaped like groq.RateLimitError as far as llm_scheduler looks."""
+
+    status_code = 429
+
+
+def _count_call(messages) -> None:
+    upstream["calls"] += 1
+    upstream["started"].append(str(messages[-1].content) if messages else "")
+    if upstream["rate_limit_next"] > 0:
+        upstream["rate_limit_next"] -= 1
+        raise FakeRateLimitError("Rate limit reached (fake)")
+
+
+class FakeChatGroq(BaseChatModel):
+    """Drop-in for langchain_groq.ChatGroq: same constructor arguments,
+    deterministic output, no network."""
+
+    model_name: str = "fake-groq"
+    temperature: float = 0.0
+    streaming: bool = True
+    n_tokens: int = 64
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+
+    def __init__(self, model: str = "fake-groq", **kwargs):
+        super().__init__(model_name=model, **{**_defaults, **kwargs})
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        _count_call(messages)
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(answer_tokens(messages, self.n_tokens)):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        _count_call(messages)
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(answer_tokens(messages, self.n_tokens)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words feature hashing, L2-normalized."""
+
+    _token_re = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in self._token_re.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def install(n_tokens: int = 64, first_token_delay: float = 0.0, token_delay: float = 0.0,
+            embeddings: Optional[Embeddings] = None) -> None:
+    """Swaps ChatGroq for FakeChatGroq and the shared embedding model for
+    HashingEmbeddings. Call before importing `app.main`."""
+    import langchain_groq
+
+    _defaults.update(n_tokens=n_tokens, first_token_delay=first_token_delay, token_delay=token_delay)
+    langchain_groq.ChatGroq = FakeChatGroq
+
+    from app import embeddings as shared_embeddings
+
+    shared_embeddings.get_embeddings()._model = embeddings or HashingEmbeddings()
@@ -0,0 +1,142 @@
+"""
+Multi-process load test for the shared SQLite stores — what MULTI_WORKER=1
+relies on (see app/deployment.py). Several processes hammer the same
+database at once, then every write is accounted for:
+
+  * all processes append to one shared chat and to chats they create:
+    the shared chat's message_count, its message rows and their seq
+    numbers (0..n-1, no gaps, no duplicates) must all agree
+  * every created chat id is unique, and no chat's count drifts
+  * feedback: each process rates its own answers and all of them re-rate
+    one contended answer — one row per answer, none missing
+  * screening events: all processes append to one screening; seqs are
+    1..n with nothing lost
+  * the index-writer lock: exactly one process holds it at a time
+
+    cd resume-screener-backend
+    python -m benchmarks.multiprocess_writes --processes 8 --ops 500
+
+Exits non-zero if any write was lost. Runs in a temporary directory.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def _worker(worker: int, ops: int, chats_per_worker: int, shared_chat: int, screening_id: str,
+            start_barrier, writer_results) -> dict:
+    from app import chat_store, deployment, feedback_store, screening_store
+
+    deployment.MULTI_WORKER = True
+    start_barrier.wait()
+    writer_results.put((worker, deployment.is_index_writer()))
+
+    started = time.perf_counter()
+    own_chats = [chat_store.create_chat()["id"] for _ in range(chats_per_worker)]
+    for i in range(ops):
+        chat_store.save_message(shared_chat, "user", f"worker {worker} message {i}")
+        chat_store.save_message(own_chats[i % len(own_chats)], "user", f"message {i}")
+        feedback_store.log_feedback(10_000 + worker, i, "q", 1 + i % 5)
+        feedback_store.log_feedback(1, 0, f"worker {worker}", 1 + worker % 5)
+        screening_store.append_event(screening_id, {"type": "result", "worker": worker, "i": i})
+    feedback_store.shutdown()
+    elapsed = time.perf_counter() - started
+    deployment.release()
+    return {"worker": worker, "chats": own_chats, "seconds": elapsed}
+
+
+def _check(args, shared_chat: int, screening_id: str, results, writers) -> list:
+    from app import chat_store, db, feedback_store, screening_store
+
+    conn = db.get_connection()
+    failures = []
+
+    expected = args.processes * args.ops
+    count = chat_store.message_count(shared_chat)
+    seqs = [row[0] for row in conn.execute("SELECT seq FROM messages WHERE chat_id = ? ORDER BY seq", (shared_chat,))]
+    if count != expected or seqs != list(range(expected)):
+        failures.append(f"shared chat: {count} counted, {len(seqs)} rows, expected {expected} with seqs 0..{expected - 1}")
+
+    chat_ids = [chat_id for result in results for chat_id in result["chats"]]
+    if len(set(chat_ids)) != len(chat_ids):
+        failures.append("duplicate chat ids were handed out")
+    drift = conn.execute(
+        "SELECT COUNT(*) FROM chats c WHERE c.message_count != (SELECT COUNT(*) FROM messages m WHERE m.chat_id = c.id)"
+    ).fetchone()[0]
+    if drift:
+        failures.append(f"{drift} chat(s) whose message_count doesn't match their messages")
+    own_messages = conn.execute(
+        f"SELECT COUNT(*) FROM messages WHERE chat_id IN ({','.join('?' * len(chat_ids))})", chat_ids
+    ).fetchone()[0]
+    if own_messages != expected:
+        failures.append(f"per-worker chats: {own_messages} messages, expected {expected}")
+
+    feedback_rows = conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+    if feedback_rows != expected + 1:
+        failures.append(f"feedback: {feedback_rows} rows, expected {expected + 1}")
+    if not feedback_store.stats("chat"):
+        failures.append("feedback stats came back empty")
+
+    events = screening_store.events_after(screening_id)
+    if [e["seq"] for e in events] != list(range(1, expected + 1)):
+        failures.append(f"screening events: {len(events)} stored, expected {expected} with seqs 1..{expected}")
+
+    if sum(1 for _, is_writer in writers if is_writer) != 1:
+        failures.append(f"index writer lock held by {sum(1 for _, w in writers if w)} processes, expected 1")
+    return failures
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent writers against the shared SQLite stores.")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="writes of each kind per process")
+    parser.add_argument("--chats-per-process", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="resume-screener-mp-")
+    os.chdir(workdir)
+    # Set before app.db is imported, here and (inherited) in every child.
+    os.environ["APP_DB_PATH"] = os.path.join(workdir, "resume_screener.db")
+
+    from app import chat_store, screening_store
+
+    shared_chat = chat_store.create_chat()["id"]
+    screening_id = screening_store.create_screening("load test", args.processes * args.ops)
+
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    barrier, writer_results = manager.Barrier(args.processes), manager.Queue()
+    started = time.perf_counter()
+    with ctx.Pool(args.processes) as pool:
+        results = pool.starmap(_worker, [
+            (worker, args.ops, args.chats_per_process, shared_chat, screening_id, barrier, writer_results)
+            for worker in range(args.processes)
+        ])
+    wall = time.perf_counter() - started
+    writers = [writer_results.get() for _ in range(args.processes)]
+
+    failures = _check(args, shared_chat, screening_id, results, writers)
+    os.chdir(BACKEND_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+    writes = args.processes * args.ops * 5 + args.processes * args.chats_per_process
+    print(json.dumps({
+        "processes": args.processes,
+        "writes": writes,
+        "wall_seconds": round(wall, 3),
+        "writes_per_second": round(writes / wall, 1),
+        "lost_writes": failures,
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark of the PDF parsers behind app/pdf_text.py. Every installed
+parser (pymupdf, pypdf, pdfplumber) and the adaptive chain iter_pages() uses
+are run over the same corpus, one process, files read from memory:
+
+  * throughput: files/s, pages/s and MB/s;
+  * quality: pdf_text.text_quality() of the output and, for the synthetic
+    corpus, recall of the words that were written into each PDF;
+  * for the adaptive chain, how often each parser ended up being used.
+
+    cd resume-screener-backend
+    python -m benchmarks.pdf_parsers --count 200
+    python -m benchmarks.pdf_parsers --dir ../pdfs     # your own PDFs, no recall
+
+The synthetic corpus comes from benchmarks/corpus.py (seeded), so runs are
+comparable across commits. It has a clean text layer, so it measures speed
+more than robustness; point --dir at real resumes to see fallbacks happen.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app import pdf_text  # noqa: E402
+from benchmarks import corpus  # noqa: E402
+
+
+def _words(text: str) -> Counter:
+    return Counter(word.strip(".,;:()").lower() for word in text.split() if word.strip(".,;:()"))
+
+
+def recall(expected: str, extracted: str) -> float:
+    """Share of the expected words (with multiplicity) found in the output."""
+    want = _words(expected)
+    if not want:
+        return 1.0
+    got = _words(extracted)
+    return sum(min(count, got[word]) for word, count in want.items()) / sum(want.values())
+
+
+def bench(parsers, files, max_pages: int, max_chars: int) -> dict:
+    """files: (name, bytes, expected text or None)."""
+    pages = chars = failures = 0
+    quality, recalls, used = [], [], Counter()
+    started = time.perf_counter()
+    for _, data, expected in files:
+        try:
+            extracted = list(pdf_text.iter_pages(data, parsers=parsers, max_pages=max_pages, max_chars=max_chars))
+        except Exception:
+            failures += 1
+            continue
+        text = "\n\n".join(page.text for page in extracted)
+        pages += len(extracted)
+        chars += len(text)
+        quality.append(pdf_text.text_quality(text))
+        if expected is not None:
+            recalls.append(recall(expected, text))
+        if extracted:
+            used[extracted[0].parser] += 1
+    elapsed = time.perf_counter() - started
+    megabytes = sum(len(data) for _, data, _ in files) / (1024 * 1024)
+    return {
+        "files": len(files),
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(files) / elapsed, 1) if elapsed else None,
+        "pages_per_second": round(pages / elapsed, 1) if elapsed else None,
+        "mb_per_second": round(megabytes / elapsed, 2) if elapsed else None,
+        "chars": chars,
+        "mean_quality": round(sum(quality) / len(quality), 4) if quality else None,
+        "mean_recall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "parser_used": dict(used),
+    }
+
+
+def load_files(args, workdir: str) -> list:
+    if args.dir:
+        paths = sorted(glob.glob(os.path.join(args.dir, "**", "*.pdf"), recursive=True))[:args.count or None]
+        files = []
+        for path in paths:
+            with open(path, "rb") as f:
+                files.append((os.path.basename(path), f.read(), None))
+        return files
+    records = corpus.write_corpus(os.path.join(workdir, args.kind), args.kind, args.count, args.seed)
+    files = []
+    for record in records:
+        with open(record["path"], "rb") as f:
+            files.append((record["id"], f.read(), record["text"]))
+    return files
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Throughput and quality of each PDF parser.")
+    parser.add_argument("--count", type=int, default=100, help="synthetic PDFs to generate (or max files from --dir)")
+    parser.add_argument("--kind", choices=("resume", "jd"), default="resume")
+    parser.add_argument("--dir", help="benchmark the PDFs under this directory instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pages", type=int, default=pdf_text.PDF_MAX_PAGES)
+    parser.add_argument("--max-chars", type=int, default=pdf_text.PDF_MAX_CHARS)
+    args = parser.parse_args(argv)
+
+    installed = pdf_text.available_parsers(list(pdf_text.PARSERS))
+    if not installed:
+        raise SystemExit("No PDF parser installed (pymupdf, pypdf or pdfplumber)")
+    workdir = tempfile.mkdtemp(prefix="resume-screener-pdf-")
+    try:
+        files = load_files(args, workdir)
+        results = {name: bench([name], files, args.max_pages, args.max_chars) for name in installed}
+        results["adaptive"] = bench(None, files, args.max_pages, args.max_chars)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps({
+        "corpus": args.dir or f"synthetic {args.kind} x{args.count} (seed {args.seed})",
+        "adaptive_order": pdf_text.available_parsers(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+"""
+Offline benchmark run: synthetic corpora, a fake LLM, the real app.
+
+    cd resume-screener-backend
+    python -m benchmarks.run --jds 1000 --resumes 200
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Everything runs in a throwaway working directory (its own chroma_db/, SQLite
+database and resume cache), with ChatGroq and the embedding model replaced by
+the fakes in benchmarks/fakes.py, so no network or model download is needed
+and runs are repeatable. Suites:
+
+  chat_store   save_message latency, sequential and from concurrent threads
+  ingestion    vector_store.ingest_files over the JD corpus: docs/s, chunks/s
+  retrieval    retrieve_documents p50/p99 and hit rate per RETRIEVAL_MODE
+  chat         POST /api/chats/{id}/query driven in-process through the ASGI
+               app: time to first token and total, plain and with resumes
+  streams      the same endpoint at each --streams concurrency level
+  scheduler    llm_scheduler on its own: identical concurrent prompts (upstream
+               calls made), a batch burst with chat arriving behind it
+               (per-priority latency) and injected 429s (all recovered?).
+               Its checks fail the run: one upstream call for the identical
+               prompts, chat started ahead of queued batch work, no failures
+               and one retry per injected 429.
+
+Embedding cost is deliberately left out (the fake is near-free); benchmark
+the model itself separately if that's what changed. Results are written as
+JSON to benchmarks/results/<timestamp>-<commit>.json.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+SUITES = ("chat_store", "ingestion", "retrieval", "chat", "streams", "scheduler")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import corpus, fakes  # noqa: E402
+
+
+# -------------------- Helpers --------------------
+def percentile(values, p: float):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(seconds) -> dict:
+    """ms percentiles of a list of durations in seconds."""
+    ms = [s * 1000 for s in seconds if s is not None]
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+
+    try:
+        return git("rev-parse", "HEAD") or None, bool(git("status", "--porcelain", "--", "."))
+    except OSError:
+        return None, None
+
+
+def multipart(fields, files=()):
+    """(body, content_type) for form fields and (name, filename, bytes) files."""
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields
+    ]
+    for name, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"", content_type: str = None) -> dict:
+    """One request sent straight into the ASGI app — no sockets, and unlike
+    a buffering test client it sees each streamed chunk as it's sent, so
+    time to first byte is real. Returns status, body, ttfb and seconds."""
+    started = time.perf_counter()
+    finished = asyncio.Event()
+    result = {"status": None, "body": bytearray(), "ttfb": None}
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk and result["ttfb"] is None:
+                result["ttfb"] = time.perf_counter() - started
+            result["body"] += chunk
+            if not message.get("more_body", False):
+                finished.set()
+
+    headers = [(b"host", b"benchmark")]
+    if content_type:
+        headers.append((b"content-type", content_type.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    result["seconds"] = time.perf_counter() - started
+    result["body"] = bytes(result["body"])
+    return result
+
+
+# -------------------- Suites --------------------
+def bench_chat_store(n: int, threads: int = 8) -> dict:
+    from app import chat_store
+
+    chat_id = chat_store.create_chat()["id"]
+    message = "x" * 800
+
+    def timed_save(_=None):
+        started = time.perf_counter()
+        chat_store.save_message(chat_id, "user", message)
+        return time.perf_counter() - started
+
+    sequential = [timed_save() for _ in range(n)]
+    with ThreadPoolExecutor(threads) as pool:
+        started = time.perf_counter()
+        concurrent = list(pool.map(timed_save, range(n)))
+        wall = time.perf_counter() - started
+    return {
+        "sequential": summarize(sequential),
+        "concurrent": {**summarize(concurrent), "threads": threads, "writes_per_second": round(n / wall, 1)},
+    }
+
+
+def bench_ingestion(jds) -> dict:
+    from app import doc_registry, vector_store
+
+    failed = []
+    started = time.perf_counter()
+    vector_store.ingest_files(
+        [(jd["path"], jd["id"], None) for jd in jds],
+        lambda item, error: error and failed.append({"id": item[1], "error": error}),
+    )
+    seconds = time.perf_counter() - started
+    chunks = sum(doc["chunks"] for doc in _all_registry_docs(doc_registry))
+    return {
+        "docs": len(jds),
+        "failed": len(failed),
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "docs_per_second": round(len(jds) / seconds, 2) if seconds else None,
+        "chunks_per_second": round(chunks / seconds, 2) if seconds else None,
+        "first_failures": failed[:5],
+    }
+
+
+def _all_registry_docs(doc_registry):
+    cursor = None
+    while True:
+        docs, cursor = doc_registry.page(cursor=cursor, limit=doc_registry.MAX_PAGE_SIZE)
+        yield from docs
+        if cursor is None:
+            return
+
+
+def _queries(jds, n: int, seed: int) -> list:
+    rng = random.Random(f"queries-{seed}")
+    picks = [rng.choice(jds) for _ in range(n)]
+    # Half ask by title and skills, half by requisition code — the exact-
+    # token case hybrid retrieval is meant to catch.
+    return [
+        (f"{jd['title']} with {jd['skills'][0]} and {jd['skills'][1]}" if i % 2 == 0
+         else f"What does {jd['code']} require?", jd["id"])
+        for i, jd in enumerate(picks)
+    ]
+
+
+def bench_retrieval(queries) -> dict:
+    from app import rag_chatbot
+    from app.embeddings import get_embeddings
+
+    if rag_chatbot.get_active_retriever() is None:
+        return {"error": "retriever unavailable (nothing indexed?)"}
+    vectors = [(get_embeddings().embed_query(text), text, jd_id) for text, jd_id in queries]
+    results, original_mode = {}, rag_chatbot.RETRIEVAL_MODE
+    try:
+        for mode in ("mmr", "hybrid"):
+            rag_chatbot.RETRIEVAL_MODE = mode
+            durations, hits = [], 0
+            for vector, text, jd_id in vectors:
+                started = time.perf_counter()
+                docs = rag_chatbot.retrieve_documents(vector, text)
+                durations.append(time.perf_counter() - started)
+                hits += any((d.metadata or {}).get("parent_id") == jd_id for d in docs)
+            results[mode] = {**summarize(durations), "hit_rate": round(hits / len(vectors), 3) if vectors else None}
+    finally:
+        rag_chatbot.RETRIEVAL_MODE = original_mode
+    return results
+
+
+async def _new_chat(app) -> int:
+    response = await asgi_request(app, "POST", "/api/chats")
+    return json.loads(response["body"])["id"]
+
+
+async def _query(app, chat_id: int, message: str, resumes=()) -> dict:
+    body, content_type = multipart(
+        [("message", message)], [("resumes", os.path.basename(r["path"]), r["bytes"]) for r in resumes]
+    )
+    return await asgi_request(app, "POST", f"/api/chats/{chat_id}/query", body, content_type)
+
+
+def _stream_summary(responses) -> dict:
+    ok = [r for r in responses if r["status"] == 200]
+    return {
+        "requests": len(responses),
+        "errors": len(responses) - len(ok),
+        "time_to_first_token": summarize([r["ttfb"] for r in ok]),
+        "total": summarize([r["seconds"] for r in ok]),
+    }
+
+
+async def bench_chat(app, queries, resumes, n: int, resumes_per_query: int) -> dict:
+    plain, screening = [], []
+    rng = random.Random("chat")
+    for i in range(n):
+        chat_id = await _new_chat(app)
+        text, _ = queries[i % len(queries)]
+        plain.append(await _query(app, chat_id, text))
+        if resumes:
+            attached = rng.sample(resumes, min(resumes_per_query, len(resumes)))
+            screening.append(await _query(app, chat_id, f"Screen these resumes for: {text}", attached))
+    results = {"plain": _stream_summary(plain)}
+    if screening:
+        results["screening"] = {**_stream_summary(screening), "resumes_per_query": resumes_per_query}
+    return results
+
+
+async def bench_streams(app, queries, levels) -> dict:
+    results = {}
+    for level in levels:
+        chat_ids = [await _new_chat(app) for _ in range(level)]
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            *(_query(app, chat_id, queries[i % len(queries)][0]) for i, chat_id in enumerate(chat_ids))
+        )
+        wall = time.perf_counter() - started
+        results[str(level)] = {
+            **_stream_summary(responses),
+            "wall_seconds": round(wall, 3),
+            "streams_per_second": round(level / wall, 2),
+        }
+    return results
+
+
+async def bench_scheduler(n: int) -> dict:
+    """Scheduler scenarios against the fake, each with a pass/fail entry in
+    results["checks"]. Runs without RPM/TPM limits (its own event loop gets
+    a fresh scheduler that picks them up), whatever the environment says."""
+    from app import llm_scheduler, rag_chatbot
+
+    async def one(text: str, priority: int):
+        """Seconds for one whole answer, or None if it failed."""
+        started = time.perf_counter()
+        chain_input = {"input": text, "context": "Job Description 1:\nbenchmark", "history": []}
+        try:
+            async for _ in rag_chatbot.stream_llm(chain_input, priority):
+                pass
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    results, checks = {}, {}
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        checks[name] = {"ok": bool(ok), "detail": detail}
+
+    limits = llm_scheduler.LLM_RPM, llm_scheduler.LLM_TPM
+    llm_scheduler.LLM_RPM = llm_scheduler.LLM_TPM = 0
+    try:
+        fakes.upstream.update(calls=0, rate_limit_next=0)
+        durations = await asyncio.gather(*(one("the same question", llm_scheduler.INTERACTIVE) for _ in range(n)))
+        calls = fakes.upstream["calls"]
+        results["coalescing"] = {"requests": n, "upstream_calls": calls, "total": summarize(durations)}
+        check("coalescing", calls == 1 and None not in durations,
+              f"{n} identical concurrent prompts made {calls} upstream call(s)")
+
+        concurrency = llm_scheduler.LLM_MAX_CONCURRENCY
+        llm_scheduler.LLM_MAX_CONCURRENCY = 2
+        try:
+            fakes.upstream["started"] = []
+            batch = [asyncio.create_task(one(f"[batch {i}]", llm_scheduler.BATCH)) for i in range(n)]
+            await asyncio.sleep(0)
+            chat = [asyncio.create_task(one(f"[interactive {i}]", llm_scheduler.INTERACTIVE))
+                    for i in range(max(1, n // 4))]
+            batch_durations, chat_durations = await asyncio.gather(asyncio.gather(*batch), asyncio.gather(*chat))
+            results["priority"] = {
+                "max_concurrency": 2,
+                "batch": summarize(batch_durations),
+                "interactive": summarize(chat_durations),
+            }
+        finally:
+            llm_scheduler.LLM_MAX_CONCURRENCY = concurrency
+        # Chat was queued while the first batch calls held both slots, so
+        # at most those two batch calls may start before the last chat call.
+        order = fakes.upstream["started"]
+        last_chat = max((i for i, text in enumerate(order) if "[interactive" in text), default=-1)
+        batch_ahead = sum(1 for text in order[:last_chat] if "[batch" in text)
+        check("priority", batch_ahead <= 2 and None not in batch_durations + chat_durations,
+              f"{batch_ahead} batch call(s) started before the last interactive one (max 2)")
+
+        retry_base = llm_scheduler.LLM_RETRY_BASE_SECONDS
+        llm_scheduler.LLM_RETRY_BASE_SECONDS = 0.05
+        try:
+            fakes.upstream.update(calls=0, rate_limit_next=n // 2)
+            durations = await asyncio.gather(*(one(f"limited {i}", llm_scheduler.INTERACTIVE) for i in range(n)))
+            failed, calls = sum(1 for d in durations if d is None), fakes.upstream["calls"]
+            results["rate_limited"] = {
+                "requests": n,
+                "injected_429s": n // 2,
+                "upstream_calls": calls,
+                "failed": failed,
+                "total": summarize(durations),
+            }
+            check("rate_limited", failed == 0 and calls == n + n // 2,
+                  f"{failed} of {n} failed after {n // 2} injected 429s, {calls} upstream calls")
+        finally:
+            llm_scheduler.LLM_RETRY_BASE_SECONDS = retry_base
+            fakes.upstream["rate_limit_next"] = 0
+    finally:
+        llm_scheduler.LLM_RPM, llm_scheduler.LLM_TPM = limits
+    results["checks"] = checks
+    return results
+
+
+# -------------------- Main --------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks (fake LLM, synthetic PDFs).")
+    parser.add_argument("--jds", type=int, default=200, help="job descriptions to generate and index")
+    parser.add_argument("--resumes", type=int, default=50, help="resumes to generate for screening queries")
+    parser.add_argument("--queries", type=int, default=200, help="retrieval queries per mode")
+    parser.add_argument("--chat-requests", type=int, default=20, help="sequential chat queries")
+    parser.add_argument("--resumes-per-query", type=int, default=5)
+    parser.add_argument("--streams", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--chat-store-writes", type=int, default=500)
+    parser.add_argument("--scheduler-requests", type=int, default=20, help="calls per scheduler scenario")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="tokens per fake answer")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="fake LLM seconds before token 1")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake LLM seconds between tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default=",".join(SUITES), help=f"suites to run, from {','.join(SUITES)}")
+    parser.add_argument("--workdir", help="run here instead of a temporary directory (kept afterwards)")
+    parser.add_argument("--output", help="result file (default benchmarks/results/<timestamp>-<commit>.json)")
+    return parser.parse_args(argv)
+
+
+def run(args) -> dict:
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+
+    os.environ["APP_DB_PATH"] = os.path.join(os.getcwd(), "benchmark.db")
+    os.environ.setdefault("EMBEDDINGS_WARMUP", "0")
+    # No provider rate limit to respect here; the chat and streams suites
+    # measure the backend. The scheduler suite sets its own limits anyway.
+    os.environ.setdefault("LLM_RPM", "0")
+    fakes.install(args.llm_tokens, args.first_token_delay, args.token_delay)
+
+    from app import pdf_extraction, vector_store
+    from app.main import app
+
+    results = {}
+    try:
+        if "chat_store" in suites:
+            results["chat_store"] = bench_chat_store(args.chat_store_writes)
+        jds = corpus.write_corpus("corpus/jds", "jd", args.jds, args.seed)
+        resumes = corpus.write_corpus("corpus/resumes", "resume", args.resumes, args.seed)
+        for resume in resumes:
+            with open(resume["path"], "rb") as f:
+                resume["bytes"] = f.read()
+        if {"ingestion", "retrieval", "chat", "streams"} & set(suites):
+            # Retrieval and chat need an index, so ingestion always runs
+            # when they do; it's only reported when asked for.
+            ingestion = bench_ingestion(jds)
+            if "ingestion" in suites:
+                results["ingestion"] = ingestion
+        queries = _queries(jds, args.queries, args.seed)
+        if "retrieval" in suites:
+            results["retrieval"] = bench_retrieval(queries)
+        if "chat" in suites:
+            results["chat"] = asyncio.run(
+                bench_chat(app, queries, resumes, args.chat_requests, args.resumes_per_query)
+            )
+        if "streams" in suites:
+            levels = [int(level) for level in args.streams.split(",") if level.strip()]
+            results["streams"] = asyncio.run(bench_streams(app, queries, levels))
+        if "scheduler" in suites:
+            results["scheduler"] = asyncio.run(bench_scheduler(args.scheduler_requests))
+    finally:
+        pdf_extraction.shutdown()
+        vector_store.close()
+    return results
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    commit, dirty = git_commit()
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{timestamp}-{(commit or 'nogit')[:8]}.json"))
+
+    previous_dir = os.getcwd()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="resume-screener-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        started = time.perf_counter()
+        results = run(args)
+        elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(previous_dir)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+    failed = [name for name, check in results.get("scheduler", {}).get("checks", {}).items() if not check["ok"]]
+    if failed:
+        raise SystemExit(f"Scheduler checks failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
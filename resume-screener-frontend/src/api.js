@@ -10,12 +10,15 @@
 //   POST   /api/chats/{chat_id}/query -> streams plain text chunks (StreamingResponse)
 //          body: multipart/form-data with fields: message, resumes (files, optional)
 //   POST   /api/feedback              -> { ok: true }
+//   GET    /api/feedback/stats?group_by=day|chat|jd -> { group_by, groups: { count, average, ratings }[] }
+//   POST   /api/candidates/search     -> body { jd_id | query, top_n } -> { matches: [...], took_ms }
 //
 //   Vector DB management (wraps vector_db_operations.py):
-//   GET    /api/vector-db/docs             -> { id, source, chunks }[]  (from list_all_index_ids)
-//   POST   /api/vector-db/docs             -> multipart/form-data, field "files" (PDFs) -> add_pdfs_to_db
+//   GET    /api/vector-db/docs?cursor=&limit= -> { items: { id, source, chunks, indexed_at }[], next_cursor }
+//   POST   /api/vector-db/docs             -> multipart/form-data, field "files" (PDFs) -> indexing job
 //   DELETE /api/vector-db/docs/{doc_id}    -> delete_index_by_id(doc_id)
-//   PUT    /api/vector-db/docs/{doc_id}    -> multipart/form-data, field "file" -> update_index(doc_id, path)
+//   PUT    /api/vector-db/docs/{doc_id}    -> multipart/form-data, field "file" -> indexing job
+//   GET    /api/vector-db/jobs/{job_id}    -> { id, status, processed, total, result, error }
 
 const BASE = import.meta.env.VITE_API_BASE_URL || "/api";
 
@@ -120,18 +123,38 @@ export async function streamQuery({ chatId, message, resumeFiles = [], onChunk,
 
 // ---- Vector DB management ----
 
-export async function listVectorDocs() {
-  const res = await fetch(`${BASE}/vector-db/docs`);
+// One page of the index; pass the previous page's next_cursor to get the
+// next one (next_cursor is null on the last page).
+export async function listVectorDocs(cursor = null, limit = 50) {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
+  const res = await fetch(`${BASE}/vector-db/docs?${params}`);
   if (!res.ok) throw new Error("Failed to load vector store index");
   return res.json();
 }
 
-export async function addVectorDocs(files) {
+// Indexing runs as a background job on the backend: POST/PUT /docs and
+// /sync-folder return a job right away. This polls it until it finishes,
+// calling onProgress({ processed, total }) along the way, and returns the
+// job's result.
+async function waitForJob(job, onProgress) {
+  while (job.status === "queued" || job.status === "running") {
+    onProgress?.({ processed: job.processed, total: job.total });
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    const poll = await fetch(`${BASE}/vector-db/jobs/${job.id}`);
+    if (!poll.ok) throw new Error(`Failed to check indexing progress (${poll.status})`);
+    job = await poll.json();
+  }
+  if (job.status === "failed") throw new Error(job.error || "Indexing failed");
+  return job.result;
+}
+
+export async function addVectorDocs(files, onProgress) {
   const formData = new FormData();
   files.forEach((file) => formData.append("files", file));
   const res = await fetch(`${BASE}/vector-db/docs`, { method: "POST", body: formData });
   if (!res.ok) throw new Error("Failed to add document(s)");
-  return res.json();
+  return waitForJob(await res.json(), onProgress);
 }
 
 export async function deleteVectorDoc(docId) {
@@ -145,7 +168,7 @@ export async function deleteVectorDoc(docId) {
 // Optional fallback: bulk-index any PDFs already sitting in a pdfs/ folder
 // in the backend directory. The normal drag-and-drop upload above never
 // needed this folder — it's just an alternate way in.
-export async function syncVectorDbFolder() {
+export async function syncVectorDbFolder(onProgress) {
   const res = await fetch(`${BASE}/vector-db/sync-folder`, { method: "POST" });
   if (!res.ok) {
     let detail = "";
@@ -156,7 +179,7 @@ export async function syncVectorDbFolder() {
     }
     throw new Error(detail || `Failed to sync pdfs/ folder (${res.status})`);
   }
-  return res.json();
+  return waitForJob(await res.json(), onProgress);
 }
 
 export async function updateVectorDoc(docId, file) {
@@ -167,5 +190,5 @@ export async function updateVectorDoc(docId, file) {
     body: formData,
   });
   if (!res.ok) throw new Error("Failed to update document");
-  return res.json();
+  return waitForJob(await res.json());
 }
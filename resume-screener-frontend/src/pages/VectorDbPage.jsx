@@ -17,21 +17,37 @@ export default function VectorDbPage() {
   const [updateTargetId, setUpdateTargetId] = useState(null);
   const [syncMessage, setSyncMessage] = useState(null);
   const [syncing, setSyncing] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   async function refresh() {
     setLoading(true);
     try {
-      const remote = await listVectorDocs();
+      const page = await listVectorDocs();
       setBackendOnline(true);
-      setDocs(remote);
+      setDocs(page.items);
+      setNextCursor(page.next_cursor);
     } catch {
       setBackendOnline(false);
       setDocs([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await listVectorDocs(nextCursor);
+      setDocs((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   useEffect(() => {
     refresh();
   }, []);
@@ -47,7 +63,10 @@ export default function VectorDbPage() {
     }
     setLoading(true);
     try {
-      await addVectorDocs(files);
+      await addVectorDocs(files, ({ processed, total }) => {
+        if (total) setSyncMessage(`Indexing ${processed}/${total}…`);
+      });
+      setSyncMessage(null);
       await refresh();
     } finally {
       setLoading(false);
@@ -80,10 +99,19 @@ export default function VectorDbPage() {
     setSyncing(true);
     setSyncMessage(null);
     try {
-      const result = await syncVectorDbFolder();
+      const result = await syncVectorDbFolder(({ processed, total }) => {
+        if (total) setSyncMessage(`Indexing ${processed}/${total}…`);
+      });
       const parts = [];
       if (result.added?.length) parts.push(`indexed ${result.added.length} new PDF(s)`);
-      if (result.skipped?.length) parts.push(`${result.skipped.length} already indexed`);
+      if (result.updated?.length) parts.push(`re-indexed ${result.updated.length} changed`);
+      if (result.removed?.length) parts.push(`removed ${result.removed.length} deleted`);
+      if (result.unchanged?.length) parts.push(`${result.unchanged.length} unchanged`);
+      if (result.failed?.length) parts.push(`${result.failed.length} failed`);
+      if (result.skipped?.length) {
+        const names = result.skipped.map((s) => `${s.id} (${s.reason})`).join("; ");
+        parts.push(`skipped ${result.skipped.length}: ${names}`);
+      }
       setSyncMessage(parts.length ? parts.join(", ") : result.note || "No PDFs found in pdfs/ folder");
       await refresh();
     } catch (err) {
@@ -181,6 +209,14 @@ export default function VectorDbPage() {
               </span>
             </div>
           ))}
+
+        {!loading && nextCursor && (
+          <div className="vdb-empty">
+            <button className="pill-btn" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? "Loading…" : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );